@@ -3,14 +3,19 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through ASGI (e.g. `uvicorn backend.asgi:application`) turns on ASYNC_MODE, so the
+read-heavy endpoints run as async views; see core/async_views.py.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('ASYNC_MODE', 'True')
 
-application = get_asgi_application()
+application = ASGIStaticFilesHandler(get_asgi_application())
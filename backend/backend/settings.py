@@ -28,6 +28,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.PerformanceMiddleware',          # <--- Outermost, so it times everything below
+    'core.routers.PrimaryPinningMiddleware',
     'corsheaders.middleware.CorsMiddleware',               # <--- TOP
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',          # <--- AFTER SECURITY
@@ -66,6 +68,42 @@ DATABASES = {
     )
 }
 
+# READ REPLICA: Optional. Dashboard, trends and forecast reads go to the replica; every other read
+# and every write to the primary. See core/routers.py.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL', '')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=600)
+    DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# Seconds after a user's last change during which their dashboard / trends / forecast read the primary.
+DATABASE_REPLICA_LAG = float(os.environ.get('DATABASE_REPLICA_LAG', 5))
+
+# CONNECTION POOL: psycopg 3's native pool (PostgreSQL only). Replaces persistent connections.
+DATABASE_POOL = os.environ.get('DATABASE_POOL', 'False') == 'True'
+if DATABASE_POOL:
+    for db in DATABASES.values():
+        if db['ENGINE'] == 'django.db.backends.postgresql':
+            db['CONN_MAX_AGE'] = 0
+            db.setdefault('OPTIONS', {})['pool'] = {
+                'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+                'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', 10)),
+            }
+
+# CACHE: Local memory per process by default. Point it at a shared backend (e.g. Django's
+# DatabaseCache or Redis) so every worker agrees on dashboard versions / ETags.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'safeskip'),
+    }
+}
+
+# Per-user data versions (dashboard ETags, cached read models) never expire on a shared cache. A
+# LocMemCache is per process and other workers never see a bump, so there they expire after this
+# many seconds instead (0 = never). The core.W001 check warns about locmem with WEB_CONCURRENCY > 1.
+LOCAL_CACHE = CACHES['default']['BACKEND'].endswith('LocMemCache')
+DATA_VERSION_TTL = int(os.environ.get('DATA_VERSION_TTL', 30 if LOCAL_CACHE else 0)) or None
+
 # PASSWORD VALIDATION
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -84,12 +122,15 @@ STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Uploads waiting in the import job queue are kept here until processed
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # --- JWT SETTINGS ---
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -99,9 +140,68 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1), # Long session for convenience
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_REFRESH_SERIALIZER': 'core.authentication.RevocableTokenRefreshSerializer',
 }
 
+# Authenticated users are cached per process for this many seconds (bounded LRU), so requests skip the User query.
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 1024))
+# Also keep them in the Django cache (shared between workers when CACHE_BACKEND is).
+AUTH_USER_CACHE_SHARED = os.environ.get('AUTH_USER_CACHE_SHARED', 'False') == 'True'
+# GET/HEAD requests trust the token claims alone: no user lookup at all.
+AUTH_STATELESS_READS = os.environ.get('AUTH_STATELESS_READS', 'False') == 'True'
+
 # --- CORS SETTINGS (The Handshake) ---
 # We will set 'CORS_ALLOWED_ORIGINS' in Render Environment Variables later
 CORS_ALLOW_ALL_ORIGINS = False 
-CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:5173').split(',')
\ No newline at end of file
+CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:5173').split(',')
+# --- ATTENDANCE UPLOADS ---
+# CSVs are decoded and parsed in a streaming fashion; these bound how much a single upload may contain.
+ATTENDANCE_UPLOAD_MAX_BYTES = int(os.environ.get('ATTENDANCE_UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+ATTENDANCE_UPLOAD_MAX_ROWS = int(os.environ.get('ATTENDANCE_UPLOAD_MAX_ROWS', 200000))
+# Hours per counted session in summary reports, by session type keyword (first match wins, else 1).
+ATTENDANCE_SESSION_WEIGHTS = (('lab', int(os.environ.get('ATTENDANCE_LAB_WEIGHT', 3))),)
+# Multi-file / ZIP uploads: caps on file count and total uncompressed size.
+ATTENDANCE_BATCH_MAX_FILES = int(os.environ.get('ATTENDANCE_BATCH_MAX_FILES', 500))
+ATTENDANCE_BATCH_MAX_BYTES = int(os.environ.get('ATTENDANCE_BATCH_MAX_BYTES', 500 * 1024 * 1024))
+# Worker processes for parsing batches (0 = one per CPU); smaller batches are parsed inline.
+ATTENDANCE_PARSE_PROCESSES = int(os.environ.get('ATTENDANCE_PARSE_PROCESSES', 0))
+ATTENDANCE_PARSE_MIN_PARALLEL = int(os.environ.get('ATTENDANCE_PARSE_MIN_PARALLEL', 8))
+
+# --- IMPORT JOBS ---
+# Uploads above this size are processed in the background and answered with 202 + a job id.
+ATTENDANCE_IMPORT_ASYNC_BYTES = int(os.environ.get('ATTENDANCE_IMPORT_ASYNC_BYTES', 1024 * 1024))
+# core.jobs.ThreadPoolJobExecutor (in-process) or core.jobs.DatabaseQueueExecutor (with `manage.py run_import_worker`)
+ATTENDANCE_IMPORT_EXECUTOR = os.environ.get('ATTENDANCE_IMPORT_EXECUTOR', 'core.jobs.ThreadPoolJobExecutor')
+ATTENDANCE_IMPORT_THREADS = int(os.environ.get('ATTENDANCE_IMPORT_THREADS', 2))
+
+# --- ATTENDANCE COMPACTION ---
+# `manage.py compact_attendance` writes compacted logs here (gzipped NDJSON, one folder per
+# user id); trends and exports read them back from the same place.
+ATTENDANCE_ARCHIVE_DIR = os.environ.get('ATTENDANCE_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+
+# --- FORECAST CACHE ---
+# Finished forecast plans are memoized per process (bounded LRU, entries live this many seconds).
+# Plans that extend a cached plan resume from its last step. Each entry holds a whole plan's steps.
+FORECAST_CACHE_SIZE = int(os.environ.get('FORECAST_CACHE_SIZE', 512))
+FORECAST_CACHE_TTL = int(os.environ.get('FORECAST_CACHE_TTL', 300))
+# Also keep them in the Django cache (shared between workers when CACHE_BACKEND is).
+FORECAST_CACHE_SHARED = os.environ.get('FORECAST_CACHE_SHARED', 'False') == 'True'
+
+# --- PERFORMANCE INSTRUMENTATION ---
+# Server-Timing header (total / db / phases) on every response.
+PERF_SERVER_TIMING = os.environ.get('PERF_SERVER_TIMING', 'True') == 'True'
+# Time phases inside request handling (e.g. CSV decode / header / rows). Off by default.
+PERF_PHASE_TIMING = os.environ.get('PERF_PHASE_TIMING', 'False') == 'True'
+# If set, /metrics requires `Authorization: Bearer <token>`.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Lets the frontend read Server-Timing on cross-origin API calls.
+CORS_EXPOSE_HEADERS = ['Server-Timing']
+
+# --- ASYNC SERVING ---
+# Set by backend/asgi.py. Routes the dashboard / subject status / forecast endpoints to async views
+# and drops WhiteNoise (sync-only; it would force every request through a thread). Static files are
+# then served by the ASGI static handler, or better, by the proxy / CDN in front.
+ASYNC_MODE = os.environ.get('ASYNC_MODE', 'False') == 'True'
+if ASYNC_MODE:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
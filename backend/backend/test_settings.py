@@ -0,0 +1,10 @@
+"""
+Settings for the test suite: the normal settings plus a second SQLite database standing in for a
+read replica. No router is installed by default; routing tests turn it on with DATABASE_ROUTERS.
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'replica.sqlite3',
+}
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from core.instrumentation import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')), # 👈 This adds the 'api/' prefix
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Async twins of the read-heavy endpoints (dashboard, subject status, forecast) for ASGI deployments.
+
+Same URLs, payloads and JWT auth as the DRF views, which stay in use under WSGI. Queries go
+through the async ORM and cache APIs, so a request waiting on the database doesn't pin a worker
+thread. core/urls.py picks these when ASYNC_MODE is on (backend/asgi.py turns it on).
+"""
+import json
+from functools import wraps
+from django.http import HttpResponse, JsonResponse
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from .authentication import CachedJWTAuthentication
+from .cache import adata_version
+from .dashboard import acached_dashboard, dashboard_etag, subject_status
+from .forecast import aevaluate_plans, arun_forecast
+from .models import Subject
+from .routers import reading_since
+from .views import is_not_modified
+
+
+def jwt_required(view):
+    """401 unless the request carries a valid JWT; sets request.user / request.auth like DRF does."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        authenticator = CachedJWTAuthentication()
+        try:
+            result = await authenticator.aauthenticate(request)
+        except AuthenticationFailed as e:
+            detail = e.detail if isinstance(e.detail, dict) else {"detail": e.detail, "code": e.get_codes()}
+            return JsonResponse(detail, status = 401, headers = {'WWW-Authenticate': authenticator.authenticate_header(request)})
+        if result is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."}, status = 401,
+                headers = {'WWW-Authenticate': authenticator.authenticate_header(request)}
+            )
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_GET
+@jwt_required
+async def dashboard(request):
+    version, modified_at = await adata_version(request.user.pk)
+    etag = dashboard_etag(request.user.pk, version)
+    
+    if is_not_modified(request, etag, modified_at):
+        response = HttpResponse(status = 304)
+    else:
+        with reading_since(modified_at):
+            response = JsonResponse(await acached_dashboard(request.user, version))
+    
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified_at)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@require_GET
+@jwt_required
+async def subject_status_view(request, subject_id):
+    try:
+        subject = await Subject.objects.aget(pk = subject_id, user = request.user)
+    except Subject.DoesNotExist:
+        return JsonResponse({"detail": "No Subject matches the given query."}, status = 404)
+    return JsonResponse(subject_status(subject, await subject.acurrent_status_details()))
+
+
+@csrf_exempt
+@require_POST
+@jwt_required
+async def forecast(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({"error": "Request body must be JSON."}, status = 400)
+    if not isinstance(data, dict):
+        return JsonResponse({"error": "Request body must be a JSON object."}, status = 400)
+    
+    _, modified_at = await adata_version(request.user.pk)
+    try:
+        with reading_since(modified_at):
+            if 'plans' in data:
+                return JsonResponse({"plans": await aevaluate_plans(request.user, data['plans'], data.get('include_steps', True))})
+            return JsonResponse(await arun_forecast(request.user, data.get('simulations', [])), safe = False)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status = 400)
@@ -0,0 +1,180 @@
+"""
+JWT authentication without a User query on every request.
+
+CachedJWTAuthentication keeps resolved users in a small per-process LRU keyed by (user id, token
+jti), with a short TTL. With AUTH_USER_CACHE_SHARED the users are also stored in Django's cache,
+so a fresh worker (or a new token) skips the query as well.
+
+Invalidation:
+- any save or delete of a User (password change, deactivation, ...) evicts that user at once in
+  this process and in the shared cache; other processes drop it within AUTH_USER_CACHE_TTL;
+- POST /api/auth/logout/ revokes the access token (and the refresh token, if sent) by jti until
+  it expires. Revocations live in Django's cache, so they reach every worker when that cache is
+  shared (see CACHE_BACKEND), and are checked before the per-process LRU on every request.
+
+With AUTH_STATELESS_READS, GET/HEAD requests get a user built from the token claims alone (no
+query, no cache); only revocation is checked.
+"""
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .cache import TTLCache
+
+DEFAULT_TTL = 60
+DEFAULT_SIZE = 1024
+SHARED_USER_KEY = 'auth:user:{user_id}'
+REVOKED_KEY = 'auth:revoked:{jti}'
+READ_METHODS = ('GET', 'HEAD')
+
+
+class UserCache(TTLCache):
+    """(user_id, jti) -> user, with every token of a user evictable at once."""
+
+    def evict_user(self, user_id):
+        self.discard(lambda key: key[0] == user_id)
+
+
+user_cache = UserCache(
+    getattr(settings, 'AUTH_USER_CACHE_SIZE', DEFAULT_SIZE),
+    getattr(settings, 'AUTH_USER_CACHE_TTL', DEFAULT_TTL),
+)
+
+
+def normalize_user_id(user_id):
+    return str(user_id)
+
+
+def invalidate_user(user_id):
+    user_cache.evict_user(normalize_user_id(user_id))
+    cache.delete(SHARED_USER_KEY.format(user_id = user_id))
+
+
+def revoke_token(token):
+    """Rejects this token (by jti) until it would have expired anyway."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti is None:
+        return
+    remaining = int(token.get('exp', time.time()) - time.time())
+    cache.set(REVOKED_KEY.format(jti = jti), True, timeout = max(remaining, 1))
+
+
+def is_revoked(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    return jti is not None and cache.get(REVOKED_KEY.format(jti = jti)) is not None
+
+
+def claims_user(user_id):
+    """An unsaved User carrying only the id: enough for request.user.pk and ORM filters on user."""
+    user = get_user_model()(**{api_settings.USER_ID_FIELD: user_id})
+    user._state.adding = False
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves users from UserCache (and optionally Django's cache)."""
+
+    def authenticate(self, request):
+        self.request_method = request.method
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if getattr(settings, 'AUTH_STATELESS_READS', False) and getattr(self, 'request_method', None) in READ_METHODS:
+            self.check_revoked(validated_token)
+            return claims_user(user_id)
+
+        # Revocation first: logout only clears user_cache in the worker that handled it.
+        self.check_revoked(validated_token)
+        key = (normalize_user_id(user_id), validated_token.get(api_settings.JTI_CLAIM))
+        user = user_cache.get(key)
+        if user is not None:
+            return user
+
+        shared = getattr(settings, 'AUTH_USER_CACHE_SHARED', False)
+        user = cache.get(SHARED_USER_KEY.format(user_id = user_id)) if shared else None
+        if user is None:
+            user = super().get_user(validated_token)
+            if shared:
+                cache.set(SHARED_USER_KEY.format(user_id = user_id), user, timeout = user_cache.ttl)
+        else:
+            self.check_user(user, validated_token)
+
+        user_cache.set(key, user)
+        return user
+
+    async def aget_user(self, validated_token):
+        """get_user for async views: same caches and checks, with the async cache / ORM APIs."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if getattr(settings, 'AUTH_STATELESS_READS', False) and getattr(self, 'request_method', None) in READ_METHODS:
+            await self.acheck_revoked(validated_token)
+            return claims_user(user_id)
+
+        await self.acheck_revoked(validated_token)
+        key = (normalize_user_id(user_id), validated_token.get(api_settings.JTI_CLAIM))
+        user = user_cache.get(key)
+        if user is not None:
+            return user
+
+        shared = getattr(settings, 'AUTH_USER_CACHE_SHARED', False)
+        user = await cache.aget(SHARED_USER_KEY.format(user_id = user_id)) if shared else None
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code = "user_not_found")
+            if shared:
+                await cache.aset(SHARED_USER_KEY.format(user_id = user_id), user, timeout = user_cache.ttl)
+        self.check_user(user, validated_token)
+
+        user_cache.set(key, user)
+        return user
+
+    async def aauthenticate(self, request):
+        """authenticate() for plain async Django views: (user, token) or None without credentials."""
+        self.request_method = request.method
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def acheck_revoked(self, validated_token):
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti is not None and await cache.aget(REVOKED_KEY.format(jti = jti)) is not None:
+            raise AuthenticationFailed(_("Token has been revoked."), code = "token_revoked")
+
+    def check_revoked(self, validated_token):
+        if is_revoked(validated_token):
+            raise AuthenticationFailed(_("Token has been revoked."), code = "token_revoked")
+
+    def check_user(self, user, validated_token):
+        """The checks JWTAuthentication.get_user applies after loading the user."""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code = "user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code = "password_changed")
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses refresh tokens revoked by logout."""
+
+    def validate(self, attrs):
+        if is_revoked(self.token_class(attrs['refresh'])):
+            raise AuthenticationFailed(_("Token has been revoked."), code = "token_revoked")
+        return super().validate(attrs)
@@ -0,0 +1,192 @@
+"""
+Multi-file / ZIP uploads of summary 'Attendance Report.csv' files.
+
+Archive members are read straight from the ZIP stream (nothing is extracted to disk) and the
+files are parsed on a shared ProcessPoolExecutor, so a few hundred reports use every core.
+Members are submitted as they are read, with at most IN_FLIGHT_PER_PROCESS files per worker
+waiting to be collected, so memory stays bounded by a few files whatever the batch size.
+Small batches are parsed inline: starting worker processes costs more than it saves there.
+"""
+import io
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, islice
+from django.conf import settings
+from .utils import DEFAULT_MAX_UPLOAD_BYTES, DEFAULT_MAX_UPLOAD_ROWS, parse_attendance_csv
+
+DEFAULT_MAX_FILES = 500
+DEFAULT_MAX_BATCH_BYTES = 500 * 1024 * 1024
+DEFAULT_MIN_PARALLEL = 8
+IN_FLIGHT_PER_PROCESS = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def is_zip(upload):
+    return str(getattr(upload, 'name', '')).lower().endswith('.zip')
+
+
+def iter_batch_members(uploads):
+    """
+    (file name, bytes) for every CSV in `uploads`, expanding ZIP archives member by member.
+    Sizes are checked against the declared member size before anything is decompressed.
+    """
+    max_files = getattr(settings, 'ATTENDANCE_BATCH_MAX_FILES', DEFAULT_MAX_FILES)
+    max_total = getattr(settings, 'ATTENDANCE_BATCH_MAX_BYTES', DEFAULT_MAX_BATCH_BYTES)
+    max_member = getattr(settings, 'ATTENDANCE_UPLOAD_MAX_BYTES', DEFAULT_MAX_UPLOAD_BYTES)
+    count = total = 0
+
+    def admit(name, size):
+        nonlocal count, total
+        count += 1
+        total += size
+        if count > max_files:
+            raise ValueError(f"Too many files. The limit is {max_files}.")
+        if size > max_member:
+            raise ValueError(f"{name}: file too large. The limit is {max_member // (1024 * 1024)} MB.")
+        if total > max_total:
+            raise ValueError(f"Batch too large. The limit is {max_total // (1024 * 1024)} MB uncompressed.")
+
+    for upload in uploads:
+        if not is_zip(upload):
+            admit(upload.name, upload.size)
+            yield upload.name, upload.read()
+            continue
+
+        try:
+            archive = zipfile.ZipFile(upload)
+        except zipfile.BadZipFile:
+            raise ValueError(f"{upload.name}: not a valid ZIP archive.")
+        with archive:
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or not name.lower().endswith('.csv') or name.startswith('__MACOSX/'):
+                    continue
+                admit(name, member.file_size)
+                with archive.open(member) as stream:
+                    # Never trust the declared size: read at most one byte past the limit.
+                    data = stream.read(max_member + 1)
+                if len(data) > max_member:
+                    raise ValueError(f"{name}: file too large. The limit is {max_member // (1024 * 1024)} MB.")
+                yield name, data
+
+
+def parse_member(member):
+    """Worker entry point: (name, bytes, max_rows) -> per-file result or error. Must stay picklable."""
+    name, data, max_rows = member
+    try:
+        return {"file": name, **parse_attendance_csv(io.BytesIO(data), max_bytes = 0, max_rows = max_rows)}
+    except ValueError as e:
+        return {"file": name, "error": str(e)}
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers = getattr(settings, 'ATTENDANCE_PARSE_PROCESSES', None) or os.cpu_count())
+        return _pool
+
+
+def reset_pool(pool = None):
+    """Shuts the shared pool down; with `pool`, only if that is still the shared one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (pool is None or _pool is pool):
+            _pool.shutdown(wait = False, cancel_futures = True)
+            _pool = None
+
+
+def parse_on_pool(jobs, in_flight):
+    """
+    parse_member results for `jobs` in input order, submitting each job as it is read and never
+    holding more than `in_flight` uncollected ones. If the pool breaks, the rest is parsed inline.
+    """
+    pool = get_pool()
+    pending = deque()
+
+    def collect():
+        nonlocal pool
+        job, future = pending.popleft()
+        if future is not None:
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                if pool is not None:
+                    reset_pool(pool)
+                    pool = None
+        return parse_member(job)
+
+    try:
+        for job in jobs:
+            future = None
+            if pool is not None:
+                try:
+                    future = pool.submit(parse_member, job)
+                except BrokenProcessPool:
+                    reset_pool(pool)
+                    pool = None
+            pending.append((job, future))
+            if len(pending) >= in_flight:
+                yield collect()
+        while pending:
+            yield collect()
+    finally:
+        # Stopped early (a batch limit hit while reading): drop whatever is still queued.
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
+
+
+def parse_members(members):
+    """Parses (name, bytes) members lazily, yielding results in input order, on the process pool when the batch is big enough."""
+    max_rows = getattr(settings, 'ATTENDANCE_UPLOAD_MAX_ROWS', DEFAULT_MAX_UPLOAD_ROWS)
+    jobs = ((name, data, max_rows) for name, data in members)
+
+    processes = getattr(settings, 'ATTENDANCE_PARSE_PROCESSES', None) or os.cpu_count() or 1
+    min_parallel = getattr(settings, 'ATTENDANCE_PARSE_MIN_PARALLEL', DEFAULT_MIN_PARALLEL)
+    # Only the first few members are read ahead, to tell a small batch from a big one.
+    head = list(islice(jobs, min_parallel)) if processes > 1 else []
+    if processes <= 1 or len(head) < min_parallel:
+        yield from map(parse_member, chain(head, jobs))
+        return
+    yield from parse_on_pool(chain(head, jobs), processes * IN_FLIGHT_PER_PROCESS)
+
+
+def merge_results(results):
+    """Per-file results -> one payload: summed global hours, every subject tagged with its file, per-file errors."""
+    attended = conducted = 0
+    subjects = []
+    files = []
+    for result in results:
+        if 'error' in result:
+            files.append({"file": result['file'], "error": result['error']})
+            continue
+        attended += result['global']['attended']
+        conducted += result['global']['conducted']
+        subjects.extend({**subject, "file": result['file']} for subject in result['subjects'])
+        files.append({"file": result['file'], "global": result['global'], "subjects": len(result['subjects'])})
+
+    return {
+        "global": {
+            "attended": attended,
+            "conducted": conducted,
+            "percentage": round(attended / conducted * 100, 2) if conducted > 0 else 0,
+        },
+        "subjects": subjects,
+        "files": files,
+        "failed_files": sum(1 for f in files if 'error' in f),
+    }
+
+
+def parse_batch(uploads):
+    """Entry point for multi-file uploads: expand, parse in parallel, merge, one member at a time. Raises ValueError for unusable batches."""
+    merged = merge_results(parse_members(iter_batch_members(uploads)))
+    if not merged['files']:
+        raise ValueError("No CSV files found in the upload.")
+    return merged
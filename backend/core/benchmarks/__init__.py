@@ -0,0 +1,6 @@
+"""
+Synthetic datasets and timed benchmarks with SQL query budgets.
+
+    python manage.py generate_synthetic_data --users 50 --subjects 8 --days 120
+    python manage.py run_benchmarks --output bench.json
+"""
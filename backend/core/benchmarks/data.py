@@ -0,0 +1,91 @@
+import random
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from core.models import Subject, SessionType, AttendanceLog, AttendanceRollup
+
+SUBJECT_NAMES = (
+    "Data Structures", "Operating Systems", "Computer Networks", "DBMS", "Compilers",
+    "Discrete Maths", "Machine Learning", "Software Engineering", "Cloud Computing", "Cryptography",
+)
+# (session name, duration hours, weekly sessions)
+SESSION_MIX = (("Lecture", 1, 3), ("Lab", 3, 1))
+
+
+def subject_name(j):
+    base = SUBJECT_NAMES[j % len(SUBJECT_NAMES)]
+    return base if j < len(SUBJECT_NAMES) else f"{base} {j // len(SUBJECT_NAMES) + 1}"
+
+
+def generate_dataset(users = 10, subjects = 8, days = 120, start = date(2025, 1, 6), seed = 7, prefix = "bench"):
+    """
+    N users x M subjects x Lecture/Lab session types x a semester of logs, written with bulk_create.
+    Each user gets their own attendance habit (70-98% present, ~3% cancellations).
+    Returns the created users.
+    """
+    rng = random.Random(seed)
+    created_users = User.objects.bulk_create([User(username = f"{prefix}_{i}") for i in range(users)])
+    created_users = list(User.objects.filter(username__in = [u.username for u in created_users]).order_by('id'))
+
+    subject_rows = [
+        Subject(user = user, name = subject_name(j), code = f"CS{j:03d}")
+        for user in created_users for j in range(subjects)
+    ]
+    Subject.objects.bulk_create(subject_rows)
+    subject_rows = list(Subject.objects.filter(user__in = created_users).order_by('id'))
+
+    session_rows = [
+        SessionType(subject = subject, name = name, duration_hours = hours)
+        for subject in subject_rows for name, hours, _ in SESSION_MIX
+    ]
+    SessionType.objects.bulk_create(session_rows)
+    session_rows = list(SessionType.objects.filter(subject__in = subject_rows).select_related('subject').order_by('id'))
+
+    habits = {user.id: rng.uniform(0.70, 0.98) for user in created_users}
+    weekly = {name: per_week for name, _, per_week in SESSION_MIX}
+
+    logs = []
+    for st in session_rows:
+        # Spread the weekly sessions over Mon-Fri, offset per subject so timetables differ.
+        weekdays = {(st.subject_id + k * 2) % 5 for k in range(weekly[st.name])}
+        habit = habits[st.subject.user_id]
+        for offset in range(days):
+            day = start + timedelta(days = offset)
+            if day.weekday() not in weekdays:
+                continue
+            roll = rng.random()
+            status = "CANCELLED" if roll < 0.03 else ("PRESENT" if roll < 0.03 + habit * 0.97 else "ABSENT")
+            logs.append(AttendanceLog(session_type_id = st.id, date = day, status = status))
+            if len(logs) >= 5000:
+                AttendanceLog.objects.bulk_create(logs)
+                logs = []
+    AttendanceLog.objects.bulk_create(logs)
+
+    AttendanceRollup.objects.rebuild([st.id for st in session_rows])
+    return created_users
+
+
+def generate_report_csv(rows = 1000, seed = 7):
+    """A summary 'Attendance Report.csv' (the parse_attendance_csv format) with `rows` subject rows."""
+    rng = random.Random(seed)
+    lines = ["#,Subject Code,Subject,Subject Type,Present,OD,Makeup,Absent"]
+    for i in range(1, rows + 1):
+        kind = "Lab" if i % 4 == 0 else "Theory"
+        lines.append(f"{i},CS{i:05d},Course {i},{kind},{rng.randint(10, 40)},{rng.randint(0, 3)},{rng.randint(0, 2)},{rng.randint(0, 12)}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def generate_session_log_csv(rows = 1000, subjects = 8, start = date(2025, 1, 6), seed = 7):
+    """A dated per-session export (the import_attendance_data format) with `rows` log rows."""
+    rng = random.Random(seed)
+    lines = ["Subject,Type,Date,Status,Duration"]
+    day, written = start, 0
+    while written < rows:
+        for j in range(subjects):
+            if written == rows:
+                break
+            kind, hours = ("Lab", 3) if (j + day.toordinal()) % 4 == 0 else ("Lecture", 1)
+            status = rng.choice(("P", "P", "P", "Present", "A", "Absent"))
+            lines.append(f"{subject_name(j)},{kind},{day.isoformat()},{status},{hours}")
+            written += 1
+        day += timedelta(days = 1)
+    return ("\n".join(lines) + "\n").encode("utf-8")
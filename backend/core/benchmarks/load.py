@@ -0,0 +1,149 @@
+"""
+HTTP load test of one endpoint under gunicorn (sync workers, WSGI) and uvicorn (ASGI, async views).
+
+Each server is started as a subprocess against the configured database, then hammered by
+`concurrency` keep-alive clients for `duration` seconds per level. Reported per server and level:
+throughput, p50/p95/p99 latency and errors. The client is a single asyncio process, so at the top
+levels give it its own core (or machine) or it becomes the bottleneck.
+"""
+import asyncio
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import httpx
+from django.conf import settings
+
+SERVERS = {
+    'gunicorn': {
+        'command': ['gunicorn', 'backend.wsgi:application', '--workers', '{workers}', '--bind', '127.0.0.1:{port}', '--log-level', 'warning'],
+        'env': {'ASYNC_MODE': 'False'},
+    },
+    'uvicorn': {
+        'command': ['uvicorn', 'backend.asgi:application', '--workers', '{workers}', '--port', '{port}', '--no-access-log', '--log-level', 'warning'],
+        'env': {'ASYNC_MODE': 'True'},
+    },
+}
+
+ENDPOINTS = {
+    'dashboard': ('GET', '/api/dashboard/'),
+    'status': ('GET', '/api/subjects/{subject_id}/status/'),
+    'forecast': ('POST', '/api/forecast/'),
+}
+
+DEFAULT_CONCURRENCY = (100, 250, 500, 1000)
+STARTUP_TIMEOUT = 30
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 1) if elapsed else 0,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+    }
+
+
+async def hammer(client, method, url, concurrency, duration, headers = None, body = None):
+    """`concurrency` clients sending requests back to back for `duration` seconds. Non-2xx counts as an error."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            try:
+                response = await client.request(method, url, headers = headers, json = body)
+                ok = response.status_code < 300
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - began)
+            else:
+                errors += 1
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - began)
+
+
+def start_server(name, workers, port):
+    spec = SERVERS[name]
+    if shutil.which(spec['command'][0]) is None:
+        raise RuntimeError(f"{spec['command'][0]} is not installed (see requirements.txt).")
+    command = [part.format(workers = workers, port = port) for part in spec['command']]
+    return subprocess.Popen(command, cwd = settings.BASE_DIR, env = {**os.environ, **spec['env']})
+
+
+def wait_until_ready(base_url, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} during startup.")
+        try:
+            httpx.get(f'{base_url}/api/dashboard/', timeout = 1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not answer within {STARTUP_TIMEOUT}s.")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout = 10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def run_levels(base_url, method, path, levels, duration, warmup, headers, body):
+    limits = httpx.Limits(max_connections = max(levels), max_keepalive_connections = max(levels))
+    async with httpx.AsyncClient(base_url = base_url, limits = limits, timeout = 60) as client:
+        if warmup:
+            await hammer(client, method, path, min(levels), warmup, headers, body)
+        return {level: await hammer(client, method, path, level, duration, headers, body) for level in levels}
+
+
+def run_load(token, endpoint = 'dashboard', servers = tuple(SERVERS), levels = DEFAULT_CONCURRENCY, duration = 20,
+             warmup = 3, workers = None, port = 8765, subject_id = None, body = None):
+    """Starts each server in turn and load tests `endpoint` at every concurrency level. Returns a JSON-able report."""
+    workers = workers or os.cpu_count() or 1
+    method, path = ENDPOINTS[endpoint]
+    path = path.format(subject_id = subject_id)
+    headers = {'Authorization': f'Bearer {token}'}
+    base_url = f'http://127.0.0.1:{port}'
+
+    results = {}
+    for name in servers:
+        process = start_server(name, workers, port)
+        try:
+            wait_until_ready(base_url, process)
+            levels_report = asyncio.run(run_levels(base_url, method, path, levels, duration, warmup, headers, body))
+        finally:
+            stop_server(process)
+        results[name] = {str(level): r for level, r in levels_report.items()}
+
+    return {
+        "meta": {
+            "endpoint": endpoint,
+            "workers": workers,
+            "duration_s": duration,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "database": settings.DATABASES['default']['ENGINE'],
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
@@ -0,0 +1,140 @@
+import io
+import json
+import platform
+import statistics
+import time
+import django
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from core.forecast import forecast_memo
+from core.models import Subject
+from core.services import import_attendance_data
+from core.utils import parse_attendance_csv
+from .data import generate_dataset, generate_report_csv, generate_session_log_csv
+
+# Max SQL statements per measured call. A regression such as a per-log N+1 blows straight through these.
+# Callables get the CSV row count: imports write in batches (and SQLite caps rows per INSERT), so
+# their budget grows with the batch count, never with one query per row.
+QUERY_BUDGETS = {
+    'status': 1,            # Subject.current_status, one subject
+    'dashboard_cold': 1,    # first dashboard build for a user
+    'dashboard_warm': 0,    # cached / 304 path
+    'forecast': 1,          # 20 plans x 100 steps, weights inline, nothing cached
+    'forecast_memo': 0,     # the same batch again
+    'safe_skips': 2,
+    'parse_csv': 0,
+    'import': lambda rows: 10 + 8 * -(-rows // 1000),
+}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class _Rollback(Exception):
+    pass
+
+
+def measure(fn, repeat):
+    """Runs fn `repeat` times. Returns timings (ms) and the query count of the last run."""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            began = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - began) * 1000)
+        queries = len(ctx.captured_queries)
+    return timings, queries
+
+
+def summarize(name, timings, queries, csv_rows):
+    ordered = sorted(timings)
+    budget = QUERY_BUDGETS.get(name)
+    if callable(budget):
+        budget = budget(csv_rows)
+    return {
+        "runs": len(timings),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "queries": queries,
+        "budget": budget,
+        "ok": budget is None or queries <= budget,
+    }
+
+
+def run_suite(users = 5, subjects = 8, days = 120, csv_rows = 5000, repeat = 5, seed = 7):
+    """
+    Generates a dataset, runs every benchmark and returns the results dict.
+    Everything happens inside a transaction that is rolled back, so it can run against any database.
+    """
+    results = {}
+
+    def bench(name, fn, runs = repeat):
+        results[name] = summarize(name, *measure(fn, runs), csv_rows)
+
+    try:
+        with transaction.atomic():
+            cache.clear()
+            bench_users = generate_dataset(users, subjects, days, seed = seed)
+            user = bench_users[0]
+            subject = Subject.objects.filter(user = user).first()
+
+            client = APIClient()
+            client.force_authenticate(user = user)
+
+            bench('status', lambda: subject.current_status)
+            bench('dashboard_cold', lambda: (cache.clear(), client.get("/api/dashboard/")))
+            etag = client.get("/api/dashboard/")["ETag"]
+            bench('dashboard_warm', lambda: client.get("/api/dashboard/", HTTP_IF_NONE_MATCH = etag))
+
+            subject_ids = list(Subject.objects.filter(user = user).values_list('id', flat = True))
+            plans = [
+                [{"subject_id": subject_ids[(p + i) % len(subject_ids)], "action": "SKIP" if (i + p) % 3 else "ATTEND", "weight": 1}
+                 for i in range(100)]
+                for p in range(20)
+            ]
+            forecast = lambda: client.post("/api/forecast/", {"plans": plans, "include_steps": False}, format = "json")
+            bench('forecast', lambda: (cache.clear(), forecast_memo.clear(), forecast()))
+            bench('forecast_memo', forecast)
+            bench('safe_skips', lambda: client.get("/api/attendance/safe-skips/"))
+
+            report = generate_report_csv(csv_rows, seed = seed)
+            bench('parse_csv', lambda: parse_attendance_csv(io.BytesIO(report)))
+
+            session_log = generate_session_log_csv(csv_rows, subjects, seed = seed).decode("utf-8")
+            importer = generate_dataset(1, 0, 0, prefix = "bench_import")[0]
+            bench('import', lambda: import_attendance_data(importer, session_log), runs = 1)
+
+            raise _Rollback
+    except _Rollback:
+        pass
+    finally:
+        cache.clear()
+        forecast_memo.clear()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "dataset": {"users": users, "subjects": subjects, "days": days, "csv_rows": csv_rows, "seed": seed},
+            "database": connection.vendor,
+            "django": django.get_version(),
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+
+def check_budgets(report):
+    """Raises BudgetExceeded listing every benchmark that ran more queries than allowed."""
+    over = [f"{name}: {r['queries']} queries (budget {r['budget']})" for name, r in report['results'].items() if not r['ok']]
+    if over:
+        raise BudgetExceeded("; ".join(over))
+
+
+def write_report(report, path):
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent = 2)
@@ -0,0 +1,141 @@
+"""
+Per-user data versions for cached read models (dashboard and friends).
+
+Every write that changes what a user sees bumps their version once the transaction commits.
+Cached payloads are stored under the version they were built from, so a bump invalidates all of
+them at once without having to know which keys exist. The version doubles as the ETag.
+
+Versions only reach every worker through a shared cache. On the per-process LocMemCache default
+they expire after DATA_VERSION_TTL seconds, so a worker that missed a bump serves stale data (or a
+304) for at most that long; core.checks warns when that default meets several workers.
+
+Writes that change past history rather than append to it (edited or deleted logs, re-weighted
+session types, compaction) also bump a history version. Read models that extend themselves with
+new logs only (the trends index) rebuild from scratch when it moves.
+
+TTLCache is the bounded in-process LRU used where even a cache round trip is too much (users
+behind JWT auth, forecast results).
+"""
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'attendance:version:{user_id}'
+HISTORY_KEY = 'attendance:history:{user_id}'
+
+
+def version_timeout():
+    """None (until the next bump) on a shared cache; DATA_VERSION_TTL seconds on a per-process one."""
+    return getattr(settings, 'DATA_VERSION_TTL', None)
+
+
+def data_version(user_id):
+    """(version, modified_at unix seconds) for the user. Created on first use; never a DB query."""
+    key = VERSION_KEY.format(user_id = user_id)
+    current = cache.get(key)
+    if current is None:
+        # A fresh nanosecond stamp, so an evicted version never collides with one handed out before.
+        current = (time.time_ns(), time.time())
+        if not cache.add(key, current, timeout = version_timeout()):
+            current = cache.get(key, current)
+    return current
+
+
+async def adata_version(user_id):
+    """data_version for async views, through the cache's async API."""
+    key = VERSION_KEY.format(user_id = user_id)
+    current = await cache.aget(key)
+    if current is None:
+        current = (time.time_ns(), time.time())
+        if not await cache.aadd(key, current, timeout = version_timeout()):
+            current = await cache.aget(key, current)
+    return current
+
+
+def _bump(user_id):
+    cache.set(VERSION_KEY.format(user_id = user_id), (time.time_ns(), time.time()), timeout = version_timeout())
+
+
+def bump_data_version(*user_ids):
+    """Invalidates cached payloads for these users after the current transaction commits."""
+    for user_id in set(user_ids):
+        if user_id is not None:
+            transaction.on_commit(lambda user_id = user_id: _bump(user_id))
+
+
+def history_version(user_id):
+    """Stamp of the user's last history rewrite. Created on first use; never a DB query."""
+    key = HISTORY_KEY.format(user_id = user_id)
+    current = cache.get(key)
+    if current is None:
+        current = time.time_ns()
+        if not cache.add(key, current, timeout = version_timeout()):
+            current = cache.get(key, current)
+    return current
+
+
+def _bump_history(user_id):
+    cache.set(HISTORY_KEY.format(user_id = user_id), time.time_ns(), timeout = version_timeout())
+
+
+def bump_history_version(*user_ids):
+    """After the current transaction commits: these users' past logs changed (not just new ones). Implies bump_data_version."""
+    bump_data_version(*user_ids)
+    for user_id in set(user_ids):
+        if user_id is not None:
+            transaction.on_commit(lambda user_id = user_id: _bump_history(user_id))
+
+
+def versioned_key(prefix, user_id, version):
+    return f'{prefix}:{user_id}:{version}'
+
+
+class TTLCache:
+    """Thread-safe in-process LRU with a per-entry TTL, counting hits, misses and evictions."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default = None, count = True):
+        """The live value for key (refreshing its LRU position), else default. count = False keeps it out of the stats."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += count
+                return default
+            self._entries.move_to_end(key)
+            self.hits += count
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last = False)
+                self.evictions += 1
+
+    def discard(self, predicate):
+        """Drops every entry whose key matches predicate."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
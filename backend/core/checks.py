@@ -0,0 +1,29 @@
+import os
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_local_cache_with_workers(app_configs, **kwargs):
+    """
+    Data versions (dashboard ETags, cached read models) live in the default cache. A per-process
+    LocMemCache under several workers means a write seen by one worker is invisible to the rest.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    try:
+        workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+    except ValueError:
+        workers = 1
+    if not backend.endswith('LocMemCache') or workers <= 1:
+        return []
+
+    ttl = getattr(settings, 'DATA_VERSION_TTL', None)
+    return [Warning(
+        f"The default cache is per-process LocMemCache but WEB_CONCURRENCY is {workers}.",
+        hint = (
+            "Set CACHE_BACKEND to a shared backend (Redis, DatabaseCache) so every worker sees data-version bumps. "
+            + (f"Until then other workers can serve stale dashboards or 304s for up to DATA_VERSION_TTL ({ttl}s)."
+               if ttl else "DATA_VERSION_TTL is off, so other workers can serve stale dashboards indefinitely.")
+        ),
+        id = 'core.W001',
+    )]
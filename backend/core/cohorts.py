@@ -0,0 +1,177 @@
+"""
+Cohort analytics: attendance across every student taking the same course (Subject.code).
+
+Subjects belong to one user, so a course is every Subject sharing a code. refresh_cohorts() builds
+one CohortSnapshot row per code with a handful of set-based queries, never a query per student:
+- each subject's hours come from its rollups (the ledger's per-SessionType GROUP BY, kept
+  current); percentage bands, below-target counts and percentage sums are computed in SQL,
+  grouped by (code, band), in integer centi-hours so band edges and targets compare exactly;
+- the weekly trend is one GROUP BY (code, week) over AttendanceLog joined to SessionType and
+  Subject, plus compacted months (AttendanceSummary) in the week of their last class day.
+Staff dashboards then read a single row per code.
+
+The default refresh is incremental: only codes with a subject edited, or rollups updated, since the
+last snapshot are rebuilt, plus codes whose subject count changed (subjects deleted or moved to
+another code). Compaction leaves the counters alone but moves hours between weeks, so it marks its
+rollups with touch_rollups().
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import BigIntegerField, Case, Count, ExpressionWrapper, F, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Least, Round, TruncWeek
+from django.utils import timezone
+from .forecast import CENTI, percentage, to_centi
+from .models import AttendanceLog, AttendanceRollup, AttendanceSummary, CohortSnapshot, Subject, COUNTED_STATUSES, HOURS_FIELD, hours_sum
+
+BANDS = 10
+
+
+def centi(expression):
+    return Cast(Round(expression * Value(CENTI)), IntegerField())
+
+
+def rollup_total(field):
+    """Sum of one rollup counter for the outer Subject, 0 when it has none."""
+    totals = AttendanceRollup.objects.filter(subject = OuterRef('pk')).order_by().values('subject').annotate(total = Sum(field)).values('total')
+    return Coalesce(Subquery(totals, output_field = HOURS_FIELD), Value(Decimal('0.00')), output_field = HOURS_FIELD)
+
+
+def coded_subjects(codes = None):
+    subjects = Subject.objects.exclude(code__isnull = True).exclude(code = '')
+    return subjects.filter(code__in = codes) if codes is not None else subjects
+
+
+def band_counts(codes = None):
+    """One row per (code, band): students, how many are below their target, and their percentage sum."""
+    subjects = coded_subjects(codes).annotate(
+        attended = centi(rollup_total('attended_hours')),
+        conducted = centi(rollup_total('conducted_hours')),
+        target = centi(F('target_percentage')),
+    ).annotate(
+        # attended / conducted < target / 10000, cross-multiplied to stay in integers. In 64 bits:
+        # both products pass 2**31 from about 2,150 hours.
+        scaled = ExpressionWrapper(Cast('attended', BigIntegerField()) * Value(100 * CENTI), output_field = BigIntegerField()),
+        threshold = ExpressionWrapper(Cast('target', BigIntegerField()) * F('conducted'), output_field = BigIntegerField()),
+        # Nothing conducted reads as 100%, as everywhere else.
+        band = Case(
+            When(conducted = 0, then = Value(BANDS - 1)),
+            default = Least(F('attended') * Value(BANDS) / F('conducted'), Value(BANDS - 1)),
+            output_field = IntegerField()
+        ),
+        ratio = Case(
+            When(conducted = 0, then = Value(100.0)),
+            default = ExpressionWrapper(F('attended') * Value(100.0) / F('conducted'), output_field = FloatField()),
+            output_field = FloatField()
+        ),
+    )
+    return subjects.values('code', 'band').annotate(
+        students = Count('id'),
+        below = Count('id', filter = Q(conducted__gt = 0, scaled__lt = F('threshold'))),
+        ratio_sum = Sum('ratio'),
+    ).order_by()
+
+
+def weekly_hours(codes = None):
+    """{code: {week: [attended centi, conducted centi]}} from the raw logs and the compacted months."""
+    subjects = coded_subjects(codes)
+    logs = AttendanceLog.objects.filter(status__in = COUNTED_STATUSES, session_type__subject__in = subjects)
+    summaries = AttendanceSummary.objects.filter(session_type__subject__in = subjects)
+
+    rows = logs.annotate(code = F('session_type__subject__code'), week = TruncWeek('date')).values('code', 'week').annotate(
+        attended = hours_sum('session_type__duration_hours', status = 'PRESENT'),
+        conducted = hours_sum('session_type__duration_hours'),
+    ).order_by().values_list('code', 'week', 'attended', 'conducted')
+    compacted = summaries.annotate(code = F('session_type__subject__code'), week = TruncWeek('last_date')).values('code', 'week').annotate(
+        attended = Sum('attended_hours'),
+        conducted = Sum('conducted_hours'),
+    ).order_by().values_list('code', 'week', 'attended', 'conducted')
+
+    weeks = {}
+    for source in (rows, compacted):
+        for code, week, attended, conducted in source:
+            totals = weeks.setdefault(code, {}).setdefault(week, [0, 0])
+            totals[0] += to_centi(attended)
+            totals[1] += to_centi(conducted)
+    return weeks
+
+
+def build_snapshots(codes = None, now = None):
+    """Unsaved CohortSnapshot rows for `codes` (every code when None)."""
+    now = now or timezone.now()
+    snapshots = {}
+    for row in band_counts(codes):
+        snapshot = snapshots.get(row['code'])
+        if snapshot is None:
+            snapshot = snapshots[row['code']] = CohortSnapshot(code = row['code'], students = 0, below_target = 0, histogram = [0] * BANDS, refreshed_at = now)
+            snapshot.ratio_sum = 0.0
+        snapshot.students += row['students']
+        snapshot.below_target += row['below']
+        snapshot.histogram[row['band']] += row['students']
+        snapshot.ratio_sum += row['ratio_sum']
+
+    weeks = weekly_hours(codes)
+    for code, snapshot in snapshots.items():
+        snapshot.mean_percentage = Decimal(str(round(snapshot.ratio_sum / snapshot.students, 2)))
+        snapshot.weekly = [{
+            "week": week.isoformat(),
+            "attended": attended / CENTI,
+            "conducted": conducted / CENTI,
+            "percentage": percentage(attended, conducted),
+        } for week, (attended, conducted) in sorted(weeks.get(code, {}).items())]
+    return snapshots
+
+
+def touch_rollups(session_type_ids, now = None):
+    """Marks the codes of `session_type_ids` as touched (see touched_codes) without changing any counter."""
+    AttendanceRollup.objects.filter(session_type_id__in = session_type_ids).update(updated_at = now or timezone.now())
+
+
+def touched_codes(since):
+    """Codes whose snapshot may be stale: edits or attendance since `since`, or a changed subject count."""
+    changed = set(coded_subjects().filter(Q(updated_at__gt = since) | Q(rollups__updated_at__gt = since)).values_list('code', flat = True).distinct())
+    current = dict(coded_subjects().values('code').annotate(n = Count('id')).order_by().values_list('code', 'n'))
+    stored = dict(CohortSnapshot.objects.values_list('code', 'students'))
+    return changed | {code for code in current.keys() | stored.keys() if current.get(code) != stored.get(code)}
+
+
+def refresh_cohorts(full = False):
+    """
+    Rebuilds the snapshots of every code (full, or when there are none yet) or of the touched ones.
+    Returns the refreshed codes. Snapshots of codes nobody takes any more are deleted.
+    """
+    started = timezone.now()
+    since = None if full else CohortSnapshot.objects.aggregate(since = Max('refreshed_at'))['since']
+    codes = None if since is None else touched_codes(since)
+    if codes is not None and not codes:
+        return []
+
+    snapshots = build_snapshots(codes, started)
+    with transaction.atomic():
+        stale = CohortSnapshot.objects.exclude(code__in = list(snapshots))
+        if codes is not None:
+            stale = stale.filter(code__in = codes)
+        stale.delete()
+        CohortSnapshot.objects.bulk_create(
+            snapshots.values(),
+            batch_size = 500,
+            update_conflicts = True,
+            unique_fields = ['code'],
+            update_fields = ['students', 'below_target', 'mean_percentage', 'histogram', 'weekly', 'refreshed_at'],
+        )
+    return sorted(codes if codes is not None else snapshots)
+
+
+def cohort_payload(snapshot, details = True):
+    payload = {
+        "code": snapshot.code,
+        "students": snapshot.students,
+        "below_target": snapshot.below_target,
+        "mean_percentage": float(snapshot.mean_percentage),
+        "refreshed_at": snapshot.refreshed_at.isoformat(),
+    }
+    if details:
+        payload["histogram"] = [
+            {"from": band * 100 // BANDS, "to": (band + 1) * 100 // BANDS, "students": n} for band, n in enumerate(snapshot.histogram)
+        ]
+        payload["weekly"] = snapshot.weekly
+    return payload
@@ -0,0 +1,216 @@
+"""
+Compaction of old AttendanceLog history into monthly AttendanceSummary rows.
+
+Logs dated before a month boundary are folded, per SessionType and month, into present / absent /
+cancelled counts and hours, then deleted. The raw rows are always written first, to
+<ATTENDANCE_ARCHIVE_DIR>/<user id>/<cutoff month>-<timestamp>.ndjson.gz: nothing is compacted
+without an archive.
+
+What reads what afterwards:
+- rollups (status, dashboard, forecast, safe skips, timetable) are untouched, and from_ledger
+  adds the summaries, so rebuild / verify still agree with them;
+- trends replay the archived rows before the live ones, so every point and rolling window is
+  unchanged. Only if the archive no longer matches the summaries (files removed by hand) do they
+  fall back to placing a compacted month's hours on its last class day;
+- exports stream the archived rows before the live ones, in the same columns.
+Both report the end of the last compacted month (compacted_through): trends in the payload,
+exports in an X-Compacted-Through header, so clients know where the detail stops.
+
+A compacted month is closed: imports skip rows dated in it and marking attendance there fails.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import date as date_cls, timedelta
+from itertools import islice
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .cache import bump_history_version
+from .cohorts import touch_rollups
+from .models import AttendanceLog, AttendanceSummary, SessionType, to_hours
+
+ARCHIVE_FIELDS = ('id', 'session_type_id', 'date', 'slot', 'status', 'remark')
+ARCHIVE_PATTERN = '*.ndjson.gz'
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def month_start(day):
+    return day.replace(day = 1)
+
+
+def month_end(day):
+    return months_before(day, -1) - timedelta(days = 1)
+
+
+def months_before(day, months):
+    """First day of the month `months` months before `day`'s month."""
+    index = day.year * 12 + day.month - 1 - months
+    return date_cls(index // 12, index % 12 + 1, 1)
+
+
+def archive_dir():
+    return Path(getattr(settings, 'ATTENDANCE_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def archive_lines(logs, chunk_size):
+    for row in logs.order_by('date', 'slot', 'id').values_list(*ARCHIVE_FIELDS).iterator(chunk_size = chunk_size):
+        record = dict(zip(ARCHIVE_FIELDS, row))
+        record['date'] = record['date'].isoformat()
+        yield (json.dumps(record, separators = (',', ':')) + '\n').encode('utf-8')
+
+
+def write_archive(user_id, cutoff, logs, chunk_size = DEFAULT_CHUNK_SIZE):
+    """
+    Gzipped NDJSON of `logs`, written under a temporary name. Returns the temporary and the final
+    path; the caller renames once the deletion has committed, so readers never see a half file.
+    """
+    folder = archive_dir() / str(user_id)
+    folder.mkdir(parents = True, exist_ok = True)
+    final = folder / f'{cutoff:%Y-%m}-{time.time_ns()}.ndjson.gz'
+    partial = final.with_name(final.name + '.tmp')
+    with gzip.open(partial, 'wb') as fh:
+        fh.writelines(archive_lines(logs, chunk_size))
+    return partial, final
+
+
+def read_archive(user_id = None):
+    """Archived log records of one user (or every user, by user id) in the order they were written."""
+    root = archive_dir()
+    if user_id is None:
+        folders = sorted((p for p in root.iterdir() if p.name.isdigit()), key = lambda p: int(p.name)) if root.is_dir() else []
+    else:
+        folders = [root / str(user_id)]
+    for folder in folders:
+        for path in sorted(folder.glob(ARCHIVE_PATTERN)):
+            with gzip.open(path, 'rt', encoding = 'utf-8') as fh:
+                for line in fh:
+                    record = json.loads(line)
+                    record['date'] = date_cls.fromisoformat(record['date'])
+                    yield record
+
+
+def archived_rows(user_id, columns, chunk_size = DEFAULT_CHUNK_SIZE):
+    """
+    Archived records as export row tuples for `columns` (AttendanceLog paths). Session type and
+    subject columns are looked up per chunk, so the rows read exactly as the live ones would.
+    Records whose session type has since been deleted are dropped, like their logs would have been.
+    """
+    related = [path.removeprefix('session_type__') for _, path in columns if path.startswith('session_type__')]
+    known = {}
+    records = read_archive(user_id)
+    while chunk := list(islice(records, chunk_size)):
+        missing = {record['session_type_id'] for record in chunk} - known.keys()
+        if missing:
+            for st_id, *values in SessionType.objects.filter(pk__in = missing).values_list('id', *related):
+                known[st_id] = dict(zip(related, values))
+        for record in chunk:
+            values = known.get(record['session_type_id'])
+            if values is not None:
+                yield tuple(
+                    values[path.removeprefix('session_type__')] if path.startswith('session_type__') else record[path]
+                    for _, path in columns
+                )
+
+
+def compactable_logs(user, cutoff):
+    return AttendanceLog.objects.filter(session_type__subject__user = user, date__lt = month_start(cutoff)).order_by()
+
+
+def monthly_counts(logs):
+    """{(session_type_id, month): {status: count}} and {(session_type_id, month): last date} in one GROUP BY."""
+    monthly = {}
+    last_dates = {}
+    grouped = logs.annotate(month = TruncMonth('date')).values('session_type_id', 'month', 'status').annotate(n = Count('id'), last_date = Max('date'))
+    for row in grouped:
+        key = (row['session_type_id'], row['month'])
+        monthly.setdefault(key, {'PRESENT': 0, 'ABSENT': 0, 'CANCELLED': 0})[row['status']] += row['n']
+        last_dates[key] = max(last_dates.get(key, row['last_date']), row['last_date'])
+    return monthly, last_dates
+
+
+def compact_user(user, cutoff, dry_run = False, chunk_size = DEFAULT_CHUNK_SIZE):
+    """
+    Archives `user`'s logs dated before the month of `cutoff`, folds them into AttendanceSummary
+    rows and deletes them, in one transaction. Returns {"logs", "summaries", "archive"}.
+    """
+    cutoff = month_start(cutoff)
+    logs = compactable_logs(user, cutoff)
+    # Pinned to the ids seen now: a log added meanwhile stays raw instead of being deleted uncounted.
+    last_id = logs.aggregate(last_id = Max('id'))['last_id']
+    if last_id is None:
+        return {"logs": 0, "summaries": 0, "archive": None}
+    logs = logs.filter(id__lte = last_id)
+
+    if dry_run:
+        monthly, _ = monthly_counts(logs)
+        return {"logs": sum(sum(counts.values()) for counts in monthly.values()), "summaries": len(monthly), "archive": None}
+
+    partial = final = None
+    try:
+        with transaction.atomic():
+            monthly, last_dates = monthly_counts(logs)
+            partial, final = write_archive(user.pk, cutoff, logs, chunk_size)
+
+            type_ids = {st_id for st_id, _ in monthly}
+            durations = dict(SessionType.objects.filter(pk__in = type_ids).values_list('id', 'duration_hours'))
+            # Months compacted before (back-dated logs added since) are merged, not overwritten.
+            existing = {
+                (s.session_type_id, s.month): s
+                for s in AttendanceSummary.objects.filter(session_type_id__in = type_ids, month__in = {m for _, m in monthly})
+            }
+            now = timezone.now()
+            summaries = []
+            for (st_id, month), counts in monthly.items():
+                before = existing.get((st_id, month))
+                present = counts['PRESENT'] + (before.present_count if before else 0)
+                absent = counts['ABSENT'] + (before.absent_count if before else 0)
+                duration = to_hours(durations[st_id])
+                summaries.append(AttendanceSummary(
+                    session_type_id = st_id,
+                    month = month,
+                    last_date = max(last_dates[(st_id, month)], before.last_date) if before else last_dates[(st_id, month)],
+                    present_count = present,
+                    absent_count = absent,
+                    cancelled_count = counts['CANCELLED'] + (before.cancelled_count if before else 0),
+                    attended_hours = duration * present,
+                    conducted_hours = duration * (present + absent),
+                    compacted_at = now,
+                ))
+            AttendanceSummary.objects.bulk_create(
+                summaries,
+                batch_size = 500,
+                update_conflicts = True,
+                unique_fields = ['session_type', 'month'],
+                update_fields = ['last_date', 'present_count', 'absent_count', 'cancelled_count', 'attended_hours', 'conducted_hours', 'compacted_at'],
+            )
+            # Totals are unchanged, so rollups stay valid; trends and exports read the archive from now on.
+            deleted, _ = logs.delete()
+            # Cohort weekly trends now see these hours on each month's last class day.
+            touch_rollups(type_ids, now)
+            bump_history_version(user.pk)
+    except BaseException:
+        if partial is not None and partial.exists():
+            partial.unlink()
+        raise
+
+    os.replace(partial, final)
+    return {"logs": deleted, "summaries": len(summaries), "archive": str(final)}
+
+
+def compaction_summaries(user):
+    """The user's compacted months for trends: (last_date, subject_id, attended_hours, conducted_hours), by date."""
+    return AttendanceSummary.objects.filter(session_type__subject__user = user).order_by('last_date', 'id').values_list(
+        'last_date', 'session_type__subject_id', 'attended_hours', 'conducted_hours'
+    )
+
+
+def compacted_through(user = None):
+    """Last day of the latest compacted month of `user` (of anyone, when None), or None if nothing was compacted."""
+    summaries = AttendanceSummary.objects.all() if user is None else AttendanceSummary.objects.filter(session_type__subject__user = user)
+    month = summaries.aggregate(month = Max('month'))['month']
+    return month_end(month) if month else None
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from .cache import versioned_key
+from .forecast import CENTI, percentage, to_centi
+from .models import Subject
+
+CACHE_PREFIX = 'dashboard'
+
+
+def subject_status(subject, details = None):
+    """Dashboard entry for a Subject annotated by with_attendance() (or given current_status_details)."""
+    details = details or {'attended_hours': subject.attended_hours, 'conducted_hours': subject.conducted_hours}
+    attended, conducted = to_centi(details['attended_hours']), to_centi(details['conducted_hours'])
+    return {
+        "id": subject.id,
+        "name": subject.name,
+        "code": subject.code,
+        "attended": attended / CENTI,
+        "conducted": conducted / CENTI,
+        "percentage": percentage(attended, conducted),
+        "target": float(subject.target_percentage),
+    }
+
+
+def dashboard_payload(subjects):
+    total_attended = sum(to_centi(entry["attended"]) for entry in subjects)
+    total_conducted = sum(to_centi(entry["conducted"]) for entry in subjects)
+
+    return {
+        "global": {
+            "attended": total_attended / CENTI,
+            "conducted": total_conducted / CENTI,
+            "percentage": percentage(total_attended, total_conducted) if total_conducted else 0,
+        },
+        "subjects": subjects,
+    }
+
+
+def dashboard_subjects(user):
+    return Subject.objects.filter(user = user).with_attendance().order_by('name')
+
+
+def build_dashboard(user):
+    """Global and per-subject summary from the stored models: one rollup-backed query."""
+    return dashboard_payload([subject_status(s) for s in dashboard_subjects(user)])
+
+
+async def abuild_dashboard(user):
+    return dashboard_payload([subject_status(s) async for s in dashboard_subjects(user)])
+
+
+def cached_dashboard(user, version):
+    """The payload for `version`, built at most once per version."""
+    key = versioned_key(CACHE_PREFIX, user.pk, version)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_dashboard(user)
+        cache.set(key, payload)
+    return payload
+
+
+async def acached_dashboard(user, version):
+    key = versioned_key(CACHE_PREFIX, user.pk, version)
+    payload = await cache.aget(key)
+    if payload is None:
+        payload = await abuild_dashboard(user)
+        await cache.aset(key, payload)
+    return payload
+
+
+def dashboard_etag(user_id, version):
+    return f'"dash-{user_id}-{version}"'
@@ -0,0 +1,140 @@
+"""
+Streaming exports of attendance history.
+
+Rows come from one joined query read with .iterator(chunk_size), which uses a server-side cursor
+on PostgreSQL, and are encoded into ~64 KB chunks as they arrive. Nothing holds more than one
+chunk of rows, so memory stays flat from a hundred rows to millions, and the header goes out
+before the first row is fetched. CSV or NDJSON, optionally gzipped on the fly.
+
+Compacted history (see core.compaction) is read back from the archive files and
+streamed ahead of the live rows, in the same columns.
+"""
+import csv
+import io
+import json
+import zlib
+from itertools import chain
+from asgiref.sync import sync_to_async
+from .compaction import archived_rows
+from .models import AttendanceLog
+
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+DEFAULT_CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+# (output name, queryset path). Staff dumps prepend the owner's username.
+COLUMNS = (
+    ('date', 'date'),
+    ('subject', 'session_type__subject__name'),
+    ('subject_code', 'session_type__subject__code'),
+    ('session_type', 'session_type__name'),
+    ('duration_hours', 'session_type__duration_hours'),
+    ('slot', 'slot'),
+    ('status', 'status'),
+    ('remark', 'remark'),
+)
+USER_COLUMN = ('username', 'session_type__subject__user__username')
+
+
+def export_columns(everyone = False):
+    return (USER_COLUMN,) + COLUMNS if everyone else COLUMNS
+
+
+def export_rows(user = None, chunk_size = DEFAULT_CHUNK_SIZE):
+    """
+    Row tuples for `user`'s history in date order, or every user's in id order when user is None.
+    values_list() over the joined paths is the select_related JOIN without building model instances.
+    Archived (compacted) rows come first: they are all older than the live ones. In the all-users
+    dump they follow archive order (by user, then date) rather than id order.
+    """
+    columns = export_columns(everyone = user is None)
+    logs = AttendanceLog.objects.all()
+    if user is not None:
+        logs = logs.filter(session_type__subject__user = user).order_by('date', 'slot', 'id')
+    else:
+        logs = logs.order_by('id')
+    live = logs.values_list(*(path for _, path in columns)).iterator(chunk_size = chunk_size)
+    return chain(archived_rows(user.pk if user is not None else None, columns, chunk_size), live)
+
+
+def csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(rows, columns):
+    names = [name for name, _ in columns]
+    date_index = names.index('date')
+    hours_index = names.index('duration_hours')
+    lines = []
+    size = 0
+    # The first row goes out on its own so the response starts as soon as the query does.
+    flush_at = 0
+    for row in rows:
+        row = list(row)
+        row[date_index] = row[date_index].isoformat()
+        row[hours_index] = float(row[hours_index])
+        line = json.dumps(dict(zip(names, row)), separators = (',', ':'))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= flush_at:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+            size = 0
+            flush_at = FLUSH_BYTES
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    """Compresses a byte stream as it goes. The first chunk is flushed so the client gets bytes at once."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    first = True
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(user = None, fmt = 'csv', compress = False, chunk_size = DEFAULT_CHUNK_SIZE):
+    """Byte chunks of the export. Raises ValueError, worded for the `type` query param, for an unknown format."""
+    if fmt not in FORMATS:
+        raise ValueError(f"'type' must be one of {', '.join(FORMATS)}.")
+    columns = export_columns(everyone = user is None)
+    encode = csv_chunks if fmt == 'csv' else ndjson_chunks
+    chunks = encode(export_rows(user, chunk_size), columns)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(fmt, compress, everyone = False):
+    name = f"attendance{'-all' if everyone else ''}.{fmt}"
+    return f'{name}.gz' if compress else name
+
+
+async def aiter_chunks(chunks):
+    """
+    Async wrapper for ASGI: Django would otherwise read a sync iterator to the end before sending it.
+    Each chunk is pulled in the request's thread-sensitive worker, where the cursor lives.
+    """
+    chunks = iter(chunks)
+    done = object()
+    while (chunk := await sync_to_async(next)(chunks, done)) is not done:
+        yield chunk
@@ -0,0 +1,422 @@
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
+from itertools import accumulate
+from array import array
+from hashlib import blake2b
+from django.conf import settings
+from django.core.cache import cache
+from .cache import TTLCache, adata_version, data_version, versioned_key
+from .models import Subject, SessionType
+
+try:
+    import prometheus_client
+except ImportError:  # the memo keeps its own counters either way
+    prometheus_client = None
+
+# The cascade runs in integer centi-hours (duration_hours has 2 decimal places),
+# so 100+ steps never accumulate float error and percentages round exactly once.
+CENTI = 100
+ACTIONS = ('ATTEND', 'SKIP')
+
+DEFAULT_MAX_STEPS = 1000
+DEFAULT_MAX_PLANS = 100
+DEFAULT_CACHE_SIZE = 512
+DEFAULT_CACHE_TTL = 300
+SHARED_PLAN_KEY = 'forecast:plan:{digest}'
+
+if prometheus_client is not None:
+    MEMO_LOOKUPS = prometheus_client.Counter(
+        'safeskip_forecast_memo_lookups', 'Forecast plan lookups by outcome.', ['result']
+    )
+
+
+def to_centi(value):
+    """Decimal/float/str hours -> integer centi-hours. Rejects anything that isn't a number."""
+    try:
+        hours = Decimal(str(value)).quantize(Decimal('0.01'), rounding = ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid hours value: {value!r}")
+    return int(hours * CENTI)
+
+
+def percentage(attended, conducted):
+    """Exact attended/conducted ratio as a 2dp percentage (half-up). Nothing conducted reads as 100%."""
+    if conducted == 0:
+        return 100.0
+    # Hundredths of a percent, rounded half-up in integer maths.
+    hundredths = (attended * 10000 * 2 + conducted) // (2 * conducted)
+    return hundredths / 100
+
+
+def baselines_query(user):
+    return Subject.objects.filter(user = user).with_attendance().values_list('id', 'attended_hours', 'conducted_hours')
+
+
+def load_baselines(user):
+    """
+    Attended/conducted centi-hours for every subject of the user, in one query (AttendanceRollup backed).
+    All subjects are loaded, not only the referenced ones, so the global impact is available too.
+    """
+    return {pk: (to_centi(attended), to_centi(conducted)) for pk, attended, conducted in baselines_query(user)}
+
+
+async def aload_baselines(user):
+    return {pk: (to_centi(attended), to_centi(conducted)) async for pk, attended, conducted in baselines_query(user)}
+
+
+def cached_baselines(user):
+    """load_baselines, kept in Django's cache under the user's data version."""
+    key = versioned_key('forecast:baselines', user.pk, data_version(user.pk)[0])
+    baselines = cache.get(key)
+    if baselines is None:
+        baselines = load_baselines(user)
+        cache.set(key, baselines)
+    return baselines
+
+
+async def acached_baselines(user):
+    key = versioned_key('forecast:baselines', user.pk, (await adata_version(user.pk))[0])
+    baselines = await cache.aget(key)
+    if baselines is None:
+        baselines = await aload_baselines(user)
+        await cache.aset(key, baselines)
+    return baselines
+
+
+def is_id(value):
+    """JSON integer ids only: bools, strings, lists and objects are rejected, not hashed or coerced."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def referenced_session_types(plans):
+    """Well-formed session_type_ids in the plans; normalize_plan reports the malformed ones."""
+    return {
+        step['session_type_id'] for plan in plans if isinstance(plan, list)
+        for step in plan if isinstance(step, dict) and is_id(step.get('session_type_id')) and step['session_type_id']
+    }
+
+
+def session_weights_query(user, plans):
+    """Durations for any session_type_id referenced by the plans, or None when none are used."""
+    ids = referenced_session_types(plans)
+    if not ids:
+        return None
+    return SessionType.objects.filter(subject__user = user, pk__in = ids).values_list('id', 'subject_id', 'duration_hours')
+
+
+def load_session_weights(user, plans):
+    """Durations for any session_type_id referenced by the plans: one query, skipped when none are used."""
+    rows = session_weights_query(user, plans)
+    return {pk: (subject_id, to_centi(duration)) for pk, subject_id, duration in rows} if rows is not None else {}
+
+
+async def aload_session_weights(user, plans):
+    rows = session_weights_query(user, plans)
+    return {pk: (subject_id, to_centi(duration)) async for pk, subject_id, duration in rows} if rows is not None else {}
+
+
+def session_weights_key(user, plans, version):
+    ids = ','.join(sorted(map(str, referenced_session_types(plans))))
+    return versioned_key(f'forecast:weights:{ids}', user.pk, version) if ids else None
+
+
+def cached_session_weights(user, plans):
+    """load_session_weights, kept in Django's cache under the user's data version."""
+    key = session_weights_key(user, plans, data_version(user.pk)[0])
+    if key is None:
+        return {}
+    weights = cache.get(key)
+    if weights is None:
+        weights = load_session_weights(user, plans)
+        cache.set(key, weights)
+    return weights
+
+
+async def acached_session_weights(user, plans):
+    key = session_weights_key(user, plans, (await adata_version(user.pk))[0])
+    if key is None:
+        return {}
+    weights = await cache.aget(key)
+    if weights is None:
+        weights = await aload_session_weights(user, plans)
+        await cache.aset(key, weights)
+    return weights
+
+
+def normalize_plan(raw_steps, baselines, session_weights):
+    """
+    Validates a list of simulation steps into (subject_id, action, weight_centi, day_name) tuples.
+    A step's weight comes from 'weight', else from its 'session_type_id', else defaults to 1 hour.
+    """
+    if not isinstance(raw_steps, list):
+        raise ValueError("A plan must be a list of simulation steps.")
+    max_steps = getattr(settings, 'FORECAST_MAX_STEPS', DEFAULT_MAX_STEPS)
+    if len(raw_steps) > max_steps:
+        raise ValueError(f"A plan can have at most {max_steps} steps.")
+
+    steps = []
+    for idx, raw in enumerate(raw_steps, start = 1):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Step {idx}: expected an object.")
+
+        subject_id = raw.get('subject_id')
+        weight = None
+        if any(raw.get(field) is not None and not is_id(raw[field]) for field in ('subject_id', 'session_type_id')):
+            raise ValueError(f"Step {idx}: subject_id and session_type_id must be integers.")
+
+        if raw.get('session_type_id'):
+            if raw['session_type_id'] not in session_weights:
+                raise ValueError(f"Step {idx}: unknown session_type_id {raw['session_type_id']}.")
+            st_subject, weight = session_weights[raw['session_type_id']]
+            subject_id = subject_id or st_subject
+            if subject_id != st_subject:
+                raise ValueError(f"Step {idx}: session_type_id does not belong to subject {subject_id}.")
+
+        if subject_id not in baselines:
+            raise ValueError(f"Step {idx}: unknown subject_id {subject_id}.")
+
+        action = str(raw.get('action', '')).upper()
+        if action not in ACTIONS:
+            raise ValueError(f"Step {idx}: action must be one of {', '.join(ACTIONS)}.")
+
+        if raw.get('weight') is not None:
+            weight = to_centi(raw['weight'])
+        if weight is None:
+            weight = CENTI
+        if weight <= 0:
+            raise ValueError(f"Step {idx}: weight must be positive.")
+
+        steps.append((subject_id, action, weight, raw.get('day_name')))
+    return steps
+
+
+class CascadeState:
+    """Where a cascade stands after some steps: their results, per-subject running sums and global totals."""
+    __slots__ = ('results', 'running', 'global_attended', 'global_conducted')
+
+    def __init__(self, results, running, global_attended, global_conducted):
+        self.results = results
+        self.running = running
+        self.global_attended = global_attended
+        self.global_conducted = global_conducted
+
+    @classmethod
+    def initial(cls, baselines):
+        return cls([], {}, sum(a for a, _ in baselines.values()), sum(c for _, c in baselines.values()))
+
+
+def continue_cascade(steps, baselines, state):
+    """
+    Runs steps[len(state.results):] on top of `state` (a cached prefix of the same plan) and returns
+    the state after the whole plan. Deltas go into flat arrays and are turned into running sums
+    with accumulate(), so each step's state is a prefix-sum lookup rather than a fresh baseline
+    computation or query.
+    """
+    offset = len(state.results)
+    pending = steps[offset:]
+    attended_delta = array('q', (weight if action == 'ATTEND' else 0 for _, action, weight, _ in pending))
+    conducted_delta = array('q', (weight for _, _, weight, _ in pending))
+
+    global_att_run = array('q', accumulate(attended_delta, initial = state.global_attended))
+    global_cond_run = array('q', accumulate(conducted_delta, initial = state.global_conducted))
+
+    # Per-subject running sums: the latest prefix value for each subject touched so far.
+    running = dict(state.running)
+    results = list(state.results)
+    for i, (subject_id, action, weight, day_name) in enumerate(pending):
+        base_att, base_cond = running.get(subject_id) or baselines[subject_id]
+        attended = base_att + attended_delta[i]
+        conducted = base_cond + conducted_delta[i]
+        running[subject_id] = (attended, conducted)
+
+        start_att, start_cond = baselines[subject_id]
+        results.append({
+            "step": offset + i + 1,
+            "subject_id": subject_id,
+            "action": action,
+            "weight": weight / CENTI,
+            "day_name": day_name,
+            "subject_impact": {
+                "attended_hours": attended / CENTI,
+                "conducted_hours": conducted / CENTI,
+                "new_percentage": percentage(attended, conducted),
+                "change": round(percentage(attended, conducted) - percentage(start_att, start_cond), 2),
+            },
+            "global_impact": {
+                "attended_hours": global_att_run[i + 1] / CENTI,
+                "conducted_hours": global_cond_run[i + 1] / CENTI,
+                "new_percentage": percentage(global_att_run[i + 1], global_cond_run[i + 1]),
+            },
+        })
+    return CascadeState(results, running, global_att_run[-1], global_cond_run[-1])
+
+
+def run_cascade(steps, baselines):
+    """Cumulative impact of every step of one plan."""
+    return continue_cascade(steps, baselines, CascadeState.initial(baselines)).results
+
+
+class PlanMemo(TTLCache):
+    """
+    Finished cascades keyed by plan digest. A plan's digest chains the digests of its prefixes
+    (h_i = H(h_i-1, step_i), h_0 = fingerprint of the baselines), so a plan that extends a cached one
+    finds that prefix's state and only runs the new steps.
+    """
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self.prefix_hits = 0
+
+    def clear(self):
+        super().clear()
+        self.prefix_hits = 0
+
+    def stats(self):
+        return {**super().stats(), "prefix_hits": self.prefix_hits}
+
+
+forecast_memo = PlanMemo(
+    getattr(settings, 'FORECAST_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    getattr(settings, 'FORECAST_CACHE_TTL', DEFAULT_CACHE_TTL),
+)
+
+
+def plan_digests(steps, baselines):
+    """[h_0, h_1, ..., h_n]: the baselines fingerprint, then the digest of every prefix of the plan."""
+    digest = blake2b(repr(sorted(baselines.items())).encode(), digest_size = 16).digest()
+    digests = [digest]
+    for step in steps:
+        digest = blake2b(digest + repr(step).encode(), digest_size = 16).digest()
+        digests.append(digest)
+    return digests
+
+
+def count_lookup(result):
+    if prometheus_client is not None:
+        MEMO_LOOKUPS.labels(result).inc()
+
+
+def cached_prefix(digests):
+    """State of the longest cached proper prefix of the plan (in this process, then the shared cache), or None."""
+    for n in range(len(digests) - 2, 0, -1):
+        state = forecast_memo.get(digests[n], count = False)
+        if state is not None:
+            return state
+
+    if getattr(settings, 'FORECAST_CACHE_SHARED', False):
+        keys = {SHARED_PLAN_KEY.format(digest = digest.hex()): digest for digest in digests[1:]}
+        found = cache.get_many(keys)
+        if found:
+            # The longest one: every state carries the results of all its steps.
+            key = max(found, key = lambda key: len(found[key].results))
+            forecast_memo.set(keys[key], found[key])
+            return found[key]
+    return None
+
+
+def memo_cascade(steps, baselines):
+    """
+    run_cascade through forecast_memo. Returns the final CascadeState; its results are shared with
+    the memo, so treat them as read-only. Baselines are part of the key, so any change to the
+    user's attendance yields new digests and stale entries simply age out.
+    """
+    digests = plan_digests(steps, baselines)
+    state = forecast_memo.get(digests[-1])
+    if state is not None:
+        count_lookup('hit')
+        return state
+
+    state = cached_prefix(digests)
+    if state is not None and len(state.results) == len(steps):
+        count_lookup('shared')
+        return state
+    if state is not None:
+        forecast_memo.prefix_hits += 1
+    count_lookup('prefix' if state is not None else 'miss')
+
+    state = continue_cascade(steps, baselines, state or CascadeState.initial(baselines))
+    forecast_memo.set(digests[-1], state)
+    if getattr(settings, 'FORECAST_CACHE_SHARED', False):
+        cache.set(SHARED_PLAN_KEY.format(digest = digests[-1].hex()), state, timeout = forecast_memo.ttl)
+    return state
+
+
+def summarize(steps_result, baselines):
+    """Final per-subject and global state after a plan (the last prefix value of each series)."""
+    finals = {}
+    for step in steps_result:
+        finals[step['subject_id']] = step['subject_impact']
+
+    if steps_result:
+        global_final = steps_result[-1]['global_impact']['new_percentage']
+    else:
+        global_final = percentage(sum(a for a, _ in baselines.values()), sum(c for _, c in baselines.values()))
+
+    return {
+        "subjects": [{"subject_id": pk, **impact} for pk, impact in finals.items()],
+        "global_percentage": global_final,
+    }
+
+
+def run_forecast(user, simulations):
+    """Single plan: the /api/forecast/ 'simulations' contract, a list of cumulative step impacts."""
+    baselines = cached_baselines(user)
+    steps = normalize_plan(simulations, baselines, cached_session_weights(user, [simulations]))
+    return memo_cascade(steps, baselines).results
+
+
+async def arun_forecast(user, simulations):
+    baselines = await acached_baselines(user)
+    steps = normalize_plan(simulations, baselines, await acached_session_weights(user, [simulations]))
+    return memo_cascade(steps, baselines).results
+
+
+def name_plans(plans):
+    """Validates the batch shape: [(plan_id, raw_steps)]. Plans may be bare lists or {"id", "simulations"}."""
+    if not isinstance(plans, list):
+        raise ValueError("'plans' must be a list.")
+    max_plans = getattr(settings, 'FORECAST_MAX_PLANS', DEFAULT_MAX_PLANS)
+    if len(plans) > max_plans:
+        raise ValueError(f"At most {max_plans} plans per request.")
+
+    named = []
+    for idx, plan in enumerate(plans):
+        if isinstance(plan, dict):
+            named.append((plan.get('id', idx), plan.get('simulations', [])))
+        else:
+            named.append((idx, plan))
+    return named
+
+
+def evaluate_named_plans(named, baselines, session_weights, include_steps):
+    results = []
+    for plan_id, raw in named:
+        try:
+            steps = normalize_plan(raw, baselines, session_weights)
+        except ValueError as e:
+            raise ValueError(f"Plan {plan_id}: {e}")
+
+        cascade = memo_cascade(steps, baselines).results
+        entry = {"id": plan_id, "summary": summarize(cascade, baselines)}
+        if include_steps:
+            entry["steps"] = cascade
+        results.append(entry)
+    return results
+
+
+def evaluate_plans(user, plans, include_steps = True):
+    """
+    Batch mode: many alternative plans against the same baselines.
+    Baselines and session weights are loaded once for the whole batch (at most two queries, none
+    while the user's data version is unchanged), and every plan goes through forecast_memo.
+    """
+    named = name_plans(plans)
+    baselines = cached_baselines(user)
+    session_weights = cached_session_weights(user, [raw for _, raw in named])
+    return evaluate_named_plans(named, baselines, session_weights, include_steps)
+
+
+async def aevaluate_plans(user, plans, include_steps = True):
+    named = name_plans(plans)
+    baselines = await acached_baselines(user)
+    session_weights = await acached_session_weights(user, [raw for _, raw in named])
+    return evaluate_named_plans(named, baselines, session_weights, include_steps)
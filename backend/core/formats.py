@@ -0,0 +1,214 @@
+"""
+Format profiles for summary attendance reports.
+
+A profile describes one institution's export as data: the header signature that identifies it,
+which columns hold the subject / session type, which count columns mean attended or absent, and
+the hours weight per session type. Detection is keyed on the normalized header and cached, so a
+format seen before skips it entirely. Each upload then gets an extractor closed over the
+resolved column indices: no per-row header lookups, and numbers are parsed with int() first.
+
+Add a format with register_profile(FormatProfile(...)); the header scan fallback always stays
+last and handles anything unrecognised.
+"""
+import logging
+import re
+from functools import lru_cache
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Compiled once, not per row. Only used when a cell isn't already a plain integer.
+NON_NUMERIC = re.compile(r'[^\d.]')
+HEADER_TOKENS = re.compile(r'[a-z]+')
+
+DEFAULT_SESSION_WEIGHTS = (('lab', 3),)
+MIN_ROW_CELLS = 5
+DETECTION_CACHE_SIZE = 256
+
+
+def clean_number(v):
+    """'12', '12.0', '12 hrs', '1,200' -> int. Anything unparseable is 0."""
+    if v.isdigit():
+        return int(v)
+    try:
+        return int(float(NON_NUMERIC.sub('', v)))
+    except ValueError:
+        return 0
+
+
+def to_count(v):
+    """clean_number with the common case (a plain integer, maybe padded) kept off the regex path."""
+    try:
+        return int(v)
+    except ValueError:
+        return clean_number(v.strip())
+
+
+def normalize_header(header_row):
+    # The upload is decoded as utf-8-sig, so a BOM never reaches the first header.
+    return tuple(' '.join(h.lower().split()) for h in header_row)
+
+
+class ColumnLayout:
+    """Resolved column indices for one header. `attended` / `absent` are tuples of count columns."""
+
+    def __init__(self, subject, session_type, attended, absent):
+        self.subject = subject
+        self.session_type = session_type
+        self.attended = tuple(attended)
+        self.absent = tuple(absent)
+
+
+class FormatProfile:
+    """
+    A known export layout. `signature` is the normalized header prefix that identifies it; `columns`
+    names the subject / type headers; `statuses` maps count headers to PRESENT or ABSENT; `weights`
+    is ((keyword, hours), ...) matched against the session type, first match wins, else 1.
+    """
+
+    def __init__(self, name, signature, columns, statuses, weights = None, skip_words = ('total', 'subject')):
+        self.name = name
+        self.signature = tuple(signature)
+        self.columns = columns
+        self.statuses = statuses
+        self.weights = weights
+        self.skip_words = skip_words
+
+    def resolve(self, headers):
+        """ColumnLayout for a normalized header, or None if this profile doesn't describe it."""
+        if headers[:len(self.signature)] != self.signature:
+            return None
+        index = {h: i for i, h in reversed(list(enumerate(headers)))}
+        return ColumnLayout(
+            index[self.columns['subject']],
+            index.get(self.columns.get('type'), -1),
+            [index[h] for h, status in self.statuses.items() if status == 'PRESENT' and h in index],
+            [index[h] for h, status in self.statuses.items() if status == 'ABSENT' and h in index],
+        )
+
+
+class HeaderScanProfile(FormatProfile):
+    """Fallback for unknown exports: finds columns by whole words in the header ('od' never matches 'period')."""
+
+    RULES = (
+        ('subject', lambda t: 'subject' in t and 'code' not in t and 'type' not in t),
+        ('type', lambda t: 'type' in t or 'session' in t),
+        ('present', lambda t: 'present' in t),
+        ('od', lambda t: 'od' in t or ('on' in t and 'duty' in t)),
+        ('makeup', lambda t: 'makeup' in t or ('make' in t and 'up' in t)),
+        ('absent', lambda t: 'absent' in t),
+    )
+
+    def __init__(self):
+        super().__init__('header_scan', (), {}, {})
+
+    def resolve(self, headers):
+        found = {}
+        for i, header in enumerate(headers):
+            tokens = set(HEADER_TOKENS.findall(header))
+            role = next((role for role, rule in self.RULES if rule(tokens)), None)
+            if role is not None:
+                found.setdefault(role, i)
+        if 'subject' not in found or 'present' not in found:
+            return None
+        return ColumnLayout(
+            found['subject'],
+            found.get('type', -1),
+            [found[role] for role in ('present', 'od', 'makeup') if role in found],
+            [found['absent']] if 'absent' in found else [],
+        )
+
+
+STANDARD_REPORT = FormatProfile(
+    name = 'standard_report',
+    signature = ('#', 'subject code', 'subject', 'subject type', 'present', 'od', 'makeup', 'absent'),
+    columns = {'subject': 'subject', 'type': 'subject type'},
+    statuses = {'present': 'PRESENT', 'od': 'PRESENT', 'makeup': 'PRESENT', 'absent': 'ABSENT'},
+)
+
+PROFILES = [STANDARD_REPORT, HeaderScanProfile()]
+
+
+def register_profile(profile):
+    """Adds a profile ahead of the header scan fallback and forgets cached detections."""
+    PROFILES.insert(len(PROFILES) - 1, profile)
+    _detect.cache_clear()
+
+
+def unregister_profile(profile):
+    PROFILES.remove(profile)
+    _detect.cache_clear()
+
+
+@lru_cache(maxsize = DETECTION_CACHE_SIZE)
+def _detect(headers):
+    for profile in PROFILES:
+        layout = profile.resolve(headers)
+        if layout is not None:
+            logger.debug("Attendance report format: %s", profile.name)
+            return profile, layout
+    return None
+
+
+def detect_format(header_row):
+    """(profile, ColumnLayout) for a raw header row. Raises ValueError if no profile can map it."""
+    found = _detect(normalize_header(header_row))
+    if found is None:
+        raise ValueError("Could not map columns. Please use the standard Attendance Report format.")
+    return found
+
+
+def session_weights(profile):
+    return profile.weights or getattr(settings, 'ATTENDANCE_SESSION_WEIGHTS', DEFAULT_SESSION_WEIGHTS)
+
+
+def build_extractor(profile, layout):
+    """
+    row -> subject dict (or None for rows to skip), closed over this layout's column indices and
+    skip words. Weights are memoized per session type name, which repeats on nearly every row.
+    """
+    width = max(layout.subject, layout.session_type, *layout.attended, *layout.absent) + 1
+    min_cells = min(MIN_ROW_CELLS, width)
+    padding = [''] * width
+    subject_col, type_col = layout.subject, layout.session_type
+    attended_cols, absent_cols = layout.attended, layout.absent
+    skip_words = tuple(word.lower() for word in profile.skip_words)
+    rules = tuple((keyword.lower(), weight) for keyword, weight in session_weights(profile))
+    weights = {}
+
+    def weigh(subject_type):
+        key = subject_type.lower()
+        return next((weight for keyword, weight in rules if keyword in key), 1)
+
+    def extract(row):
+        if len(row) < min_cells:
+            return None
+        if len(row) < width:
+            row = row + padding[len(row):]
+
+        name = row[subject_col].strip()
+        lowered = name.lower()
+        if not name or any(word in lowered for word in skip_words):
+            return None
+
+        subject_type = (row[type_col].strip() if type_col != -1 else '') or 'Lecture'
+        weight = weights.get(subject_type)
+        if weight is None:
+            weight = weights[subject_type] = weigh(subject_type)
+
+        attended_hours = sum(to_count(row[i]) for i in attended_cols) * weight
+        conducted_hours = attended_hours + sum(to_count(row[i]) for i in absent_cols) * weight
+
+        # Avoid Division by Zero
+        pct = (attended_hours / conducted_hours * 100) if conducted_hours > 0 else 0
+
+        return {
+            "id": name,
+            "name": name,
+            "type": subject_type,
+            "attended": attended_hours,
+            "conducted": conducted_hours,
+            "percentage": round(pct, 2)
+        }
+
+    return extract
@@ -0,0 +1,192 @@
+"""
+Request-level performance instrumentation.
+
+PerformanceMiddleware times every request, counts its SQL queries and the time spent in them
+(via connection.execute_wrapper), and reports both per resolved URL name:
+  - as a Server-Timing header, readable in the browser's network panel;
+  - as Prometheus histograms, served by metrics_view at /metrics (needs prometheus_client).
+
+Code can mark phases with `with phase('name'):`. Phases are only recorded while a collector is
+active (PERF_PHASE_TIMING in requests, or collect_phases() anywhere else); otherwise they cost a
+context variable lookup. Nested phases report self time, so phases of one request add up.
+The middleware runs natively under both WSGI and ASGI.
+"""
+import os
+from contextlib import ExitStack, contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+try:
+    import prometheus_client
+except ImportError:  # metrics are optional; Server-Timing and phases work without them
+    prometheus_client = None
+
+UNMATCHED = '<unmatched>'
+
+_collector = ContextVar('perf_phases', default = None)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = prometheus_client.Histogram(
+        'safeskip_request_seconds', 'Request latency.', ['view', 'method', 'status']
+    )
+    REQUEST_QUERIES = prometheus_client.Histogram(
+        'safeskip_request_queries', 'SQL queries per request.', ['view'],
+        buckets = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250, 500, 1000)
+    )
+    REQUEST_DB_SECONDS = prometheus_client.Histogram(
+        'safeskip_request_db_seconds', 'Time spent in SQL per request.', ['view']
+    )
+    PHASE_SECONDS = prometheus_client.Histogram(
+        'safeskip_phase_seconds', 'Self time of instrumented phases.', ['view', 'phase']
+    )
+
+
+class QueryStats:
+    """execute_wrapper that counts queries and sums their wall time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        began = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += perf_counter() - began
+
+
+class PhaseCollector:
+    """Accumulated self time per phase name. Re-entering a phase adds to its total."""
+
+    def __init__(self):
+        self.totals = {}
+        self._children = []
+
+    @contextmanager
+    def phase(self, name):
+        self._children.append(0.0)
+        began = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - began
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed - self._children.pop()
+            if self._children:
+                self._children[-1] += elapsed
+
+
+def phase(name):
+    """Times the enclosed block as `name` if a collector is active, else does nothing."""
+    collector = _collector.get()
+    return collector.phase(name) if collector is not None else nullcontext()
+
+
+@contextmanager
+def collect_phases():
+    """Activates phase timing for the enclosed code and yields the collector."""
+    collector = PhaseCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+def server_timing(total, queries, phases = None):
+    """Server-Timing header value (durations in ms)."""
+    parts = [f'total;dur={total * 1000:.2f}', f'db;dur={queries.seconds * 1000:.2f};desc="{queries.count} queries"']
+    for name, seconds in (phases or {}).items():
+        parts.append(f'{name};dur={seconds * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def view_label(request):
+    """Resolved URL name ('upload_csv', 'admin:index', ...). Unresolved paths share one label."""
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name if match is not None else None) or UNMATCHED
+
+
+class PerformanceMiddleware:
+    """Latency, SQL count and DB time per request, tagged by URL name. See the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', True)
+        self.phase_timing = getattr(settings, 'PERF_PHASE_TIMING', False)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @contextmanager
+    def counting_queries(self):
+        """Yields a QueryStats fed by every connection of the current thread."""
+        queries = QueryStats()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(queries))
+            yield queries
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with self.counting_queries() as queries, self.collecting() as phases:
+            began = perf_counter()
+            response = self.get_response(request)
+            total = perf_counter() - began
+        return self.record(request, response, total, queries, phases.totals)
+
+    async def __acall__(self, request):
+        # Connections are per thread and the async ORM runs queries in the request's thread-sensitive
+        # worker, so the query wrappers are installed (and removed) there, not on the event loop.
+        stack = ExitStack()
+        queries = await sync_to_async(stack.enter_context)(self.counting_queries())
+        try:
+            with self.collecting() as phases:
+                began = perf_counter()
+                response = await self.get_response(request)
+                total = perf_counter() - began
+        finally:
+            await sync_to_async(stack.close)()
+        return self.record(request, response, total, queries, phases.totals)
+
+    def collecting(self):
+        return collect_phases() if self.phase_timing else nullcontext(PhaseCollector())
+
+    def record(self, request, response, total, queries, phases):
+        view = view_label(request)
+        if prometheus_client is not None:
+            REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(total)
+            REQUEST_QUERIES.labels(view).observe(queries.count)
+            REQUEST_DB_SECONDS.labels(view).observe(queries.seconds)
+            for name, seconds in phases.items():
+                PHASE_SECONDS.labels(view, name).observe(seconds)
+
+        if self.server_timing:
+            response['Server-Timing'] = server_timing(total, queries, phases)
+        return response
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint. Requires `Authorization: Bearer <METRICS_TOKEN>` when that is set."""
+    if prometheus_client is None:
+        return HttpResponse("prometheus_client is not installed.\n", status = 501, content_type = 'text/plain')
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status = 401)
+
+    registry = prometheus_client.REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Several gunicorn workers: merge the per-process files instead of reporting one worker.
+        from prometheus_client import multiprocess
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type = prometheus_client.CONTENT_TYPE_LATEST)
@@ -0,0 +1,158 @@
+"""
+Background processing for attendance uploads.
+
+An upload is stored on an ImportJob row and handed to the configured executor once the request's
+transaction commits. Executors are plain classes named by ATTENDANCE_IMPORT_EXECUTOR:
+
+- ThreadPoolJobExecutor (default): runs jobs on a small in-process thread pool.
+- DatabaseQueueExecutor: leaves jobs QUEUED for `manage.py run_import_worker` processes to claim.
+- InlineExecutor: runs the job immediately (tests, management commands).
+
+No broker is involved: the ImportJob table is the queue, and jobs are claimed with a conditional
+QUEUED -> RUNNING update so several workers never process the same job.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import File
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import ImportJob
+from .services import process_upload
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXECUTOR = 'core.jobs.ThreadPoolJobExecutor'
+
+
+class InlineExecutor:
+    def submit(self, job_id):
+        run_import_job(job_id)
+
+
+class ThreadPoolJobExecutor:
+    _pool = None
+    _lock = threading.Lock()
+    
+    def submit(self, job_id):
+        with self._lock:
+            if ThreadPoolJobExecutor._pool is None:
+                workers = getattr(settings, 'ATTENDANCE_IMPORT_THREADS', 2)
+                ThreadPoolJobExecutor._pool = ThreadPoolExecutor(max_workers = workers, thread_name_prefix = 'import-job')
+        self._pool.submit(self._run, job_id)
+    
+    @staticmethod
+    def _run(job_id):
+        try:
+            run_import_job(job_id)
+        finally:
+            # Pool threads get their own DB connection; don't leak it between jobs.
+            connection.close()
+
+
+class DatabaseQueueExecutor:
+    def submit(self, job_id):
+        # The QUEUED row is the message; run_import_worker picks it up.
+        pass
+
+
+def get_executor():
+    return import_string(getattr(settings, 'ATTENDANCE_IMPORT_EXECUTOR', DEFAULT_EXECUTOR))()
+
+
+def enqueue_import(user, upload, prune = False):
+    """Stores the upload on a new ImportJob and submits it once the surrounding transaction commits."""
+    job = ImportJob(user = user, file_name = upload.name, file_size = upload.size, prune = prune)
+    job.file.save(upload.name, File(upload), save = False)
+    job.save()
+    
+    transaction.on_commit(lambda: get_executor().submit(job.pk))
+    return job
+
+
+def claim_job(job_id):
+    """QUEUED -> RUNNING as a conditional UPDATE. Returns False if someone else got there first."""
+    return bool(ImportJob.objects.filter(pk = job_id, status = 'QUEUED').update(status = 'RUNNING', started_at = timezone.now()))
+
+
+def claim_next_job():
+    """Oldest QUEUED job, claimed for this worker, or None when the queue is empty."""
+    for job_id in ImportJob.objects.filter(status = 'QUEUED').order_by('created_at').values_list('id', flat = True)[:10]:
+        if claim_job(job_id):
+            return job_id
+    return None
+
+
+def requeue_stale_jobs(older_than):
+    """Jobs left RUNNING by a worker that died go back to QUEUED."""
+    cutoff = timezone.now() - older_than
+    return ImportJob.objects.filter(status = 'RUNNING', started_at__lt = cutoff).update(status = 'QUEUED', started_at = None)
+
+
+def report_progress(job_id, stats):
+    """
+    Writes progress counters while the import's own transaction is still open.
+    The write goes through a separate thread (so a separate connection, in autocommit) so pollers
+    see it immediately. SQLite only allows one writer, so there the counters are set when the job ends.
+    """
+    if connection.vendor == 'sqlite':
+        return
+    
+    def write():
+        try:
+            ImportJob.objects.filter(pk = job_id).update(
+                processed_rows = stats['created'] + stats['updated'] + stats['unchanged'],
+                failed_rows = stats['failed'],
+            )
+        except Exception:
+            logger.warning("Could not record progress for import job %s", job_id, exc_info = True)
+        finally:
+            connection.close()
+    
+    writer = threading.Thread(target = write)
+    writer.start()
+    writer.join()
+
+
+def run_import_job(job_id, claimed = False):
+    """Processes one job end to end. Safe to call for a job another worker already took (it's skipped)."""
+    if not claimed and not claim_job(job_id):
+        return
+    
+    job = ImportJob.objects.select_related('user').get(pk = job_id)
+    try:
+        with job.file.open('rb') as upload:
+            result = process_upload(job.user, upload, prune = job.prune, progress = lambda stats: report_progress(job_id, stats))
+        
+        job.status = 'DONE'
+        job.result = result
+        # Session logs report written rows; summary reports report parsed subjects.
+        written = result.get('created', 0) + result.get('updated', 0) + result.get('unchanged', 0)
+        job.processed_rows = written or len(result.get('subjects', []))
+        job.failed_rows = result.get('failed', 0)
+    except Exception as e:
+        logger.exception("Import job %s failed", job_id)
+        job.status = 'FAILED'
+        job.error = str(e)
+    
+    job.finished_at = timezone.now()
+    job.save(update_fields = ['status', 'result', 'processed_rows', 'failed_rows', 'error', 'finished_at'])
+    job.file.delete(save = False)
+
+
+def job_payload(job):
+    return {
+        "job_id": job.pk,
+        "status": job.status,
+        "file_name": job.file_name,
+        "file_size": job.file_size,
+        "processed_rows": job.processed_rows,
+        "failed_rows": job.failed_rows,
+        "result": job.result,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
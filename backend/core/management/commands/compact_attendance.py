@@ -0,0 +1,58 @@
+from datetime import date as date_cls
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.compaction import DEFAULT_CHUNK_SIZE, archive_dir, compact_user, months_before
+from core.models import AttendanceLog, AttendanceSummary
+
+DEFAULT_MONTHS = 12
+
+
+class Command(BaseCommand):
+    help = (
+        "Archives old AttendanceLog rows as gzipped NDJSON in ATTENDANCE_ARCHIVE_DIR, folds them into monthly "
+        "AttendanceSummary rows (per session type) and deletes them. Only whole months are compacted; status, "
+        "trends and exports are unchanged."
+    )
+    
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument('--months', type = int, help = f"Compact months older than this many months (default {DEFAULT_MONTHS}).")
+        cutoff.add_argument('--before', help = "Compact months before this date's month (YYYY-MM-DD).")
+        cutoff.add_argument('--semester', action = 'store_true', help = "Compact months before each user's current semester started.")
+        parser.add_argument('--user', help = "Limit to one username.")
+        parser.add_argument('--dry-run', action = 'store_true', help = "Only report what would be compacted.")
+        parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = "Rows fetched per round trip while archiving.")
+    
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username = options['user'])
+            if not users.exists():
+                raise CommandError(f"No user named {options['user']!r}.")
+        
+        if options['semester']:
+            users = users.filter(semester__isnull = False).select_related('semester')
+            cutoff_for = lambda user: user.semester.start_date
+        else:
+            try:
+                fixed = date_cls.fromisoformat(options['before']) if options['before'] else months_before(date_cls.today(), options['months'] or DEFAULT_MONTHS)
+            except ValueError:
+                raise CommandError("--before must be YYYY-MM-DD.")
+            cutoff_for = lambda user: fixed
+        
+        logs = summaries = 0
+        for user in users.iterator():
+            result = compact_user(user, cutoff_for(user), options['dry_run'], options['chunk_size'])
+            if result['logs']:
+                logs += result['logs']
+                summaries += result['summaries']
+                archived = f" -> {result['archive']}" if result['archive'] else ""
+                self.stdout.write(f"{user.username}: {result['logs']} logs into {result['summaries']} monthly rows (before {cutoff_for(user):%Y-%m}){archived}")
+        
+        verb = "Would compact" if options['dry_run'] else "Compacted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {logs} logs into {summaries} monthly rows. "
+            f"AttendanceLog now holds {AttendanceLog.objects.count()} rows, AttendanceSummary {AttendanceSummary.objects.count()}."
+        ))
+        if logs and not options['dry_run']:
+            self.stdout.write(f"Archives are in {archive_dir()}.")
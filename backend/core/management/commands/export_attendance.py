@@ -0,0 +1,35 @@
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from core.exports import DEFAULT_CHUNK_SIZE, FORMATS, export_stream
+
+
+class Command(BaseCommand):
+    help = "Streams one user's attendance history (or everyone's with --all) as CSV or NDJSON, optionally gzipped."
+    
+    def add_arguments(self, parser):
+        who = parser.add_mutually_exclusive_group(required = True)
+        who.add_argument('--user', help = "Username to export.")
+        who.add_argument('--all', action = 'store_true', help = "Every user's history (institution-wide dump).")
+        parser.add_argument('--format', choices = FORMATS, default = 'csv')
+        parser.add_argument('--gzip', action = 'store_true')
+        parser.add_argument('--chunk-size', type = int, default = DEFAULT_CHUNK_SIZE, help = "Rows fetched per round trip.")
+        parser.add_argument('--output', help = "Write here instead of stdout.")
+    
+    def handle(self, *args, **options):
+        user = None
+        if not options['all']:
+            user = User.objects.filter(username = options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}.")
+        
+        chunks = export_stream(user, options['format'], options['gzip'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as fh:
+                written = sum(fh.write(chunk) for chunk in chunks)
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}.")
+        else:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from core.benchmarks.data import generate_dataset, generate_report_csv, generate_session_log_csv
+
+
+class Command(BaseCommand):
+    help = "Creates synthetic users/subjects/session types/logs and optionally writes CSV fixtures of a given size."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type = int, default = 10)
+        parser.add_argument('--subjects', type = int, default = 8)
+        parser.add_argument('--days', type = int, default = 120, help = "Semester length in days.")
+        parser.add_argument('--seed', type = int, default = 7)
+        parser.add_argument('--prefix', default = 'bench', help = "Username prefix for generated users.")
+        parser.add_argument('--report-csv', help = "Also write a summary 'Attendance Report.csv' here.")
+        parser.add_argument('--log-csv', help = "Also write a dated per-session CSV here.")
+        parser.add_argument('--csv-rows', type = int, default = 10000)
+    
+    def handle(self, *args, **options):
+        if options['users']:
+            users = generate_dataset(options['users'], options['subjects'], options['days'], seed = options['seed'], prefix = options['prefix'])
+            self.stdout.write(self.style.SUCCESS(f"Created {len(users)} users with {options['subjects']} subjects each."))
+        
+        if options['report_csv']:
+            with open(options['report_csv'], 'wb') as fh:
+                fh.write(generate_report_csv(options['csv_rows'], seed = options['seed']))
+            self.stdout.write(f"Wrote {options['csv_rows']} report rows to {options['report_csv']}")
+        
+        if options['log_csv']:
+            with open(options['log_csv'], 'wb') as fh:
+                fh.write(generate_session_log_csv(options['csv_rows'], options['subjects'], seed = options['seed']))
+            self.stdout.write(f"Wrote {options['csv_rows']} log rows to {options['log_csv']}")
@@ -0,0 +1,47 @@
+import json
+import os
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from core.batch import parse_batch
+
+
+class Command(BaseCommand):
+    help = "Parses many 'Attendance Report.csv' files (or ZIPs / directories of them) in parallel and prints the merged result."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs = '+', help = "CSV files, ZIP archives or directories containing them.")
+        parser.add_argument('--processes', type = int, help = "Worker processes (default: ATTENDANCE_PARSE_PROCESSES or one per CPU).")
+        parser.add_argument('--output', help = "Write the merged JSON here instead of stdout.")
+    
+    def handle(self, *args, **options):
+        if options['processes'] is not None:
+            settings.ATTENDANCE_PARSE_PROCESSES = options['processes']
+        
+        paths = []
+        for path in options['paths']:
+            if os.path.isdir(path):
+                paths.extend(sorted(
+                    os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(('.csv', '.zip'))
+                ))
+            elif os.path.isfile(path):
+                paths.append(path)
+            else:
+                raise CommandError(f"No such file or directory: {path}")
+        
+        with ExitStack() as stack:
+            uploads = [File(stack.enter_context(open(path, 'rb')), name = os.path.basename(path)) for path in paths]
+            try:
+                result = parse_batch(uploads)
+            except ValueError as e:
+                raise CommandError(str(e))
+        
+        payload = json.dumps(result, indent = 2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(payload)
+        else:
+            self.stdout.write(payload)
+        
+        self.stderr.write(f"Parsed {len(result['files']) - result['failed_files']} of {len(result['files'])} files.")
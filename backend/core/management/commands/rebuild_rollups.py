@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import AttendanceRollup, SessionType
+
+
+class Command(BaseCommand):
+    help = "Rebuilds (or with --verify, checks) the AttendanceRollup counters from the raw AttendanceLog ledger."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action = 'store_true', help = "Only report drift, don't write anything.")
+        parser.add_argument('--user', help = "Limit to one username.")
+    
+    def handle(self, *args, **options):
+        session_type_ids = None
+        if options['user']:
+            session_type_ids = list(
+                SessionType.objects.filter(subject__user__username = options['user']).values_list('id', flat = True)
+            )
+        
+        if options['verify']:
+            drift = AttendanceRollup.objects.verify(session_type_ids)
+            for st_id, field, stored, expected in drift:
+                self.stdout.write(f"session_type={st_id} {field}: stored={stored} expected={expected}")
+            if drift:
+                raise CommandError(f"{len(drift)} rollup counters drifted from the ledger. Run without --verify to rebuild.")
+            self.stdout.write(self.style.SUCCESS("All rollups match the ledger."))
+            return
+        
+        rebuilt = AttendanceRollup.objects.rebuild(session_type_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} rollups."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from core.cohorts import refresh_cohorts
+from core.models import CohortSnapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the per-course (subject code) attendance snapshots behind /api/analytics/cohorts/. "
+        "Only courses touched since the last run are recomputed unless --full is given."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action = 'store_true', help = "Recompute every course.")
+    
+    def handle(self, *args, **options):
+        codes = refresh_cohorts(full = options['full'])
+        if not codes:
+            self.stdout.write(self.style.SUCCESS("Every cohort snapshot is up to date."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {len(codes)} cohorts ({', '.join(codes[:20])}{', ...' if len(codes) > 20 else ''}). "
+            f"{CohortSnapshot.objects.count()} snapshots stored."
+        ))
@@ -0,0 +1,39 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmarks.suite import BudgetExceeded, check_budgets, run_suite, write_report
+
+
+class Command(BaseCommand):
+    help = "Times status, parsing, import, dashboard and forecast on a synthetic dataset and enforces SQL query budgets."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type = int, default = 5)
+        parser.add_argument('--subjects', type = int, default = 8)
+        parser.add_argument('--days', type = int, default = 120)
+        parser.add_argument('--csv-rows', type = int, default = 5000)
+        parser.add_argument('--repeat', type = int, default = 5)
+        parser.add_argument('--seed', type = int, default = 7)
+        parser.add_argument('--output', help = "Write the JSON report here (for comparing runs over time).")
+        parser.add_argument('--no-budgets', action = 'store_true', help = "Report only; don't fail on budget overruns.")
+    
+    def handle(self, *args, **options):
+        report = run_suite(
+            users = options['users'], subjects = options['subjects'], days = options['days'],
+            csv_rows = options['csv_rows'], repeat = options['repeat'], seed = options['seed'],
+        )
+        
+        for name, r in report['results'].items():
+            flag = "ok" if r['ok'] else "OVER BUDGET"
+            self.stdout.write(f"{name:<16} median {r['median_ms']:>9.2f} ms  p95 {r['p95_ms']:>9.2f} ms  queries {r['queries']:>3} / {r['budget']}  {flag}")
+        
+        if options['output']:
+            write_report(report, options['output'])
+            self.stdout.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(json.dumps(report['meta']))
+        
+        if not options['no_budgets']:
+            try:
+                check_budgets(report)
+            except BudgetExceeded as e:
+                raise CommandError(f"Query budget exceeded: {e}")
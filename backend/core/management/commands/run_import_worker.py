@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from core.jobs import claim_next_job, requeue_stale_jobs, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Processes queued attendance import jobs by polling the database (use with DatabaseQueueExecutor)."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type = float, default = 2.0, help = "Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action = 'store_true', help = "Drain the queue and exit.")
+        parser.add_argument('--stale-minutes', type = int, default = 30, help = "Requeue RUNNING jobs older than this.")
+    
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes = options['stale_minutes'])
+        
+        while True:
+            requeued = requeue_stale_jobs(stale_after)
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale jobs.")
+            
+            job_id = claim_next_job()
+            while job_id is not None:
+                run_import_job(job_id, claimed = True)
+                self.stdout.write(f"Finished import job {job_id}.")
+                job_id = claim_next_job()
+            
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,65 @@
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.benchmarks.data import generate_dataset
+from core.benchmarks.load import DEFAULT_CONCURRENCY, ENDPOINTS, SERVERS, run_load
+from core.models import Subject
+
+LOAD_USER_PREFIX = "load"
+
+
+class Command(BaseCommand):
+    help = "Load tests an endpoint under gunicorn (WSGI) and uvicorn (ASGI) and reports throughput and p50/p95/p99."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices = list(ENDPOINTS), default = 'dashboard')
+        parser.add_argument('--servers', default = ','.join(SERVERS), help = "Comma-separated: gunicorn,uvicorn")
+        parser.add_argument('--concurrency', default = ','.join(map(str, DEFAULT_CONCURRENCY)))
+        parser.add_argument('--duration', type = float, default = 20, help = "Seconds per concurrency level.")
+        parser.add_argument('--warmup', type = float, default = 3)
+        parser.add_argument('--workers', type = int, help = "Server worker processes (default: CPU count).")
+        parser.add_argument('--port', type = int, default = 8765)
+        parser.add_argument('--subjects', type = int, default = 8)
+        parser.add_argument('--days', type = int, default = 120)
+        parser.add_argument('--output', help = "Write the JSON report here.")
+    
+    def handle(self, *args, **options):
+        servers = [s.strip() for s in options['servers'].split(',') if s.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown servers: {', '.join(sorted(unknown))}")
+        try:
+            levels = [int(c) for c in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers.")
+        
+        # The servers read the real database, so the load user is created once and reused.
+        user = User.objects.filter(username = f"{LOAD_USER_PREFIX}_0").first()
+        if user is None:
+            user = generate_dataset(users = 1, subjects = options['subjects'], days = options['days'], prefix = LOAD_USER_PREFIX)[0]
+        subject = Subject.objects.filter(user = user).order_by('id').first()
+        body = {"simulations": [{"subject_id": subject.id, "action": "SKIP", "weight": 1.0, "day_name": "Monday"}]}
+        
+        try:
+            report = run_load(
+                str(RefreshToken.for_user(user).access_token), endpoint = options['endpoint'], servers = servers,
+                levels = levels, duration = options['duration'], warmup = options['warmup'], workers = options['workers'],
+                port = options['port'], subject_id = subject.id, body = body if options['endpoint'] == 'forecast' else None,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        
+        for server, levels_report in report['results'].items():
+            for level, r in levels_report.items():
+                self.stdout.write(
+                    f"{server:<9} c={level:>5}  {r['throughput_rps']:>9.1f} req/s  p50 {r['p50_ms']} ms  "
+                    f"p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  errors {r['errors']}"
+                )
+        
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent = 2)
+            self.stdout.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(json.dumps(report['meta']))
@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-18 00:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_rollups(apps, schema_editor):
+    SessionType = apps.get_model('core', 'SessionType')
+    AttendanceLog = apps.get_model('core', 'AttendanceLog')
+    AttendanceRollup = apps.get_model('core', 'AttendanceRollup')
+    
+    counts = {}
+    for row in AttendanceLog.objects.order_by().values('session_type_id', 'status').annotate(n=Count('id')):
+        counts[(row['session_type_id'], row['status'])] = row['n']
+    
+    rollups = []
+    for st_id, subject_id, duration in SessionType.objects.values_list('id', 'subject_id', 'duration_hours'):
+        present = counts.get((st_id, 'PRESENT'), 0)
+        absent = counts.get((st_id, 'ABSENT'), 0)
+        duration = Decimal(str(duration))
+        rollups.append(AttendanceRollup(
+            session_type_id=st_id,
+            subject_id=subject_id,
+            present_count=present,
+            absent_count=absent,
+            cancelled_count=counts.get((st_id, 'CANCELLED'), 0),
+            attended_hours=duration * present,
+            conducted_hours=duration * (present + absent),
+        ))
+    AttendanceRollup.objects.bulk_create(rollups, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('attended_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('conducted_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('session_type', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='core.sessiontype')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.subject')),
+            ],
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-18 00:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def number_duplicate_sessions(apps, schema_editor):
+    """Existing same-day duplicates of a session type get slots 0, 1, ... (in insertion order) before the unique constraint."""
+    AttendanceLog = apps.get_model('core', 'AttendanceLog')
+    duplicates = (
+        AttendanceLog.objects.order_by().values('session_type_id', 'date')
+        .annotate(n=Count('id')).filter(n__gt=1)
+    )
+    for dup in duplicates.iterator():
+        ids = AttendanceLog.objects.filter(session_type_id=dup['session_type_id'], date=dup['date']).order_by('id').values_list('id', flat=True)
+        for slot, pk in enumerate(ids):
+            AttendanceLog.objects.filter(pk=pk).update(slot=slot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_attendance_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('SUMMARY', 'Summary report'), ('SESSION_LOG', 'Per-session log')], max_length=12)),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendancelog',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(number_duplicate_sessions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendancelog',
+            constraint=models.UniqueConstraint(fields=('session_type', 'date', 'slot'), name='unique_session_slot'),
+        ),
+        migrations.AddField(
+            model_name='attendanceimport',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_imports', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='attendanceimport',
+            index=models.Index(fields=['user', '-created_at'], name='core_attend_user_id_dde89e_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 00:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='attendancelog',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(fields=['session_type', 'status'], name='log_session_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancelog',
+            index=models.Index(condition=models.Q(('status__in', ('PRESENT', 'ABSENT'))), fields=['session_type', 'date'], name='log_counted_session_date_idx'),
+        ),
+        # Dropped last, once the composite indexes that lead with session_type exist.
+        migrations.AlterField(
+            model_name='attendancelog',
+            name='session_type',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='logs', to='core.sessiontype'),
+        ),
+    ]
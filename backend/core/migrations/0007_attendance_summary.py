@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 01:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_timetable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('last_date', models.DateField()),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('attended_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('conducted_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('compacted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('session_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='core.sessiontype')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('session_type', 'month'), name='unique_summary_month')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 01:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('students', models.PositiveIntegerField(default=0)),
+                ('below_target', models.PositiveIntegerField(default=0)),
+                ('mean_percentage', models.DecimalField(decimal_places=2, default=100, max_digits=5)),
+                ('histogram', models.JSONField(default=list)),
+                ('weekly', models.JSONField(default=list)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
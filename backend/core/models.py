@@ -1,9 +1,74 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
 from django.contrib.auth.models import User
+from django.utils import timezone
 from decimal import Decimal
+from .cache import bump_data_version, bump_history_version
 
 # Create your models here.
 
+# Statuses that count towards conducted hours. CANCELLED classes never happened.
+COUNTED_STATUSES = ('PRESENT', 'ABSENT')
+
+# Sums of DecimalField(max_digits = 4) overflow the column precision, so aggregates get a wider field.
+HOURS_FIELD = models.DecimalField(max_digits = 12, decimal_places = 2)
+# SQLite stores whole-number decimals as INTEGER, so the percentage divides as REAL and casts back.
+RATIO_FIELD = models.DecimalField(max_digits = 12, decimal_places = 6)
+
+
+def to_hours(value):
+    """Normalizes floats/strings/Decimals to 2dp Decimal hours (duration_hours may still be a float before refresh)."""
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def hours_sum(path, **status_filter):
+    """Conditional SUM of weighted hours, 0 instead of NULL when nothing matches."""
+    return Coalesce(
+        Sum(path, filter = Q(**status_filter) if status_filter else None, output_field = HOURS_FIELD),
+        Value(Decimal('0.00')),
+        output_field = HOURS_FIELD
+    )
+
+
+class SubjectQuerySet(models.QuerySet):
+    
+    def with_attendance(self):
+        """
+        Annotates attended_hours, conducted_hours and percentage on every subject in ONE query.
+        Reads the AttendanceRollup counters (one row per SessionType), never the log history.
+        Subjects with nothing conducted yet read as 100%, same as Subject.current_status.
+        """
+        return self.annotate(
+            attended_hours = hours_sum('rollups__attended_hours'),
+            conducted_hours = hours_sum('rollups__conducted_hours'),
+        ).annotate(
+            percentage = Case(
+                When(conducted_hours = 0, then = Value(Decimal('100.00'))),
+                default = Round(Cast(
+                    ExpressionWrapper(F('attended_hours') * Value(100.0) / F('conducted_hours'), output_field = models.FloatField()),
+                    RATIO_FIELD
+                ), 2),
+                output_field = models.DecimalField(max_digits = 5, decimal_places = 2)
+            )
+        )
+
+
+class AttendanceLogQuerySet(models.QuerySet):
+    
+    def hour_totals(self):
+        """Weighted attended/conducted hours for the filtered logs as a single aggregate query."""
+        return self.order_by().aggregate(
+            attended_hours = hours_sum('session_type__duration_hours', status = 'PRESENT'),
+            conducted_hours = hours_sum('session_type__duration_hours', status__in = COUNTED_STATUSES),
+        )
+
+
+def session_type_owners(session_type_ids):
+    """User ids owning these session types, for version bumps."""
+    return list(Subject.objects.filter(session_types__in = session_type_ids).values_list('user_id', flat = True).distinct())
+
+
 class Subject(models.Model):
     """
     Represents a course. Scoped to a User so every subject has their own dashboard.
@@ -13,6 +78,10 @@ class Subject(models.Model):
     code = models.CharField(max_length = 20, blank = True, null = True)
     
     target_percentage = models.DecimalField(default = 75.00, max_digits = 5, decimal_places = 2)
+    # Lets cohort snapshots (core.cohorts) find subjects edited since they were built.
+    updated_at = models.DateTimeField(auto_now = True)
+    
+    objects = SubjectQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.name} ({self.user.username})"
@@ -21,48 +90,29 @@ class Subject(models.Model):
     def current_status(self):
         """Calculates real-time attendance percentage based on weighted hours. Returns a dictionary with details.
         """
+        details = self.current_status_details
         
-        logs = AttendanceLog.objects.filter(session_type__subject = self)
-        
-        total_hours_conducted = Decimal(0.0)
-        total_hours_attended = Decimal(0.0)
-        
-        for log in logs:
-            duration = log.session_type.duration_hours
-            
-            if log.status in ['PRESENT', 'ABSENT']:
-                total_hours_conducted += duration
-                
-            if log.status == 'PRESENT':
-                total_hours_attended += duration
-                
-        if total_hours_conducted == 0:
+        if details['conducted_hours'] == 0:
             return 100.00
         
-        return (total_hours_attended / total_hours_conducted) * 100
+        return (details['attended_hours'] / details['conducted_hours']) * 100
     
     @property
     def current_status_details(self):
         """
         Returns raw numbers for the Forecaster to use.
         """
-        logs = AttendanceLog.objects.filter(session_type__subject = self)
-        total_conducted = Decimal(0.0)
-        total_attended = Decimal(0.0)
-        
-        for log in logs:
-            duration = log.session_type.duration_hours
-            
-            if log.status in ['PRESENT', 'ABSENT']:
-                total_conducted += duration
-                
-            if log.status == 'PRESENT':
-                total_attended += duration
-                
-        return {
-            'attended_hours': total_attended,
-            'conducted_hours': total_conducted
-            }
+        return self.rollups.aggregate(
+            attended_hours = hours_sum('attended_hours'),
+            conducted_hours = hours_sum('conducted_hours'),
+        )
+    
+    async def acurrent_status_details(self):
+        """current_status_details for async views."""
+        return await self.rollups.aaggregate(
+            attended_hours = hours_sum('attended_hours'),
+            conducted_hours = hours_sum('conducted_hours'),
+        )
     
 class SessionType(models.Model):
     """The 'Weights' Configuration.
@@ -73,6 +123,26 @@ class SessionType(models.Model):
     name = models.CharField(max_length = 50)
     duration_hours = models.DecimalField(max_digits = 4, decimal_places = 2, default = 1.0)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_duration = instance.__dict__.get('duration_hours')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        previous = getattr(self, '_loaded_duration', None)
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            # Rollup hours are counts x duration, so a re-weighted session type rescales them in place.
+            if previous is not None and to_hours(previous) != to_hours(self.duration_hours):
+                AttendanceRollup.objects.rescale(self)
+                AttendanceSummary.objects.rescale(self)
+                bump_history_version(*session_type_owners([self.pk]))
+                
+        self._loaded_duration = self.duration_hours
+    
     def __str__(self):
         return f"{self.subject.name} - {self.name} ({self.duration_hours}h)"
     
@@ -85,16 +155,377 @@ class AttendanceLog(models.Model):
         ('ABSENT', 'Absent'),
         ('CANCELLED', 'Cancelled')
     ]
-    session_type = models.ForeignKey(SessionType, on_delete = models.CASCADE, related_name = 'logs')
+    # The composite indexes below all lead with session_type, so the standalone FK index is redundant.
+    session_type = models.ForeignKey(SessionType, on_delete = models.CASCADE, related_name = 'logs', db_index = False)
     date = models.DateField()
+    # Distinguishes several sessions of the same type on one day (0, 1, ...). Part of the row fingerprint.
+    slot = models.PositiveSmallIntegerField(default = 0)
     status = models.CharField(max_length = 10, choices = STATUS_CHOICES)
     
     remark = models.CharField(max_length = 200, blank = True, null = True)
     
+    objects = AttendanceLogQuerySet.as_manager()
+    
     class Meta:
-        ordering = ['-date']
+        # No default ordering: it would add ORDER BY date to every aggregate and rollup scan.
+        # Anything that needs history in order asks for it with order_by().
+        constraints = [
+            # Also serves (session_type, date) range lookups as the leading columns of its index.
+            models.UniqueConstraint(fields = ['session_type', 'date', 'slot'], name = 'unique_session_slot'),
+        ]
+        indexes = [
+            # Covers the per-status GROUP BY of AttendanceRollup.from_ledger without touching the table.
+            models.Index(fields = ['session_type', 'status'], name = 'log_session_status_idx'),
+            # Counted (non-cancelled) history scans, where the backend supports partial indexes.
+            models.Index(
+                fields = ['session_type', 'date'],
+                condition = Q(status__in = COUNTED_STATUSES),
+                name = 'log_counted_session_date_idx'
+            ),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rollup_key = instance._current_rollup_key()
+        return instance
+    
+    def _current_rollup_key(self):
+        if 'session_type_id' not in self.__dict__ or 'status' not in self.__dict__:
+            return None
+        return (self.session_type_id, self.status)
+    
+    def _stored_rollup_key(self):
+        """The (session_type_id, status) this row is currently counted under in AttendanceRollup."""
+        key = getattr(self, '_rollup_key', None)
+        if key is None:
+            key = AttendanceLog.objects.filter(pk = self.pk).values_list('session_type_id', 'status').first()
+        return key
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None if self._state.adding else self._stored_rollup_key()
+            super().save(*args, **kwargs)
+            current = (self.session_type_id, self.status)
+            
+            if previous != current:
+                AttendanceRollup.objects.record(previous, -1, log = self)
+                AttendanceRollup.objects.record(current, +1, log = self)
+            # Any edit (even of the date alone) rewrites history; only a new log is an append.
+            if previous is not None:
+                bump_history_version(*session_type_owners({previous[0], current[0]}))
+                
+        self._rollup_key = current
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = self._stored_rollup_key()
+            result = super().delete(*args, **kwargs)
+            AttendanceRollup.objects.record(previous, -1, log = self)
+            if previous is not None:
+                bump_history_version(*session_type_owners([previous[0]]))
+            
+        self._rollup_key = None
+        return result
         
     def __str__(self):
         return f"{self.date} - {self.session_type} - {self.status}"
+
+
+class AttendanceRollupQuerySet(models.QuerySet):
+    
+    def record(self, key, sign, log = None):
+        """
+        Applies a +1/-1 delta for one (session_type_id, status) ledger row with F() expressions.
+        Called by AttendanceLog.save/delete inside the same transaction as the row change.
+        """
+        if key is None:
+            return
+        
+        session_type_id, status = key
+        session_type = log._state.fields_cache.get('session_type') if log is not None else None
+        if session_type is None or session_type.pk != session_type_id or 'subject' not in session_type._state.fields_cache:
+            session_type = SessionType.objects.select_related('subject').only(
+                'subject_id', 'duration_hours', 'subject__user_id'
+            ).get(pk = session_type_id)
+        
+        hours = to_hours(session_type.duration_hours) * sign
+        changes = {f'{status.lower()}_count': F(f'{status.lower()}_count') + sign, 'updated_at': timezone.now()}
+        if status in COUNTED_STATUSES:
+            changes['conducted_hours'] = F('conducted_hours') + hours
+        if status == 'PRESENT':
+            changes['attended_hours'] = F('attended_hours') + hours
+        
+        if not self.filter(session_type_id = session_type_id).update(**changes):
+            self.get_or_create(session_type_id = session_type_id, defaults = {'subject_id': session_type.subject_id})
+            self.filter(session_type_id = session_type_id).update(**changes)
+        
+        bump_data_version(session_type.subject.user_id)
+    
+    def rescale(self, session_type):
+        duration = to_hours(session_type.duration_hours)
+        self.filter(session_type = session_type).update(
+            attended_hours = F('present_count') * duration,
+            conducted_hours = (F('present_count') + F('absent_count')) * duration,
+            updated_at = timezone.now()
+        )
+    
+    def from_ledger(self, session_type_ids = None):
+        """
+        Recomputes rollups from the raw AttendanceLog ledger with one GROUP BY.
+        Returns unsaved AttendanceRollup rows keyed by session_type_id.
+        """
+        session_types = SessionType.objects.order_by()
+        logs = AttendanceLog.objects.order_by()
+        if session_type_ids is not None:
+            session_types = session_types.filter(pk__in = session_type_ids)
+            logs = logs.filter(session_type_id__in = session_type_ids)
+        
+        counts = {}
+        for row in logs.values('session_type_id', 'status').annotate(n = Count('id')):
+            counts[(row['session_type_id'], row['status'])] = row['n']
+        
+        # Compacted months count exactly like the raw logs they replaced.
+        summaries = AttendanceSummary.objects.order_by()
+        if session_type_ids is not None:
+            summaries = summaries.filter(session_type_id__in = session_type_ids)
+        for row in summaries.values('session_type_id').annotate(
+            present = Sum('present_count'), absent = Sum('absent_count'), cancelled = Sum('cancelled_count')
+        ):
+            for status in ('PRESENT', 'ABSENT', 'CANCELLED'):
+                key = (row['session_type_id'], status)
+                counts[key] = counts.get(key, 0) + row[status.lower()]
+        
+        rollups = {}
+        for st_id, subject_id, duration in session_types.values_list('id', 'subject_id', 'duration_hours'):
+            present = counts.get((st_id, 'PRESENT'), 0)
+            absent = counts.get((st_id, 'ABSENT'), 0)
+            rollups[st_id] = AttendanceRollup(
+                session_type_id = st_id,
+                subject_id = subject_id,
+                present_count = present,
+                absent_count = absent,
+                cancelled_count = counts.get((st_id, 'CANCELLED'), 0),
+                attended_hours = to_hours(duration) * present,
+                conducted_hours = to_hours(duration) * (present + absent),
+            )
+        return rollups
+    
+    def rebuild(self, session_type_ids = None):
+        """Upserts rollups from the ledger. Bulk writers (imports, queryset updates) call this for the rows they touched."""
+        rollups = list(self.from_ledger(session_type_ids).values())
+        now = timezone.now()
+        for rollup in rollups:
+            rollup.updated_at = now
+        
+        self.bulk_create(
+            rollups,
+            batch_size = 500,
+            update_conflicts = True,
+            unique_fields = ['session_type'],
+            update_fields = ['subject', *AttendanceRollup.COUNTER_FIELDS, 'updated_at'],
+        )
+        
+        user_ids = Subject.objects.filter(pk__in = {r.subject_id for r in rollups}).values_list('user_id', flat = True).distinct()
+        bump_data_version(*user_ids)
+        return len(rollups)
+    
+    def verify(self, session_type_ids = None):
+        """Returns [(session_type_id, field, stored, expected)] for every counter that drifted from the ledger."""
+        expected = self.from_ledger(session_type_ids)
+        stored = {r.session_type_id: r for r in self.filter(session_type_id__in = list(expected))}
+        
+        drift = []
+        for st_id, want in expected.items():
+            have = stored.get(st_id)
+            for field in AttendanceRollup.COUNTER_FIELDS:
+                have_value = getattr(have, field) if have else None
+                if have_value != getattr(want, field):
+                    drift.append((st_id, field, have_value, getattr(want, field)))
+        return drift
+
+
+class AttendanceRollup(models.Model):
+    """
+    Materialized counters per SessionType, kept in step with the AttendanceLog ledger.
+    Status reads hit these (one row per session type) instead of scanning the whole history.
+    """
+    COUNTER_FIELDS = ('present_count', 'absent_count', 'cancelled_count', 'attended_hours', 'conducted_hours')
+    
+    session_type = models.OneToOneField(SessionType, on_delete = models.CASCADE, related_name = 'rollup')
+    subject = models.ForeignKey(Subject, on_delete = models.CASCADE, related_name = 'rollups')
+    
+    present_count = models.PositiveIntegerField(default = 0)
+    absent_count = models.PositiveIntegerField(default = 0)
+    cancelled_count = models.PositiveIntegerField(default = 0)
+    attended_hours = models.DecimalField(max_digits = 12, decimal_places = 2, default = 0)
+    conducted_hours = models.DecimalField(max_digits = 12, decimal_places = 2, default = 0)
+    
+    updated_at = models.DateTimeField(default = timezone.now)
+    
+    objects = AttendanceRollupQuerySet.as_manager()
+    
+    def __str__(self):
+        return f"{self.session_type} - {self.attended_hours}/{self.conducted_hours}h"
+
+
+class AttendanceSummaryQuerySet(models.QuerySet):
+    
+    def rescale(self, session_type):
+        duration = to_hours(session_type.duration_hours)
+        self.filter(session_type = session_type).update(
+            attended_hours = F('present_count') * duration,
+            conducted_hours = (F('present_count') + F('absent_count')) * duration,
+        )
+    
+    def compacted_months(self, session_type_ids):
+        """{(session_type_id, first day of month)} already folded into summaries. Those months are closed."""
+        return set(self.filter(session_type_id__in = session_type_ids).values_list('session_type_id', 'month'))
+
+
+class AttendanceSummary(models.Model):
+    """
+    A month of one SessionType's AttendanceLog rows, compacted by `manage.py compact_attendance`.
+    Counted like the logs it replaced by the rollups, trends and exports (see core.compaction).
+    """
+    session_type = models.ForeignKey(SessionType, on_delete = models.CASCADE, related_name = 'summaries')
+    # First day of the month.
+    month = models.DateField()
+    # Date of the month's last compacted log: where trends place the month's hours.
+    last_date = models.DateField()
+    
+    present_count = models.PositiveIntegerField(default = 0)
+    absent_count = models.PositiveIntegerField(default = 0)
+    cancelled_count = models.PositiveIntegerField(default = 0)
+    attended_hours = models.DecimalField(max_digits = 12, decimal_places = 2, default = 0)
+    conducted_hours = models.DecimalField(max_digits = 12, decimal_places = 2, default = 0)
+    
+    compacted_at = models.DateTimeField(default = timezone.now)
+    
+    objects = AttendanceSummaryQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['session_type', 'month'], name = 'unique_summary_month'),
+        ]
+    
+    def __str__(self):
+        return f"{self.session_type} - {self.month:%Y-%m}: {self.attended_hours}/{self.conducted_hours}h"
+
+
+class CohortSnapshot(models.Model):
+    """
+    Attendance across every student taking one course (all subjects sharing a code), precomputed by
+    `manage.py refresh_cohorts` for the staff analytics endpoints.
+    """
+    code = models.CharField(max_length = 20, unique = True)
+    # Subjects (one per student) with this code.
+    students = models.PositiveIntegerField(default = 0)
+    below_target = models.PositiveIntegerField(default = 0)
+    mean_percentage = models.DecimalField(max_digits = 5, decimal_places = 2, default = 100)
+    # Students per 10-point percentage band: [0-10), [10-20), ..., [90-100].
+    histogram = models.JSONField(default = list)
+    # [{"week", "attended", "conducted", "percentage"}] for every week with classes, oldest first.
+    weekly = models.JSONField(default = list)
+    refreshed_at = models.DateTimeField(default = timezone.now)
+    
+    def __str__(self):
+        return f"{self.code}: {self.students} students, {self.below_target} below target"
+
+
+class AttendanceImport(models.Model):
+    """
+    One processed upload. The content hash lets a byte-identical re-upload return the stored result
+    instead of being parsed and diffed again.
+    """
+    KIND_CHOICES = [
+        ('SUMMARY', 'Summary report'),
+        ('SESSION_LOG', 'Per-session log')
+    ]
+    user = models.ForeignKey(User, on_delete = models.CASCADE, related_name = 'attendance_imports')
+    content_hash = models.CharField(max_length = 64)
+    kind = models.CharField(max_length = 12, choices = KIND_CHOICES)
+    result = models.JSONField(default = dict)
+    created_at = models.DateTimeField(default = timezone.now)
     
-    
\ No newline at end of file
+    class Meta:
+        indexes = [models.Index(fields = ['user', '-created_at'])]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.kind} - {self.content_hash[:12]}"
+
+
+class ImportJob(models.Model):
+    """
+    A queued attendance upload processed outside the request (see core.jobs).
+    Progress counters are updated as batches are written; result holds the importer's stats when DONE.
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed')
+    ]
+    user = models.ForeignKey(User, on_delete = models.CASCADE, related_name = 'import_jobs')
+    status = models.CharField(max_length = 10, choices = STATUS_CHOICES, default = 'QUEUED')
+    file = models.FileField(upload_to = 'imports/%Y/%m/', blank = True)
+    file_name = models.CharField(max_length = 255, blank = True)
+    file_size = models.PositiveBigIntegerField(default = 0)
+    prune = models.BooleanField(default = False)
+    
+    processed_rows = models.PositiveIntegerField(default = 0)
+    failed_rows = models.PositiveIntegerField(default = 0)
+    result = models.JSONField(null = True, blank = True)
+    error = models.TextField(blank = True)
+    
+    created_at = models.DateTimeField(default = timezone.now)
+    started_at = models.DateTimeField(null = True, blank = True)
+    finished_at = models.DateTimeField(null = True, blank = True)
+    
+    class Meta:
+        indexes = [models.Index(fields = ['status', 'created_at'])]
+    
+    def __str__(self):
+        return f"Import #{self.pk} ({self.user.username}) - {self.status}"
+
+class Semester(models.Model):
+    """The user's current term: projections run from today to end_date."""
+    user = models.OneToOneField(User, on_delete = models.CASCADE, related_name = 'semester')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.start_date} - {self.end_date}"
+
+
+class TimetableEntry(models.Model):
+    """
+    One weekly recurring session: this SessionType (and so its subject) on `weekday` (0 = Monday).
+    `slot` tells apart several sessions of the same type on one day, as in AttendanceLog.
+    """
+    WEEKDAY_CHOICES = [(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')]
+    session_type = models.ForeignKey(SessionType, on_delete = models.CASCADE, related_name = 'timetable_entries')
+    weekday = models.PositiveSmallIntegerField(choices = WEEKDAY_CHOICES)
+    slot = models.PositiveSmallIntegerField(default = 0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields = ['session_type', 'weekday', 'slot'], name = 'unique_timetable_slot'),
+        ]
+    
+    def __str__(self):
+        return f"{self.session_type} - {self.get_weekday_display()} #{self.slot}"
+
+
+class TimetableException(models.Model):
+    """A date without classes: a holiday for the whole timetable, or for one SessionType only."""
+    user = models.ForeignKey(User, on_delete = models.CASCADE, related_name = 'timetable_exceptions')
+    date = models.DateField()
+    session_type = models.ForeignKey(SessionType, on_delete = models.CASCADE, null = True, blank = True, related_name = 'timetable_exceptions')
+    reason = models.CharField(max_length = 100, blank = True)
+    
+    class Meta:
+        indexes = [models.Index(fields = ['user', 'date'])]
+    
+    def __str__(self):
+        return f"{self.date} - {self.session_type or 'all sessions'}"
@@ -0,0 +1,116 @@
+"""
+Primary / replica database routing.
+
+With DATABASE_REPLICA_URL set, writes and, by default, reads go to 'default'. Only the read-heavy
+views that opt in (dashboard, trends, forecast) read from the 'replica' alias, inside use_replica().
+Everything else reads the primary, so a request never misses what an earlier one wrote: a login
+right after registering, a job polled right after the 202 that created it, the import dedupe lookup.
+
+Inside an opted-in block the first write still pins the current context (a request, under
+PrimaryPinningMiddleware) to the primary. The opted-in views wrap their reads in
+reading_since(modified_at), which only uses the replica once the user's data (cache.data_version)
+last changed more than DATABASE_REPLICA_LAG seconds ago, so a new data version is never cached with
+a payload the replica hasn't caught up to.
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+DEFAULT_REPLICA_LAG = 5
+
+_pinned = ContextVar('db_pinned_to_primary', default = False)
+_replica = ContextVar('db_replica_reads', default = False)
+
+
+def has_replica():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_primary():
+    """Routes every read in the enclosed block to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@contextmanager
+def use_replica():
+    """Lets reads in the enclosed block go to the replica (unless the context is pinned to the primary)."""
+    token = _replica.set(True)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+@contextmanager
+def routing_scope():
+    """A fresh, unpinned scope (one per request): writes inside it don't pin anything outside."""
+    token = _pinned.set(False)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def reading_since(modified_at):
+    """use_replica() if the data last changed more than DATABASE_REPLICA_LAG seconds ago, else a no-op (the primary)."""
+    lag = getattr(settings, 'DATABASE_REPLICA_LAG', DEFAULT_REPLICA_LAG)
+    return use_replica() if time.time() - modified_at >= lag else nullcontext()
+
+
+class PrimaryReplicaRouter:
+    """
+    Reads to the primary, except inside use_replica() when not pinned and not inside a transaction
+    on the primary (so services that read, then write in one atomic block see consistent data);
+    writes to the primary, pinning the current context.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica.get() or _pinned.get() or not has_replica() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects of a row read from the primary come from the primary too.
+            return instance._state.db
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}
+
+    def allow_migrate(self, db, app_label, model_name = None, **hints):
+        # The replica gets its schema through replication.
+        return db != REPLICA
+
+
+class PrimaryPinningMiddleware:
+    """Gives each request its own routing_scope(), so a write pins only that request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with routing_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with routing_scope():
+            return await self.get_response(request)
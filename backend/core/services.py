@@ -0,0 +1,403 @@
+import hashlib
+from datetime import date as date_cls, datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .cache import bump_history_version
+from .dashboard import subject_status
+from .models import Subject, SessionType, AttendanceLog, AttendanceRollup, AttendanceImport, AttendanceSummary, to_hours
+from .formats import NON_NUMERIC
+from .utils import CHUNK_SIZE, cell, iter_csv_rows, parse_attendance_csv
+
+BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 50
+MAX_MARK_DAYS = 31
+MAX_MARK_ENTRIES = 500
+
+# Dirty status values seen in exports -> AttendanceLog status.
+STATUS_ALIASES = {
+    'P': 'PRESENT', 'PRESENT': 'PRESENT', 'OD': 'PRESENT', 'MAKEUP': 'PRESENT',
+    'A': 'ABSENT', 'ABSENT': 'ABSENT', 'AB': 'ABSENT',
+    'C': 'CANCELLED', 'CANCELLED': 'CANCELLED', 'CANCELED': 'CANCELLED',
+}
+
+# Duration used when a new session type arrives with a blank Duration cell (first keyword match wins).
+DEFAULT_SESSION_HOURS = (('lab', Decimal('3')), ('crt', Decimal('2')))
+
+DATE_FORMATS = ('%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%d-%b-%Y', '%d %b %Y')
+
+
+def parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+
+def parse_hours(value, session_name):
+    """'1', '2 hrs', '1.5h' -> Decimal hours. Blank falls back to DEFAULT_SESSION_HOURS by session name."""
+    if not value:
+        lowered = session_name.lower()
+        return next((hours for keyword, hours in DEFAULT_SESSION_HOURS if keyword in lowered), Decimal('1'))
+    try:
+        hours = to_hours(NON_NUMERIC.sub('', value))
+    except InvalidOperation:
+        raise ValueError(f"Unrecognised duration '{value}'")
+    if hours <= 0:
+        raise ValueError(f"Duration must be positive, got '{value}'")
+    return hours
+
+
+def map_session_columns(header_row):
+    """Column indices of a dated per-session export (Subject, Type, Date, Status, Duration, Remark)."""
+    columns = {'subject': -1, 'type': -1, 'date': -1, 'status': -1, 'duration': -1, 'remark': -1}
+    for i, h in enumerate(h.lower().strip() for h in header_row):
+        if "subject" in h and "code" not in h and "type" not in h: columns['subject'] = i
+        elif "type" in h or "session" in h: columns['type'] = i
+        elif "date" in h: columns['date'] = i
+        elif "status" in h or "attendance" in h: columns['status'] = i
+        elif "duration" in h or "hours" in h: columns['duration'] = i
+        elif "remark" in h: columns['remark'] = i
+    return columns
+
+
+def is_session_log_header(header_row):
+    columns = map_session_columns(header_row)
+    return columns['subject'] != -1 and columns['date'] != -1 and columns['status'] != -1
+
+
+def parse_session_row(row, columns):
+    """One CSV row -> (subject, session, date, status, hours, remark). Raises ValueError for unusable rows."""
+    subject_name = cell(row, columns['subject'])
+    if not subject_name:
+        raise ValueError("Missing subject")
+
+    session_name = cell(row, columns['type']) or 'Lecture'
+    raw_date = cell(row, columns['date'])
+    if not raw_date:
+        raise ValueError("Missing date")
+
+    raw_status = cell(row, columns['status']).upper()
+    if raw_status not in STATUS_ALIASES:
+        raise ValueError(f"Unrecognised status '{raw_status}'")
+
+    return (
+        subject_name[:100],
+        session_name[:50],
+        parse_date(raw_date),
+        STATUS_ALIASES[raw_status],
+        parse_hours(cell(row, columns['duration']), session_name),
+        cell(row, columns['remark']) or None,
+    )
+
+
+class ImportCache:
+    """
+    In-memory Subject / SessionType lookup for one user, primed with a single query.
+    Missing entries are created in bulk per batch instead of one get_or_create per row.
+    Also knows the user's compacted (closed) months, so their rows aren't imported again.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.subjects = {}
+        self.session_types = {}
+        self.closed_months = set()
+
+        # One row per compacted month of each session type (or per session type / subject without any).
+        rows = Subject.objects.filter(user = user).values_list(
+            'id', 'name', 'session_types__id', 'session_types__name', 'session_types__summaries__month'
+        )
+        for subject_id, subject_name, st_id, st_name, month in rows:
+            self.subjects.setdefault(subject_name.lower(), subject_id)
+            if st_id is not None:
+                self.session_types.setdefault((subject_id, st_name.lower()), st_id)
+            if month is not None:
+                self.closed_months.add((st_id, month))
+
+    def resolve(self, parsed_rows, stats):
+        """Creates whatever subjects / session types the batch needs, returns row -> session_type_id."""
+        new_subjects = {}
+        for subject_name, *_ in parsed_rows:
+            key = subject_name.lower()
+            if key not in self.subjects and key not in new_subjects:
+                new_subjects[key] = Subject(user = self.user, name = subject_name)
+        if new_subjects:
+            Subject.objects.bulk_create(new_subjects.values())
+            self.subjects.update({key: subject.pk for key, subject in new_subjects.items()})
+            stats['subjects_created'] += len(new_subjects)
+
+        new_types = {}
+        for subject_name, session_name, _, _, hours, _ in parsed_rows:
+            key = (self.subjects[subject_name.lower()], session_name.lower())
+            if key not in self.session_types and key not in new_types:
+                new_types[key] = SessionType(subject_id = key[0], name = session_name, duration_hours = hours)
+        if new_types:
+            SessionType.objects.bulk_create(new_types.values())
+            self.session_types.update({key: st.pk for key, st in new_types.items()})
+            stats['session_types_created'] += len(new_types)
+
+        return [self.session_types[(self.subjects[row[0].lower()], row[1].lower())] for row in parsed_rows]
+
+
+def import_attendance_data(user, raw_csv, prune = False, progress = None):
+    """
+    Persists a dated per-session CSV (Subject, Type, Date, Status, Duration) for `user`.
+    raw_csv may be a str or an uploaded file; rows are streamed in batches inside one transaction.
+    Dirty rows are counted in stats['failed'] rather than aborting the import.
+    
+    Re-imports are incremental: every row is fingerprinted as (session type, date, slot) and diffed
+    against the stored logs, so only new rows are inserted and only changed rows are updated.
+    With prune=True, stored logs inside the upload's date range that no longer appear are deleted,
+    for the session types the upload mentions; other session types are left alone.
+    Rollups are rebuilt once, only for session types that actually changed.
+    
+    progress, if given, is called with the running stats after every written batch.
+    """
+    stats = {
+        'created': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'failed': 0,
+        'subjects_created': 0, 'session_types_created': 0, 'errors': []
+    }
+
+    rows = iter_csv_rows(raw_csv)
+    header_row = next(rows, None)
+    if not header_row:
+        raise ValueError("Empty CSV")
+    if not is_session_log_header(header_row):
+        raise ValueError("Could not map columns. Expected Subject, Type, Date, Status and Duration.")
+    columns = map_session_columns(header_row)
+
+    touched = set()
+    seen = set()
+    # Session types the upload mentions: the only ones prune may delete from.
+    uploaded = set()
+    occurrences = {}
+    window = []
+    # Session types whose stored logs changed status: history rewritten, not just appended to.
+    rewritten = set()
+
+    with transaction.atomic():
+        cache = ImportCache(user)
+        batch = []
+
+        def flush():
+            fingerprints = []
+            for st_id, (_, _, day, status, _, remark) in zip(cache.resolve(batch, stats), batch):
+                slot = occurrences.get((st_id, day), 0)
+                occurrences[(st_id, day)] = slot + 1
+                fingerprints.append(((st_id, day, slot), status, remark))
+
+            uploaded.update(fp[0] for fp, _, _ in fingerprints)
+            days = [fp[1] for fp, _, _ in fingerprints]
+            # Overall [first, last] date of the upload, the range prune is allowed to touch.
+            window[:] = [min(days + window[:1]), max(days + window[1:])]
+
+            existing = {}
+            stored = AttendanceLog.objects.filter(
+                session_type_id__in = {fp[0] for fp, _, _ in fingerprints},
+                date__range = (min(days), max(days))
+            ).order_by().values_list('id', 'session_type_id', 'date', 'slot', 'status', 'remark')
+            for pk, st_id, day, slot, status, remark in stored:
+                existing[(st_id, day, slot)] = (pk, status, remark)
+
+            to_create, to_update = [], []
+            for fp, status, remark in fingerprints:
+                if (fp[0], fp[1].replace(day = 1)) in cache.closed_months:
+                    # Compacted into a monthly summary: the history is settled, count it as already stored.
+                    stats['unchanged'] += 1
+                    continue
+                found = existing.get(fp)
+                if found is None:
+                    to_create.append(AttendanceLog(session_type_id = fp[0], date = fp[1], slot = fp[2], status = status, remark = remark))
+                    touched.add(fp[0])
+                    continue
+
+                seen.add(found[0])
+                if (found[1], found[2]) == (status, remark):
+                    stats['unchanged'] += 1
+                else:
+                    to_update.append(AttendanceLog(pk = found[0], status = status, remark = remark))
+                    touched.add(fp[0])
+                    if found[1] != status:
+                        rewritten.add(fp[0])
+
+            AttendanceLog.objects.bulk_create(to_create, batch_size = 1000)
+            seen.update(log.pk for log in to_create)
+            AttendanceLog.objects.bulk_update(to_update, ['status', 'remark'], batch_size = 500)
+            stats['created'] += len(to_create)
+            stats['updated'] += len(to_update)
+            batch.clear()
+            if progress:
+                progress(stats)
+
+        for line_no, row in enumerate(rows, start = 2):
+            if not any(value.strip() for value in row):
+                continue
+            try:
+                batch.append(parse_session_row(row, columns))
+            except ValueError as e:
+                stats['failed'] += 1
+                if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                    stats['errors'].append({"line": line_no, "error": str(e)})
+                continue
+
+            if len(batch) >= BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+
+        if prune and window:
+            stats['removed'] = prune_missing_logs(user, window, uploaded, seen, touched)
+
+        if touched:
+            AttendanceRollup.objects.rebuild(touched)
+        if rewritten or stats['removed']:
+            bump_history_version(user.pk)
+
+    return stats
+
+
+def prune_missing_logs(user, window, session_type_ids, seen, touched):
+    """Deletes the user's logs of `session_type_ids` in [window] that the upload didn't mention. Returns how many went."""
+    stale = [
+        (pk, st_id) for pk, st_id in AttendanceLog.objects.filter(
+            session_type__subject__user = user, session_type_id__in = session_type_ids, date__range = window
+        ).order_by().values_list('id', 'session_type_id').iterator()
+        if pk not in seen
+    ]
+    for start in range(0, len(stale), 500):
+        AttendanceLog.objects.filter(pk__in = [pk for pk, _ in stale[start:start + 500]]).delete()
+    touched.update(st_id for _, st_id in stale)
+    return len(stale)
+
+
+def parse_mark_days(payload):
+    """
+    {"date", "entries"} or {"days": [{"date", "entries"}, ...]} -> [(session_type_id, date, slot, status, remark)].
+    A session type listed twice on one day is two sessions (slots 0, 1, ...) unless slots are given.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected an object.")
+    days = payload.get('days') if 'days' in payload else [payload]
+    if not isinstance(days, list) or not days:
+        raise ValueError("'days' must be a non-empty list.")
+    if len(days) > MAX_MARK_DAYS:
+        raise ValueError(f"At most {MAX_MARK_DAYS} days per request.")
+
+    marks = {}
+    for day_payload in days:
+        if not isinstance(day_payload, dict):
+            raise ValueError("Each day must be an object with 'date' and 'entries'.")
+        try:
+            day = date_cls.fromisoformat(str(day_payload.get('date')))
+        except ValueError:
+            raise ValueError(f"Invalid date {day_payload.get('date')!r}; expected YYYY-MM-DD.")
+        entries = day_payload.get('entries')
+        if not isinstance(entries, list) or not entries:
+            raise ValueError(f"{day}: 'entries' must be a non-empty list.")
+
+        next_slot = {}
+        for idx, entry in enumerate(entries, start = 1):
+            if not isinstance(entry, dict):
+                raise ValueError(f"{day} entry {idx}: expected an object.")
+            status = STATUS_ALIASES.get(str(entry.get('status', '')).strip().upper())
+            if status is None:
+                raise ValueError(f"{day} entry {idx}: unrecognised status {entry.get('status')!r}.")
+            try:
+                st_id = int(entry.get('session_type_id'))
+                slot = int(entry['slot']) if entry.get('slot') is not None else next_slot.get(st_id, 0)
+            except (TypeError, ValueError):
+                raise ValueError(f"{day} entry {idx}: session_type_id and slot must be integers.")
+            if slot < 0:
+                raise ValueError(f"{day} entry {idx}: slot must not be negative.")
+            if (st_id, day, slot) in marks:
+                raise ValueError(f"{day} entry {idx}: session type {st_id} slot {slot} is listed twice.")
+            next_slot[st_id] = max(next_slot.get(st_id, 0), slot + 1)
+            marks[(st_id, day, slot)] = (status, (entry.get('remark') or '').strip()[:200] or None)
+
+    if len(marks) > MAX_MARK_ENTRIES:
+        raise ValueError(f"At most {MAX_MARK_ENTRIES} entries per request.")
+    return [(st_id, day, slot, status, remark) for (st_id, day, slot), (status, remark) in marks.items()]
+
+
+def mark_attendance(user, payload):
+    """
+    Records whole days of attendance in one transaction: ownership of every session type is checked
+    with one query, logs are upserted on (session_type, date, slot), and the touched rollups rebuilt.
+    Returns the number of logs written and the refreshed status of every affected subject.
+    """
+    marks = parse_mark_days(payload)
+    type_ids = {st_id for st_id, *_ in marks}
+    compacted = AttendanceSummary.objects.filter(session_type = OuterRef('pk'), month__in = {day.replace(day = 1) for _, day, *_ in marks})
+    marked = AttendanceLog.objects.filter(session_type = OuterRef('pk'), date__in = {day for _, day, *_ in marks})
+    # Ownership, "any of these months compacted?" and "any of these days already marked?" in the same query.
+    rows = list(SessionType.objects.filter(pk__in = type_ids, subject__user = user).annotate(
+        closed = Exists(compacted),
+        rewrites = Exists(marked),
+    ).values_list('id', 'subject_id', 'closed', 'rewrites'))
+    owned = {st_id: subject_id for st_id, subject_id, *_ in rows}
+    unknown = sorted(type_ids - owned.keys())
+    if unknown:
+        raise ValueError(f"Unknown session types: {', '.join(map(str, unknown))}.")
+    if any(closed for _, _, closed, _ in rows):
+        closed = AttendanceSummary.objects.compacted_months(type_ids)
+        months = sorted({f'{day:%Y-%m}' for st_id, day, *_ in marks if (st_id, day.replace(day = 1)) in closed})
+        raise ValueError(f"Compacted months can no longer be changed: {', '.join(months)}.")
+
+    with transaction.atomic():
+        AttendanceLog.objects.bulk_create(
+            [AttendanceLog(session_type_id = st_id, date = day, slot = slot, status = status, remark = remark)
+             for st_id, day, slot, status, remark in marks],
+            batch_size = 500,
+            update_conflicts = True,
+            unique_fields = ['session_type', 'date', 'slot'],
+            update_fields = ['status', 'remark'],
+        )
+        AttendanceRollup.objects.rebuild(type_ids)
+        if any(rewrites for *_, rewrites in rows):
+            bump_history_version(user.pk)
+
+    subjects = Subject.objects.filter(pk__in = set(owned.values())).with_attendance().order_by('name')
+    return {"saved": len(marks), "subjects": [subject_status(subject) for subject in subjects]}
+
+
+def content_hash(upload):
+    """sha256 of the raw upload, read chunk by chunk (str input is hashed as UTF-8)."""
+    digest = hashlib.sha256()
+    if isinstance(upload, str):
+        digest.update(upload.encode('utf-8'))
+    elif hasattr(upload, 'chunks'):
+        for chunk in upload.chunks():
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: upload.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+        upload.seek(0)
+    return digest.hexdigest()
+
+
+def process_upload(user, upload, prune = False, progress = None):
+    """
+    Entry point for attendance uploads. Persists per-session logs or parses summary reports, and
+    records the result under the upload's content hash. Re-sending the same bytes as the user's
+    latest upload returns that stored result without parsing anything, unless `prune` is set: logs
+    added since may need deleting, so a pruning import always runs.
+    """
+    digest = content_hash(upload)
+    latest = None if prune else AttendanceImport.objects.filter(user = user).order_by('-created_at').first()
+    if latest is not None and latest.content_hash == digest:
+        return {**latest.result, "cached": True}
+
+    is_session_log = is_session_log_header(next(iter_csv_rows(upload), []))
+    if hasattr(upload, 'seek'):
+        upload.seek(0)
+
+    if is_session_log:
+        kind, result = 'SESSION_LOG', import_attendance_data(user, upload, prune = prune, progress = progress)
+    else:
+        kind, result = 'SUMMARY', parse_attendance_csv(upload)
+
+    AttendanceImport.objects.create(user = user, content_hash = digest, kind = kind, result = result)
+    return {**result, "cached": False}
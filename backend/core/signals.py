@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .authentication import invalidate_user
+from .cache import bump_data_version
+from .models import Subject, SessionType, Semester, TimetableEntry, TimetableException
+
+# AttendanceLog changes bump versions through AttendanceRollup (record/rebuild), which every
+# ledger write already goes through. These cover edits to the subjects and weights themselves.
+# pre_delete, because the subject is still there to resolve the owner.
+
+@receiver(post_save, sender = Subject)
+@receiver(pre_delete, sender = Subject)
+def subject_changed(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender = SessionType)
+@receiver(pre_delete, sender = SessionType)
+def session_type_changed(sender, instance, **kwargs):
+    bump_data_version(Subject.objects.filter(pk = instance.subject_id).values_list('user_id', flat = True).first())
+
+
+# Timetable edits change every projection of the user. save_timetable bulk-writes and bumps itself.
+@receiver(post_save, sender = Semester)
+@receiver(pre_delete, sender = Semester)
+@receiver(post_save, sender = TimetableException)
+@receiver(pre_delete, sender = TimetableException)
+def semester_changed(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_save, sender = TimetableEntry)
+@receiver(pre_delete, sender = TimetableEntry)
+def timetable_entry_changed(sender, instance, **kwargs):
+    bump_data_version(Subject.objects.filter(session_types = instance.session_type_id).values_list('user_id', flat = True).first())
+
+
+# Password changes, deactivation, deletion: drop the cached copy used by CachedJWTAuthentication.
+@receiver(post_save, sender = get_user_model())
+@receiver(post_delete, sender = get_user_model())
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
@@ -0,0 +1,205 @@
+from datetime import date as date_cls
+from math import gcd
+from .forecast import CENTI, is_id, percentage, to_centi
+from .models import Subject, SessionType
+
+# Targets are handled as integer hundredths of a percent (75.00% -> 7500), hours as centi-hours,
+# so every bound below is exact integer arithmetic.
+FULL = 10000
+
+
+def max_skips(attended, conducted, target, weight):
+    """Largest k with attended / (conducted + k * weight) >= target. None when the target is 0 (no limit)."""
+    if target == 0:
+        return None
+    slack = attended * FULL - target * conducted
+    return max(slack // (target * weight), 0)
+
+
+def must_attend(attended, conducted, target, weight):
+    """Smallest n with (attended + n * weight) / (conducted + n * weight) >= target. None if unreachable."""
+    deficit = target * conducted - attended * FULL
+    if deficit <= 0:
+        return 0
+    if target >= FULL:
+        return None
+    step = (FULL - target) * weight
+    return -(-deficit // step)
+
+
+def skip_budget(attended, conducted, target, upcoming):
+    """
+    Max hours that can be skipped out of `upcoming` hours while still ending at or above target,
+    assuming every other upcoming session is attended. Negative means the target is out of reach.
+    """
+    total = conducted + upcoming
+    return attended + upcoming - (-(-target * total // FULL))
+
+
+def load_subjects(user):
+    """Subjects with rollup hours (one query) and their session types (one query)."""
+    subjects = {s.id: s for s in Subject.objects.filter(user = user).with_attendance()}
+    session_types = {}
+    for st in SessionType.objects.filter(subject__user = user).order_by('subject_id', 'id'):
+        session_types[st.id] = st
+    return subjects, session_types
+
+
+def safe_skip_report(user):
+    """Closed-form max skips / must-attend counts per SessionType for every subject of the user."""
+    subjects, session_types = load_subjects(user)
+
+    by_subject = {}
+    for st in session_types.values():
+        by_subject.setdefault(st.subject_id, []).append(st)
+
+    report = []
+    for subject in subjects.values():
+        attended, conducted = to_centi(subject.attended_hours), to_centi(subject.conducted_hours)
+        target = to_centi(subject.target_percentage)
+
+        rows = []
+        for st in by_subject.get(subject.id, []):
+            weight = to_centi(st.duration_hours)
+            if weight <= 0:
+                continue
+            rows.append({
+                "session_type_id": st.id,
+                "name": st.name,
+                "duration_hours": weight / CENTI,
+                "max_skips": max_skips(attended, conducted, target, weight),
+                "must_attend": must_attend(attended, conducted, target, weight),
+            })
+
+        report.append({
+            "subject_id": subject.id,
+            "name": subject.name,
+            "target_percentage": target / CENTI,
+            "attended_hours": attended / CENTI,
+            "conducted_hours": conducted / CENTI,
+            "percentage": percentage(attended, conducted),
+            "session_types": rows,
+        })
+    return report
+
+
+def bounded_knapsack(groups, capacity):
+    """
+    Maximizes the total weight <= capacity picking up to `count` items from each (weight, count) group.
+    Bitset subset-sum DP with binary splitting of the counts: O(sum(log count) * capacity / wordsize).
+    Returns the chosen count per group.
+    """
+    if capacity <= 0 or not groups:
+        return [0] * len(groups)
+
+    # Reduce by the common divisor so a 1h/3h timetable works on a few hundred bits, not centi-hours.
+    divisor = 0
+    for weight, _ in groups:
+        divisor = gcd(divisor, weight)
+    capacity //= divisor
+    mask = (1 << (capacity + 1)) - 1
+
+    items = []
+    for idx, (weight, count) in enumerate(groups):
+        weight //= divisor
+        chunk = 1
+        while count > 0:
+            take = min(chunk, count)
+            items.append((idx, take, weight * take))
+            count -= take
+            chunk *= 2
+
+    reach = 1
+    history = []
+    for _, _, weight in items:
+        history.append(reach)
+        reach = (reach | (reach << weight)) & mask
+
+    best = reach.bit_length() - 1
+    chosen = [0] * len(groups)
+    for (idx, take, weight), before in zip(reversed(items), reversed(history)):
+        if not (before >> best) & 1:
+            chosen[idx] += take
+            best -= weight
+    return chosen
+
+
+def parse_sessions(raw_sessions, session_types):
+    if not isinstance(raw_sessions, list):
+        raise ValueError("'sessions' must be a list.")
+
+    sessions = []
+    for idx, raw in enumerate(raw_sessions, start = 1):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Session {idx}: expected an object.")
+        if not is_id(raw.get('session_type_id')) or raw.get('subject_id') is not None and not is_id(raw['subject_id']):
+            raise ValueError(f"Session {idx}: session_type_id and subject_id must be integers.")
+        st = session_types.get(raw['session_type_id'])
+        if st is None:
+            raise ValueError(f"Session {idx}: unknown session_type_id {raw.get('session_type_id')}.")
+        if raw.get('subject_id') not in (None, st.subject_id):
+            raise ValueError(f"Session {idx}: session_type_id does not belong to subject {raw['subject_id']}.")
+        try:
+            day = date_cls.fromisoformat(str(raw.get('date')))
+        except ValueError:
+            raise ValueError(f"Session {idx}: date must be YYYY-MM-DD.")
+        sessions.append({"index": idx - 1, "subject_id": st.subject_id, "session_type_id": st.id, "date": day})
+    return sessions
+
+
+def optimize_skips(user, raw_sessions):
+    """
+    Skip plan over a list of upcoming sessions that maximizes total skipped hours with no subject
+    finishing below its target. Subjects don't share a constraint, so each one is an independent
+    bounded knapsack over its session types; within a type the latest sessions are the ones skipped,
+    which keeps the running percentage as high as possible until the end.
+    """
+    subjects, session_types = load_subjects(user)
+    sessions = parse_sessions(raw_sessions, session_types)
+
+    by_subject = {}
+    for session in sessions:
+        by_subject.setdefault(session['subject_id'], {}).setdefault(session['session_type_id'], []).append(session)
+
+    skipped = set()
+    summary = []
+    total_skipped = 0
+    for subject_id, by_type in by_subject.items():
+        subject = subjects[subject_id]
+        attended, conducted = to_centi(subject.attended_hours), to_centi(subject.conducted_hours)
+        target = to_centi(subject.target_percentage)
+
+        type_ids = [st_id for st_id in by_type if to_centi(session_types[st_id].duration_hours) > 0]
+        groups = [(to_centi(session_types[st_id].duration_hours), len(by_type[st_id])) for st_id in type_ids]
+        upcoming = sum(weight * count for weight, count in groups)
+        budget = skip_budget(attended, conducted, target, upcoming)
+
+        skip_hours = 0
+        for st_id, (weight, _), count in zip(type_ids, groups, bounded_knapsack(groups, budget)):
+            latest = sorted(by_type[st_id], key = lambda s: (s['date'], s['index']), reverse = True)
+            skipped.update(s['index'] for s in latest[:count])
+            skip_hours += weight * count
+        total_skipped += skip_hours
+
+        summary.append({
+            "subject_id": subject_id,
+            "name": subject.name,
+            "target_percentage": target / CENTI,
+            "upcoming_hours": upcoming / CENTI,
+            "skipped_hours": skip_hours / CENTI,
+            "final_percentage": percentage(attended + upcoming - skip_hours, conducted + upcoming),
+            "at_risk": budget < 0,
+        })
+
+    plan = [{
+        "subject_id": s['subject_id'],
+        "session_type_id": s['session_type_id'],
+        "date": s['date'].isoformat(),
+        "action": "SKIP" if s['index'] in skipped else "ATTEND",
+    } for s in sessions]
+
+    return {
+        "plan": plan,
+        "subjects": summary,
+        "total_skipped_hours": total_skipped / CENTI,
+    }
@@ -0,0 +1,15 @@
+import pytest
+from django.core.cache import cache
+from core.authentication import user_cache
+from core.forecast import forecast_memo
+
+@pytest.fixture(autouse = True)
+def clear_cache():
+    # Cached payloads and users are keyed by user id, which rolled-back tests hand out again.
+    cache.clear()
+    user_cache.clear()
+    forecast_memo.clear()
+    yield
+    cache.clear()
+    user_cache.clear()
+    forecast_memo.clear()
@@ -0,0 +1,70 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory
+from django.http import HttpResponse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from core import async_views
+from core.instrumentation import PerformanceMiddleware
+from core.models import Subject, SessionType, AttendanceLog
+
+factory = AsyncRequestFactory()
+
+@pytest.fixture
+def student(django_user_model):
+    user = django_user_model.objects.create_user(username = "async", password = "s3cret-pass")
+    sub = Subject.objects.create(user = user, name = "Compilers")
+    lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+    for day, status in (("2025-02-03", "PRESENT"), ("2025-02-04", "PRESENT"), ("2025-02-05", "ABSENT")):
+        AttendanceLog.objects.create(session_type = lec, date = day, status = status)
+    
+    token = f"Bearer {RefreshToken.for_user(user).access_token}"
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION = token)
+    return user, sub, token, client
+
+def call(view, request, *args):
+    return async_to_sync(view)(request, *args)
+
+@pytest.mark.django_db
+def test_async_views_match_sync_payloads(student):
+    user, sub, token, client = student
+    
+    dashboard = call(async_views.dashboard, factory.get("/api/dashboard/", headers = {"Authorization": token}))
+    assert dashboard.status_code == 200
+    assert json.loads(dashboard.content) == client.get("/api/dashboard/").json()
+    not_modified = call(async_views.dashboard, factory.get("/api/dashboard/", headers = {"Authorization": token, "If-None-Match": dashboard["ETag"]}))
+    assert not_modified.status_code == 304
+    
+    status = call(async_views.subject_status_view, factory.get("/", headers = {"Authorization": token}), sub.id)
+    assert json.loads(status.content) == client.get(f"/api/subjects/{sub.id}/status/").json()
+    assert json.loads(status.content)["percentage"] == 66.67
+    
+    body = {"simulations": [{"subject_id": sub.id, "action": "SKIP", "weight": 1.0, "day_name": "Monday"}]}
+    forecast = call(async_views.forecast, factory.post("/api/forecast/", body, content_type = "application/json", headers = {"Authorization": token}))
+    assert json.loads(forecast.content) == client.post("/api/forecast/", body, format = "json").json()
+
+@pytest.mark.django_db
+def test_async_views_reject_bad_requests(student, django_user_model):
+    _, sub, token, _ = student
+    assert call(async_views.dashboard, factory.get("/api/dashboard/")).status_code == 401
+    assert call(async_views.dashboard, factory.get("/api/dashboard/", headers = {"Authorization": "Bearer nope"})).status_code == 401
+    
+    other = django_user_model.objects.create(username = "other")
+    other_subject = Subject.objects.create(user = other, name = "Hidden")
+    assert call(async_views.subject_status_view, factory.get("/", headers = {"Authorization": token}), other_subject.id).status_code == 404
+    
+    bad = factory.post("/api/forecast/", {"simulations": [{"subject_id": sub.id, "action": "NAP"}]}, content_type = "application/json", headers = {"Authorization": token})
+    assert call(async_views.forecast, bad).status_code == 400
+    assert call(async_views.forecast, factory.post("/api/forecast/", "{", content_type = "application/json", headers = {"Authorization": token})).status_code == 400
+
+@pytest.mark.django_db
+def test_performance_middleware_runs_natively_async(student):
+    async def view(request):
+        await Subject.objects.acount()
+        return HttpResponse()
+    
+    middleware = PerformanceMiddleware(view)
+    response = call(middleware, factory.get("/"))
+    assert 'desc="1 queries"' in response["Server-Timing"]
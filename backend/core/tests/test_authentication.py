@@ -0,0 +1,54 @@
+import pytest
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.authentication import revoke_token, user_cache
+
+@pytest.fixture
+def login(django_user_model):
+    user = django_user_model.objects.create_user(username = "jwt", password = "s3cret-pass")
+    refresh = RefreshToken.for_user(user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION = f"Bearer {refresh.access_token}")
+    return user, client, refresh
+
+@pytest.mark.django_db
+def test_user_is_cached_between_requests(login, django_assert_num_queries):
+    user, client, _ = login
+    assert client.get("/api/dashboard/").status_code == 200
+    # Second request: dashboard comes from its cache, the user from the auth cache.
+    with django_assert_num_queries(0):
+        assert client.get("/api/dashboard/").status_code == 200
+    
+    user.is_active = False
+    user.save()
+    assert client.get("/api/dashboard/").status_code == 401
+
+@pytest.mark.django_db
+def test_logout_revokes_access_and_refresh_tokens(login):
+    _, client, refresh = login
+    assert client.post("/api/auth/logout/", {"refresh": str(refresh)}, format = "json").status_code == 200
+    assert client.get("/api/dashboard/").status_code == 401
+    assert APIClient().post("/api/auth/refresh/", {"refresh": str(refresh)}, format = "json").status_code == 401
+
+@pytest.mark.django_db
+def test_stateless_reads_skip_the_user_query(login, settings, django_assert_num_queries):
+    user, client, _ = login
+    settings.AUTH_STATELESS_READS = True
+    # Only the dashboard query: the user comes from the token claims.
+    with django_assert_num_queries(1):
+        response = client.get("/api/dashboard/")
+    assert response.status_code == 200
+    assert client.post("/api/attendance/mark/", {}, format = "json").status_code == 400
+
+@pytest.mark.django_db
+def test_revocation_beats_a_warm_user_cache(django_user_model):
+    user = django_user_model.objects.create_user(username = "jwt", password = "s3cret-pass")
+    access = RefreshToken.for_user(user).access_token
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION = f"Bearer {access}")
+    assert client.get("/api/dashboard/").status_code == 200
+    assert user_cache.stats()["size"] == 1
+
+    # Logout handled by another worker: the revocation is shared, this process's user_cache is not cleared.
+    revoke_token(access)
+    assert client.get("/api/dashboard/").status_code == 401
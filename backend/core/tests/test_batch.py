@@ -0,0 +1,76 @@
+import io
+import zipfile
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from core.batch import IN_FLIGHT_PER_PROCESS, parse_batch, parse_members, reset_pool
+
+REPORT = "#,Subject Code,Subject,Subject Type,Present,OD,Makeup,Absent\n1,CS1,{name},Lecture,{present},0,0,1\n"
+
+def report(name, present = 3):
+    return REPORT.format(name = name, present = present).encode()
+
+def archive(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+def test_zip_batch_parsed_in_parallel_matches_inline(settings):
+    files = {f"section-{i}.csv": report(f"Course {i}", present = i) for i in range(12)}
+    files["notes/readme.txt"] = b"ignored"
+    files["broken.csv"] = b"nothing,useful\n1,2\n"
+    
+    settings.ATTENDANCE_PARSE_PROCESSES = 1
+    inline = parse_batch([SimpleUploadedFile("term.zip", archive(files))])
+    settings.ATTENDANCE_PARSE_PROCESSES = 2
+    settings.ATTENDANCE_PARSE_MIN_PARALLEL = 2
+    try:
+        parallel = parse_batch([SimpleUploadedFile("term.zip", archive(files))])
+    finally:
+        reset_pool()
+    
+    assert parallel == inline
+    assert len(parallel["files"]) == 13 and parallel["failed_files"] == 1
+    assert parallel["files"][-1]["file"] == "broken.csv" and "error" in parallel["files"][-1]
+    assert parallel["global"]["conducted"] == sum(i + 1 for i in range(12))
+    assert parallel["subjects"][5] == {**parallel["subjects"][5], "name": "Course 5", "file": "section-5.csv"}
+
+def test_members_are_read_as_the_pool_drains(settings):
+    settings.ATTENDANCE_PARSE_PROCESSES = 2
+    settings.ATTENDANCE_PARSE_MIN_PARALLEL = 2
+    read = []
+
+    def members():
+        for i in range(20):
+            read.append(i)
+            yield f"{i}.csv", report(f"Course {i}")
+
+    try:
+        for done, result in enumerate(parse_members(members()), start = 1):
+            # Never more than 2 files per worker read but not yet collected.
+            assert len(read) - done < 2 * IN_FLIGHT_PER_PROCESS
+            assert result["file"] == f"{done - 1}.csv"
+    finally:
+        reset_pool()
+    assert len(read) == 20
+
+def test_batch_limits(settings):
+    settings.ATTENDANCE_BATCH_MAX_FILES = 2
+    with pytest.raises(ValueError, match = "Too many files"):
+        parse_batch([SimpleUploadedFile(f"{i}.csv", report("A")) for i in range(3)])
+    with pytest.raises(ValueError, match = "not a valid ZIP"):
+        parse_batch([SimpleUploadedFile("x.zip", b"not a zip")])
+
+@pytest.mark.django_db
+def test_upload_view_accepts_multiple_files(django_user_model):
+    client = APIClient()
+    client.force_authenticate(user = django_user_model.objects.create(username = "coordinator"))
+    response = client.post("/api/attendance/import/", {"file": [
+        SimpleUploadedFile("a.csv", report("Physics")), SimpleUploadedFile("b.csv", report("Chemistry", present = 1)),
+    ]}, format = "multipart")
+    assert response.status_code == 200
+    data = response.json()
+    assert [s["file"] for s in data["subjects"]] == ["a.csv", "b.csv"]
+    assert data["global"] == {"attended": 4, "conducted": 6, "percentage": 66.67}
@@ -0,0 +1,35 @@
+import asyncio
+import json
+import httpx
+import pytest
+from django.core.management import call_command
+from core.benchmarks.load import hammer
+from core.benchmarks.suite import QUERY_BUDGETS
+from core.models import Subject
+
+@pytest.mark.django_db
+def test_benchmark_suite_stays_within_query_budgets(tmp_path):
+    output = tmp_path / "bench.json"
+    call_command("run_benchmarks", "--users", "2", "--subjects", "4", "--days", "30", "--csv-rows", "300", "--repeat", "2", "--output", str(output))
+    
+    report = json.loads(output.read_text())
+    assert set(report["results"]) == set(QUERY_BUDGETS)
+    assert all(r["ok"] for r in report["results"].values())
+    # The run is rolled back.
+    assert not Subject.objects.exists()
+
+def test_load_client_reports_throughput_and_percentiles():
+    calls = []
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200 if len(calls) % 10 else 503)
+    
+    async def run():
+        async with httpx.AsyncClient(transport = httpx.MockTransport(handler), base_url = "http://test") as client:
+            return await hammer(client, "GET", "/api/dashboard/", concurrency = 20, duration = 0.2)
+    
+    result = asyncio.run(run())
+    assert result["requests"] + result["errors"] == len(calls)
+    assert result["errors"] == len(calls) // 10
+    assert result["throughput_rps"] > 0
+    assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from core.cohorts import refresh_cohorts
+from core.models import Subject, SessionType, AttendanceLog, CohortSnapshot
+
+@pytest.fixture
+def course(django_user_model):
+    """Six students in CS301 attending 0, 2, 4, ... of every 10 lectures, plus one in MA101."""
+    subjects = []
+    for n in range(6):
+        user = django_user_model.objects.create(username = f"student{n}")
+        sub = Subject.objects.create(user = user, name = "Networks", code = "CS301", target_percentage = 75 if n else 0)
+        lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+        for i in range(10):
+            AttendanceLog.objects.create(session_type = lec, date = date(2025, 1, 6) + timedelta(days = i), status = "PRESENT" if i < 2 * n else "ABSENT")
+        subjects.append(sub)
+    other = django_user_model.objects.create(username = "maths")
+    maths = Subject.objects.create(user = other, name = "Maths", code = "MA101")
+    Subject.objects.create(user = other, name = "Uncoded")
+    return subjects, maths
+
+@pytest.mark.django_db
+def test_snapshot_distributions(course):
+    subjects, maths = course
+    assert refresh_cohorts() == ["CS301", "MA101"]
+
+    cs = CohortSnapshot.objects.get(code = "CS301")
+    # 0%, 20%, ..., 100% (capped 10 of 10): one student per even band, the last in the top band.
+    assert cs.students == 6
+    assert cs.histogram == [1, 0, 1, 0, 1, 0, 1, 0, 1, 1]
+    # 20%, 40%, 60% are under 75%; the 0% student has a 0% target.
+    assert cs.below_target == 3
+    assert float(cs.mean_percentage) == 50.0
+    # Mon 6 - Sun 12 and Mon 13 - Wed 15 January: 7 and 3 lectures per student.
+    assert [(w["week"], w["conducted"]) for w in cs.weekly] == [("2025-01-06", 42.0), ("2025-01-13", 18.0)]
+    assert sum(w["attended"] for w in cs.weekly) == 30.0
+    # Nothing conducted yet reads as 100%, like the dashboard.
+    assert CohortSnapshot.objects.get(code = "MA101").histogram[-1] == 1
+
+@pytest.mark.django_db
+def test_incremental_refresh_only_touches_changed_courses(course):
+    subjects, maths = course
+    refresh_cohorts()
+    assert refresh_cohorts() == []
+
+    lec = subjects[1].session_types.get()
+    AttendanceLog.objects.create(session_type = lec, date = date(2025, 1, 20), status = "PRESENT")
+    assert refresh_cohorts() == ["CS301"]
+    assert CohortSnapshot.objects.get(code = "CS301").weekly[-1] == {"week": "2025-01-20", "attended": 1.0, "conducted": 1.0, "percentage": 100.0}
+
+    # Moving a student to another course refreshes both; an emptied course disappears.
+    maths.code = "CS301"
+    maths.save()
+    assert refresh_cohorts() == ["CS301", "MA101"]
+    assert CohortSnapshot.objects.get(code = "CS301").students == 7
+    assert not CohortSnapshot.objects.filter(code = "MA101").exists()
+
+    call_command('refresh_cohorts', '--full')
+    assert CohortSnapshot.objects.count() == 1
+
+@pytest.mark.django_db
+def test_cohort_api_is_staff_only(course, django_user_model, django_assert_max_num_queries):
+    refresh_cohorts()
+    client = APIClient()
+    client.force_authenticate(user = course[0][0].user)
+    assert client.get("/api/analytics/cohorts/").status_code == 403
+
+    staff = django_user_model.objects.create(username = "registrar", is_staff = True)
+    client.force_authenticate(user = staff)
+    with django_assert_max_num_queries(2):
+        listing = client.get("/api/analytics/cohorts/").json()["cohorts"]
+    assert [(c["code"], c["students"], c["below_target"]) for c in listing] == [("CS301", 6, 3), ("MA101", 1, 0)]
+    with django_assert_max_num_queries(2):
+        detail = client.get("/api/analytics/cohorts/CS301/").json()
+    assert detail["histogram"][0] == {"from": 0, "to": 10, "students": 1}
+    assert len(detail["weekly"]) == 2
+    assert client.get("/api/analytics/cohorts/XX999/").status_code == 404
+
+@pytest.mark.django_db
+def test_compaction_refreshes_the_weekly_trend(course, settings, tmp_path):
+    settings.ATTENDANCE_ARCHIVE_DIR = str(tmp_path)
+    subjects, maths = course
+    refresh_cohorts()
+
+    call_command('compact_attendance', '--before', '2025-02-01', '--user', 'student3')
+    # Student 3's ten lectures now count in the week of 15 January, their month's last class day.
+    assert refresh_cohorts() == ["CS301"]
+    assert [(w["week"], w["conducted"]) for w in CohortSnapshot.objects.get(code = "CS301").weekly] == [("2025-01-06", 35.0), ("2025-01-13", 25.0)]
+
+@pytest.mark.django_db
+def test_targets_compare_exactly_past_32_bits(django_user_model):
+    # 15,000 of 20,000 hours: 1.5e6 centi-hours, so attended * 10000 and target * conducted exceed 2**31.
+    user = django_user_model.objects.create(username = "marathon")
+    sub = Subject.objects.create(user = user, name = "Thesis", code = "TH900", target_percentage = 80)
+    block = SessionType.objects.create(subject = sub, name = "Block", duration_hours = 5000)
+    for i in range(4):
+        AttendanceLog.objects.create(session_type = block, date = date(2025, 1, 6 + i), status = "ABSENT" if i == 0 else "PRESENT")
+
+    refresh_cohorts()
+    snapshot = CohortSnapshot.objects.get(code = "TH900")
+    assert (snapshot.below_target, float(snapshot.mean_percentage), snapshot.histogram[7]) == (1, 75.0, 1)
@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from core.compaction import months_before
+from core.dashboard import build_dashboard
+from core.exports import export_stream
+from core.models import Subject, SessionType, AttendanceLog, AttendanceRollup, AttendanceSummary
+from core.services import import_attendance_data
+from core.trends import build_trends
+
+STATUSES = ("PRESENT", "PRESENT", "ABSENT", "PRESENT", "CANCELLED")
+
+@pytest.fixture
+def semester(django_user_model, settings, tmp_path):
+    settings.ATTENDANCE_ARCHIVE_DIR = str(tmp_path)
+    user = django_user_model.objects.create(username = "compact")
+    nets = Subject.objects.create(user = user, name = "Networks", code = "CS301")
+    lec = SessionType.objects.create(subject = nets, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = nets, name = "Lab", duration_hours = 3.0)
+    maths = Subject.objects.create(user = user, name = "Maths")
+    tut = SessionType.objects.create(subject = maths, name = "Tutorial", duration_hours = 1.5)
+    logs = []
+    for i in range(110):
+        day = date(2025, 1, 6) + timedelta(days = i)
+        logs.append(AttendanceLog(session_type = lec, date = day, status = STATUSES[i % 5], remark = "note" if i == 3 else None))
+        logs.append(AttendanceLog(session_type = lec, date = day, slot = 1, status = STATUSES[(i + 2) % 5]))
+        if i % 3 == 0:
+            logs.append(AttendanceLog(session_type = lab, date = day, status = STATUSES[(i + 1) % 5]))
+        if i % 2 == 0:
+            logs.append(AttendanceLog(session_type = tut, date = day, status = STATUSES[(i + 3) % 5]))
+    AttendanceLog.objects.bulk_create(logs)
+    AttendanceRollup.objects.rebuild()
+    return user, lec
+
+def exported(user, fmt):
+    return b"".join(export_stream(user, fmt))
+
+def points(trends):
+    """The payload without compacted_through, which is the one field compaction changes."""
+    return {k: v for k, v in trends.items() if k != "compacted_through"}
+
+def cumulative(trends, since = ""):
+    """Points dated `since` or later, without rolling windows."""
+    strip = lambda points: [{k: v for k, v in p.items() if k != "rolling"} for p in points if p["date"] >= since]
+    return strip(trends["global"]), [(s["id"], strip(s["points"])) for s in trends["subjects"]]
+
+def test_months_before():
+    assert months_before(date(2025, 3, 14), 2) == date(2025, 1, 1)
+    assert months_before(date(2025, 1, 31), 13) == date(2023, 12, 1)
+
+@pytest.mark.django_db
+def test_compaction_keeps_every_output(semester):
+    user, lec = semester
+    before = {
+        "dashboard": build_dashboard(user),
+        "trends": {bucket: build_trends(user, bucket = bucket, windows = (7, 30, 90)) for bucket in ("day", "week", "month")},
+        "subject": build_trends(user, bucket = 'day', subject_id = lec.subject_id),
+        "csv": exported(user, 'csv'),
+        "ndjson": exported(user, 'ndjson'),
+        "everyone": exported(None, 'csv'),
+    }
+    rows = AttendanceLog.objects.count()
+
+    call_command('compact_attendance', '--before', '2025-04-15')
+
+    # January to March became one row per session type and month.
+    assert AttendanceSummary.objects.count() == 9
+    assert AttendanceLog.objects.filter(date__lt = date(2025, 4, 1)).count() == 0
+    assert AttendanceLog.objects.count() < rows / 3
+    assert AttendanceRollup.objects.verify() == []
+
+    cache.clear()
+    assert build_dashboard(user) == before["dashboard"]
+    # Trends replay the archive: every point and rolling window is the same, down to the day.
+    for bucket, trends in before["trends"].items():
+        after = build_trends(user, bucket = bucket, windows = (7, 30, 90))
+        assert trends["compacted_through"] is None and after["compacted_through"] == "2025-03-31"
+        assert points(after) == points(trends)
+    assert points(build_trends(user, bucket = 'day', subject_id = lec.subject_id)) == points(before["subject"])
+    assert exported(user, 'csv') == before["csv"]
+    assert exported(user, 'ndjson') == before["ndjson"]
+    # The all-users dump streams archived rows by user and date instead of by id.
+    assert sorted(exported(None, 'csv').splitlines()) == sorted(before["everyone"].splitlines())
+
+    # Rebuilding from the ledger (summaries + live logs) lands on the same counters.
+    AttendanceRollup.objects.rebuild()
+    assert build_dashboard(user) == before["dashboard"]
+    # So does re-weighting a session type.
+    lec.refresh_from_db()
+    lec.duration_hours = 2.0
+    lec.save()
+    assert AttendanceRollup.objects.verify() == []
+
+@pytest.mark.django_db
+def test_compacted_months_are_closed(semester):
+    user, lec = semester
+    call_command('compact_attendance', '--before', '2025-03-01')
+    totals = build_dashboard(user)
+
+    client = APIClient()
+    client.force_authenticate(user = user)
+    response = client.post("/api/attendance/mark/", {"date": "2025-02-03", "entries": [{"session_type_id": lec.id, "status": "P"}]}, format = "json")
+    assert response.status_code == 400 and "2025-02" in response.json()["error"]
+    assert build_dashboard(user) == totals
+
+    # The export still starts with the first archived class and says where the live logs begin.
+    export = client.get("/api/attendance/export/")
+    assert export["X-Compacted-Through"] == "2025-02-28"
+    assert b"".join(export.streaming_content).decode().splitlines()[1].startswith("2025-01-06,")
+
+    stats = import_attendance_data(user, "Subject,Type,Date,Status\nNetworks,Lecture,2025-01-06,ABSENT\nNetworks,Lecture,2025-04-30,PRESENT\n")
+    assert (stats["unchanged"], stats["updated"], stats["created"]) == (1, 0, 1)
+    assert not AttendanceLog.objects.filter(date = date(2025, 1, 6)).exists()
+
+@pytest.mark.django_db
+def test_trends_fall_back_to_summaries_without_the_archive(semester, tmp_path):
+    user, _ = semester
+    before = build_trends(user, bucket = 'day')
+    call_command('compact_attendance', '--before', '2025-04-15')
+    for path in tmp_path.rglob("*.ndjson.gz"):
+        path.unlink()
+
+    # Archive removed by hand: month ends and everything after the compacted months still agree.
+    cache.clear()
+    days = build_trends(user, bucket = 'day')
+    assert days["compacted_through"] == "2025-03-31"
+    assert cumulative(days, since = "2025-03-31") == cumulative(before, since = "2025-03-31")
+    assert cumulative(days) != cumulative(before)
@@ -0,0 +1,58 @@
+import time
+import pytest
+from rest_framework.test import APIClient
+from core.cache import data_version
+from core.checks import check_local_cache_with_workers
+from core.models import Subject, SessionType, AttendanceLog
+
+@pytest.fixture
+def student(django_user_model):
+    user = django_user_model.objects.create(username = "dashboard")
+    sub = Subject.objects.create(user = user, name = "Algorithms")
+    lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = sub, name = "Lab", duration_hours = 2.0)
+    AttendanceLog.objects.create(session_type = lec, date = "2025-01-06", status = "PRESENT")
+    AttendanceLog.objects.create(session_type = lab, date = "2025-01-07", status = "ABSENT")
+    Subject.objects.create(user = user, name = "Ethics")
+    return user, lec
+
+@pytest.mark.django_db
+def test_dashboard_payload_and_conditional_get(student, django_assert_num_queries, django_capture_on_commit_callbacks):
+    user, lec = student
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    first = client.get("/api/dashboard/")
+    assert first.status_code == 200
+    data = first.json()
+    assert data["global"] == {"attended": 1.0, "conducted": 3.0, "percentage": 33.33}
+    assert [s["name"] for s in data["subjects"]] == ["Algorithms", "Ethics"]
+    assert data["subjects"][1]["percentage"] == 100.0
+    
+    with django_assert_num_queries(0):
+        cached = client.get("/api/dashboard/")
+        not_modified = client.get("/api/dashboard/", HTTP_IF_NONE_MATCH = first["ETag"])
+    assert cached.json() == data
+    assert not_modified.status_code == 304
+    assert not not_modified.content
+    
+    with django_capture_on_commit_callbacks(execute = True):
+        AttendanceLog.objects.create(session_type = lec, date = "2025-01-08", status = "PRESENT")
+    
+    changed = client.get("/api/dashboard/", HTTP_IF_NONE_MATCH = first["ETag"])
+    assert changed.status_code == 200
+    assert changed["ETag"] != first["ETag"]
+    assert changed.json()["global"]["attended"] == 2.0
+
+def test_local_cache_versions_expire_and_warn(settings, monkeypatch):
+    # Another worker's bump never reaches this process's LocMemCache: the version has to expire.
+    settings.DATA_VERSION_TTL = 0.05
+    first = data_version(7)
+    assert data_version(7) == first
+    time.sleep(0.1)
+    assert data_version(7) != first
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert [w.id for w in check_local_cache_with_workers(None)] == ["core.W001"]
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache"}}
+    assert check_local_cache_with_workers(None) == []
@@ -3,6 +3,7 @@ from rest_framework.test import APIClient
 from decimal import Decimal
 from django.urls import reverse
 from core.models import Subject, SessionType, AttendanceLog
+from core.forecast import forecast_memo, load_baselines, load_session_weights, normalize_plan, run_cascade
 
 @pytest.mark.django_db
 def test_forecast_cascade_logic(django_user_model):
@@ -34,4 +35,95 @@ def test_forecast_cascade_logic(django_user_model):
     assert step1['subject_impact']['new_percentage'] == 90.91
     
     step2 = data[1]
-    assert step2['subject_impact']['new_percentage'] == 83.33
\ No newline at end of file
+    assert step2['subject_impact']['new_percentage'] == 83.33
+
+@pytest.mark.django_db
+def test_forecast_batch_plans(django_user_model, django_assert_max_num_queries):
+    user = django_user_model.objects.create(username = "planner")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    math = Subject.objects.create(user = user, name = "Math")
+    lec = SessionType.objects.create(subject = math, name = "Lecture", duration_hours = 1.0)
+    physics = Subject.objects.create(user = user, name = "Physics")
+    lab = SessionType.objects.create(subject = physics, name = "Lab", duration_hours = 3.0)
+    
+    for i in range(3):
+        AttendanceLog.objects.create(session_type = lec, date = f"2025-02-{i+10}", status = "PRESENT")
+        AttendanceLog.objects.create(session_type = lab, date = f"2025-02-{i+10}", status = "ABSENT" if i == 0 else "PRESENT")
+    
+    skip_labs = [{"session_type_id": lab.id, "action": "SKIP"} for _ in range(120)]
+    payload = {
+        "plans": [
+            {"id": "attend-all", "simulations": [{"subject_id": math.id, "action": "ATTEND"}] * 120},
+            {"id": "skip-labs", "simulations": skip_labs},
+            [],
+        ]
+    }
+    
+    with django_assert_max_num_queries(2):
+        response = client.post("/api/forecast/", payload, format = "json")
+    
+    assert response.status_code == 200
+    plans = {plan["id"]: plan for plan in response.json()["plans"]}
+    assert plans["attend-all"]["steps"][-1]["subject_impact"]["new_percentage"] == 100.0
+    # 6h attended of 9h conducted, then 120 skipped 3h labs: 6 / 369.
+    assert plans["skip-labs"]["steps"][-1]["subject_impact"]["new_percentage"] == 1.63
+    assert plans["skip-labs"]["steps"][-1]["global_impact"]["conducted_hours"] == 372.0
+    assert plans[2]["summary"]["global_percentage"] == 75.0
+    
+    bad = client.post("/api/forecast/", {"simulations": [{"subject_id": 999999, "action": "SKIP"}]}, format = "json")
+    assert bad.status_code == 400
+
+@pytest.mark.django_db
+def test_forecast_memo_reuses_plans_and_prefixes(django_user_model, django_assert_num_queries, django_capture_on_commit_callbacks):
+    user = django_user_model.objects.create(username = "memo")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    math = Subject.objects.create(user = user, name = "Math")
+    lec = SessionType.objects.create(subject = math, name = "Lecture", duration_hours = 1.0)
+    physics = Subject.objects.create(user = user, name = "Physics")
+    lab = SessionType.objects.create(subject = physics, name = "Lab", duration_hours = 3.0)
+    for i in range(4):
+        AttendanceLog.objects.create(session_type = lec, date = f"2025-03-{i+10}", status = "PRESENT" if i else "ABSENT")
+        AttendanceLog.objects.create(session_type = lab, date = f"2025-03-{i+10}", status = "PRESENT")
+    
+    base = [{"subject_id": math.id if i % 2 else physics.id, "action": "SKIP" if i % 3 else "ATTEND"} for i in range(30)]
+    extended = base + [{"session_type_id": lab.id, "action": "SKIP"}, {"subject_id": math.id, "action": "ATTEND", "weight": 2}]
+    
+    first = client.post("/api/forecast/", {"simulations": base}, format = "json").json()
+    with django_assert_num_queries(0):
+        again = client.post("/api/forecast/", {"simulations": base}, format = "json").json()
+    assert again == first
+    assert forecast_memo.stats()["hits"] == 1
+    
+    resumed = client.post("/api/forecast/", {"simulations": extended}, format = "json").json()
+    assert forecast_memo.stats()["prefix_hits"] == 1
+    baselines = load_baselines(user)
+    uncached = run_cascade(normalize_plan(extended, baselines, load_session_weights(user, [extended])), baselines)
+    assert resumed == uncached
+    assert resumed[:30] == first
+    
+    # A new log bumps the data version: fresh baselines, so the old entries no longer match.
+    with django_capture_on_commit_callbacks(execute = True):
+        AttendanceLog.objects.create(session_type = lec, date = "2025-03-20", status = "ABSENT")
+    after = client.post("/api/forecast/", {"simulations": base}, format = "json").json()
+    assert after[0]["global_impact"]["conducted_hours"] == first[0]["global_impact"]["conducted_hours"] + 1
+    assert forecast_memo.stats()["hits"] == 1
+    assert forecast_memo.stats()["misses"] == 3
+
+@pytest.mark.django_db
+def test_forecast_rejects_malformed_ids_and_bodies(django_user_model):
+    user = django_user_model.objects.create(username = "fuzzer")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    sub = Subject.objects.create(user = user, name = "Math")
+
+    for step in ({"subject_id": [sub.id], "action": "SKIP"}, {"subject_id": {"id": 1}, "action": "SKIP"},
+                 {"session_type_id": [1], "action": "SKIP"}, {"subject_id": True, "action": "SKIP"}):
+        response = client.post("/api/forecast/", {"simulations": [step]}, format = "json")
+        assert response.status_code == 400 and "integers" in response.json()["error"]
+    response = client.post("/api/forecast/", {"plans": [[{"session_type_id": {"x": 1}, "action": "SKIP"}]]}, format = "json")
+    assert response.status_code == 400
+    assert client.post("/api/forecast/", [{"subject_id": sub.id}], format = "json").status_code == 400
@@ -24,4 +24,88 @@ def test_import_dirty_csv(django_user_model):
     dbms_subject = Subject.objects.get(name = "DBMS")
     lab_session = SessionType.objects.get(subject = dbms_subject)
     assert lab_session.duration_hours == 2.0
-    
\ No newline at end of file
+    
+
+@pytest.mark.django_db
+def test_import_batches_queries_and_feeds_rollups(django_user_model, django_assert_max_num_queries):
+    user = django_user_model.objects.create(username = "semester")
+    lines = ["Subject,Type,Date,Status,Duration"]
+    for day in range(1, 29):
+        for subject in ("OS", "CN", "DBMS", "Maths"):
+            lines.append(f"{subject},Lecture,2025-02-{day:02d},{'A' if day % 4 == 0 else 'P'},1")
+        lines.append(f"OS,Lab,2025-02-{day:02d},Present,3")
+    
+    with django_assert_max_num_queries(12):
+        stats = import_attendance_data(user, "\n".join(lines))
+    
+    assert stats['created'] == 28 * 5
+    assert stats['failed'] == 0
+    os_subject = Subject.objects.get(user = user, name = "OS")
+    assert os_subject.current_status_details['conducted_hours'] == 28 + 28 * 3
+    assert os_subject.current_status_details['attended_hours'] == 21 + 28 * 3
+
+
+@pytest.mark.django_db
+def test_upload_view_persists_session_logs(django_user_model):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from rest_framework.test import APIClient
+    
+    user = django_user_model.objects.create(username = "uploader")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    upload = SimpleUploadedFile("log.csv", b"Subject,Type,Date,Status,Duration\nOS,Lecture,2025-01-02,P,1\nOS,Lab,2025-01-03,A,3\n")
+    response = client.post("/api/attendance/import/", {"file": upload}, format = "multipart")
+    
+    assert response.status_code == 200
+    assert response.json()['created'] == 2
+    assert SessionType.objects.filter(subject__user = user).count() == 2
+
+
+@pytest.mark.django_db
+def test_reimport_is_incremental_and_idempotent(django_user_model):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from core.models import AttendanceLog
+    from core.services import process_upload
+    
+    user = django_user_model.objects.create(username = "weekly")
+    week1 = "Subject,Type,Date,Status,Duration\n" + "".join(
+        f"OS,Lecture,2025-03-{day:02d},P,1\nOS,Lecture,2025-03-{day:02d},A,1\n" for day in range(1, 8)
+    )
+    
+    first = process_upload(user, SimpleUploadedFile("a.csv", week1.encode()))
+    assert (first['created'], first['cached']) == (14, False)
+    
+    again = process_upload(user, SimpleUploadedFile("a.csv", week1.encode()))
+    assert again['cached'] is True
+    assert AttendanceLog.objects.count() == 14
+    
+    # Week 2: history repeated, one correction, one new day, and 03-04 disappears.
+    week2 = week1.replace("2025-03-02,A", "2025-03-02,P").replace("OS,Lecture,2025-03-04,P,1\nOS,Lecture,2025-03-04,A,1\n", "")
+    week2 += "OS,Lecture,2025-03-08,P,1\n"
+    stats = process_upload(user, SimpleUploadedFile("a.csv", week2.encode()), prune = True)
+    
+    assert (stats['created'], stats['updated'], stats['unchanged'], stats['removed']) == (1, 1, 11, 2)
+    assert Subject.objects.get(user = user).current_status_details == {'attended_hours': 8, 'conducted_hours': 13}
+
+
+@pytest.mark.django_db
+def test_prune_reruns_cached_uploads_and_keeps_other_session_types(django_user_model):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from core.models import AttendanceLog
+    from core.services import process_upload
+    
+    user = django_user_model.objects.create(username = "pruner")
+    week = "Subject,Type,Date,Status,Duration\n" + "".join(f"OS,Lecture,2025-03-{day:02d},P,1\n" for day in range(1, 8))
+    process_upload(user, SimpleUploadedFile("a.csv", week.encode()))
+    lecture = SessionType.objects.get(subject__user = user, name = "Lecture")
+    lab = SessionType.objects.create(subject = lecture.subject, name = "Lab", duration_hours = 2)
+    # Marked since the upload: a second lecture on 03-03, and a lab the export never had.
+    AttendanceLog.objects.create(session_type = lecture, date = "2025-03-03", slot = 1, status = "ABSENT")
+    AttendanceLog.objects.create(session_type = lab, date = "2025-03-04", status = "PRESENT")
+    
+    # Same bytes, but pruning: not served from the hash cache, and only Lecture logs are pruned.
+    stats = process_upload(user, SimpleUploadedFile("a.csv", week.encode()), prune = True)
+    assert (stats['cached'], stats['removed'], stats['unchanged']) == (False, 1, 7)
+    assert AttendanceLog.objects.filter(session_type = lab).exists()
+    assert AttendanceLog.objects.filter(session_type = lecture).count() == 7
@@ -0,0 +1,49 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from core.models import Subject, SessionType, AttendanceLog, COUNTED_STATUSES
+
+def explain(queryset):
+    if connection.vendor == 'postgresql':
+        # Tiny test tables would otherwise always be seq-scanned.
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+@pytest.mark.django_db
+def test_status_queries_have_no_implicit_sort():
+    sql = str(AttendanceLog.objects.filter(status = "PRESENT").query)
+    assert "ORDER BY" not in sql
+
+@pytest.mark.django_db
+def test_hot_queries_use_composite_indexes():
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        pytest.skip("EXPLAIN output is only checked on SQLite and Postgres")
+    
+    user = User.objects.create(username = "explain")
+    sub = Subject.objects.create(user = user, name = "Databases")
+    lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+    AttendanceLog.objects.bulk_create([
+        AttendanceLog(session_type = lec, date = f"2025-01-{day:02d}", status = "PRESENT" if day % 5 else "CANCELLED")
+        for day in range(1, 29)
+    ])
+    
+    status_plan = explain(
+        AttendanceLog.objects.order_by().filter(session_type_id__in = [lec.id])
+        .values("session_type_id", "status").annotate(n = Count("id"))
+    )
+    counted_plan = explain(
+        AttendanceLog.objects.filter(session_type = lec, status__in = COUNTED_STATUSES).order_by("date").values_list("date", flat = True)
+    )
+    range_plan = explain(AttendanceLog.objects.filter(session_type = lec, date__gte = "2025-01-15"))
+    
+    assert "log_session_status_idx" in status_plan
+    if connection.vendor == 'sqlite':
+        # The unique (session_type, date, slot) constraint is an automatic index on SQLite and already
+        # yields rows in date order, so neither scan needs a sort step.
+        assert "USING INDEX" in range_plan and "date>?" in range_plan
+        assert "USING INDEX" in counted_plan and "TEMP B-TREE" not in counted_plan
+    else:
+        assert "unique_session_slot" in range_plan
+        assert "Index" in counted_plan and "Sort" not in counted_plan
@@ -0,0 +1,48 @@
+import io
+import pytest
+from rest_framework.test import APIClient
+from core import instrumentation
+from core.instrumentation import collect_phases, phase
+from core.models import Subject
+from core.utils import parse_attendance_csv
+
+@pytest.mark.django_db
+def test_server_timing_reports_sql_per_request(django_user_model):
+    user = django_user_model.objects.create(username = "timed")
+    Subject.objects.create(user = user, name = "Physics")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    header = client.get("/api/dashboard/")["Server-Timing"]
+    assert header.startswith("total;dur=")
+    assert 'desc="1 queries"' in header
+
+def test_phases_report_self_time():
+    with collect_phases() as collector:
+        with phase("outer"):
+            with phase("inner"):
+                pass
+            with phase("inner"):
+                pass
+    assert set(collector.totals) == {"outer", "inner"}
+    # Outside a collector phases are a no-op.
+    with phase("ignored"):
+        pass
+    assert "ignored" not in collector.totals
+
+def test_parser_phases():
+    csv = "#,Subject Code,Subject,Subject Type,Present,OD,Makeup,Absent\n1,CS1,Course,Lecture,3,0,0,1\n"
+    with collect_phases() as collector:
+        parse_attendance_csv(io.BytesIO(csv.encode()))
+    assert {"csv_decode", "csv_header", "csv_rows"} <= set(collector.totals)
+
+@pytest.mark.django_db
+def test_metrics_endpoint(settings):
+    settings.METRICS_TOKEN = "secret"
+    client = APIClient()
+    if instrumentation.prometheus_client is None:
+        assert client.get("/metrics").status_code == 501
+        return
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", HTTP_AUTHORIZATION = "Bearer secret")
+    assert b"safeskip_request_seconds" in response.content
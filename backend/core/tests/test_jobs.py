@@ -0,0 +1,45 @@
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from core.models import ImportJob, AttendanceLog
+
+CSV = b"Subject,Type,Date,Status,Duration\nOS,Lecture,2025-01-02,P,1\nOS,Lab,2025-01-03,A,3\nBad,,,,\n"
+
+@pytest.fixture
+def client(django_user_model, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    user = django_user_model.objects.create(username = "bulk_uploader")
+    api = APIClient()
+    api.force_authenticate(user = user)
+    return api
+
+@pytest.mark.django_db
+def test_large_upload_returns_job_and_reports_status(client, settings, django_capture_on_commit_callbacks):
+    settings.ATTENDANCE_IMPORT_EXECUTOR = 'core.jobs.InlineExecutor'
+    settings.ATTENDANCE_IMPORT_ASYNC_BYTES = 10
+    
+    with django_capture_on_commit_callbacks(execute = True):
+        response = client.post("/api/attendance/import/", {"file": SimpleUploadedFile("log.csv", CSV)}, format = "multipart")
+    
+    assert response.status_code == 202
+    status = client.get(f"/api/attendance/import/{response.json()['job_id']}/").json()
+    assert status["status"] == "DONE"
+    assert (status["processed_rows"], status["failed_rows"]) == (2, 1)
+    assert status["result"]["created"] == 2
+
+@pytest.mark.django_db
+def test_database_queue_worker_claims_jobs(client, settings, django_capture_on_commit_callbacks):
+    settings.ATTENDANCE_IMPORT_EXECUTOR = 'core.jobs.DatabaseQueueExecutor'
+    
+    with django_capture_on_commit_callbacks(execute = True):
+        response = client.post("/api/attendance/import/?async=1", {"file": SimpleUploadedFile("log.csv", CSV)}, format = "multipart")
+    
+    job = ImportJob.objects.get(pk = response.json()['job_id'])
+    assert job.status == "QUEUED"
+    
+    call_command("run_import_worker", "--once")
+    job.refresh_from_db()
+    assert job.status == "DONE"
+    assert AttendanceLog.objects.count() == 2
+    assert client.get(f"/api/attendance/import/{job.pk + 1}/").status_code == 404
@@ -0,0 +1,60 @@
+import pytest
+from rest_framework.test import APIClient
+from core.models import Subject, SessionType, AttendanceLog, AttendanceRollup
+
+@pytest.fixture
+def student(django_user_model):
+    user = django_user_model.objects.create(username = "marker")
+    algo = Subject.objects.create(user = user, name = "Algorithms")
+    lec = SessionType.objects.create(subject = algo, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = algo, name = "Lab", duration_hours = 3.0)
+    ethics = Subject.objects.create(user = user, name = "Ethics")
+    talk = SessionType.objects.create(subject = ethics, name = "Lecture", duration_hours = 1.0)
+    client = APIClient()
+    client.force_authenticate(user = user)
+    return client, lec, lab, talk
+
+@pytest.mark.django_db
+def test_mark_day_upserts_and_returns_statuses(student, django_assert_max_num_queries):
+    client, lec, lab, talk = student
+    day = {"date": "2025-01-06", "entries": [
+        {"session_type_id": lec.id, "status": "P"},
+        {"session_type_id": lec.id, "status": "ABSENT"},
+        {"session_type_id": lab.id, "status": "PRESENT", "remark": "late"},
+        {"session_type_id": talk.id, "status": "C"},
+    ]}
+    with django_assert_max_num_queries(10):
+        response = client.post("/api/attendance/mark/", day, format = "json")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["saved"] == 4
+    algo = data["subjects"][0]
+    assert (algo["name"], algo["attended"], algo["conducted"]) == ("Algorithms", 4.0, 5.0)
+    assert sorted(AttendanceLog.objects.filter(session_type = lec).values_list("slot", "status")) == [(0, "PRESENT"), (1, "ABSENT")]
+    
+    # Re-marking overwrites the same sessions; a second day is added alongside.
+    response = client.post("/api/attendance/mark/", {"days": [
+        {"date": "2025-01-06", "entries": [{"session_type_id": lab.id, "status": "A"}]},
+        {"date": "2025-01-07", "entries": [{"session_type_id": talk.id, "status": "P"}]},
+    ]}, format = "json")
+    assert response.status_code == 200
+    assert AttendanceLog.objects.count() == 5
+    assert AttendanceLog.objects.get(session_type = lab).status == "ABSENT"
+    assert not AttendanceRollup.objects.verify()
+    assert [s["percentage"] for s in response.json()["subjects"]] == [20.0, 100.0]
+
+@pytest.mark.django_db
+def test_mark_rejects_foreign_session_types(student, django_user_model):
+    client, lec, _, _ = student
+    other = django_user_model.objects.create(username = "other")
+    foreign = SessionType.objects.create(subject = Subject.objects.create(user = other, name = "Art"), name = "Studio", duration_hours = 1.0)
+    
+    response = client.post("/api/attendance/mark/", {"date": "2025-01-06", "entries": [
+        {"session_type_id": lec.id, "status": "P"}, {"session_type_id": foreign.id, "status": "P"},
+    ]}, format = "json")
+    assert response.status_code == 400
+    assert str(foreign.id) in response.json()["error"]
+    assert not AttendanceLog.objects.exists()
+    
+    bad_status = client.post("/api/attendance/mark/", {"date": "2025-01-06", "entries": [{"session_type_id": lec.id, "status": "maybe"}]}, format = "json")
+    assert bad_status.status_code == 400
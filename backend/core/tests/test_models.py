@@ -19,4 +19,42 @@ def test_weighted_attendance_calculation():
     
     assert stats['conducted_hours'] == 4.0
     assert stats['attended_hours'] == 1.0
-    assert percentage == 25.0
\ No newline at end of file
+    assert percentage == 25.0
+
+@pytest.mark.django_db
+def test_status_is_a_single_aggregate_query(django_assert_num_queries):
+    user = User.objects.create(username = "n_plus_one")
+    subject = Subject.objects.create(user = user, name = "Operating Systems")
+    lecture = SessionType.objects.create(subject = subject, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = subject, name = "Lab", duration_hours = 3.0)
+    
+    for day in range(1, 21):
+        AttendanceLog.objects.create(session_type = lecture, date = f"2026-01-{day:02d}", status = "PRESENT")
+    AttendanceLog.objects.create(session_type = lab, date = "2026-01-05", status = "ABSENT")
+    AttendanceLog.objects.create(session_type = lab, date = "2026-01-12", status = "CANCELLED")
+    
+    with django_assert_num_queries(1):
+        assert subject.current_status == Decimal(20) / Decimal(23) * 100
+
+
+@pytest.mark.django_db
+def test_with_attendance_annotates_every_subject(django_assert_num_queries):
+    user = User.objects.create(username = "dashboard_user")
+    
+    for idx in range(4):
+        subject = Subject.objects.create(user = user, name = f"Subject {idx}")
+        lecture = SessionType.objects.create(subject = subject, name = "Lecture", duration_hours = 1.0)
+        lab = SessionType.objects.create(subject = subject, name = "Lab", duration_hours = 2.0)
+        AttendanceLog.objects.create(session_type = lecture, date = "2026-02-02", status = "PRESENT")
+        AttendanceLog.objects.create(session_type = lab, date = "2026-02-03", status = "ABSENT" if idx % 2 else "PRESENT")
+    empty = Subject.objects.create(user = user, name = "No Classes Yet")
+    
+    with django_assert_num_queries(1):
+        subjects = {s.name: s for s in Subject.objects.filter(user = user).with_attendance()}
+    
+    assert subjects["Subject 0"].attended_hours == Decimal("3.00")
+    assert subjects["Subject 1"].attended_hours == Decimal("1.00")
+    assert subjects["Subject 1"].conducted_hours == Decimal("3.00")
+    assert subjects["Subject 1"].percentage == Decimal("33.33")
+    assert subjects[empty.name].conducted_hours == 0
+    assert subjects[empty.name].percentage == Decimal("100.00")
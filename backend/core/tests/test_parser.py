@@ -0,0 +1,73 @@
+import io
+import tracemalloc
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from core.formats import FormatProfile, detect_format, register_profile, unregister_profile
+from core.utils import parse_attendance_csv, iter_attendance_rows, iter_decoded_lines
+
+HEADER = "#,Subject Code,Subject,Subject Type,Present,OD,Makeup,Absent\n"
+
+def report(rows):
+    body = "".join(f"{i},CS{i:03d},Course {i},{'Lab' if i % 4 == 0 else 'Theory'},{i % 30},1,0,{i % 7}\n" for i in range(1, rows + 1))
+    return ("﻿" + HEADER + body).encode("utf-8")
+
+def test_parse_known_format_from_uploaded_file():
+    upload = SimpleUploadedFile("Attendance Report.csv", report(8))
+    data = parse_attendance_csv(upload)
+    
+    assert len(data["subjects"]) == 8
+    lab = next(s for s in data["subjects"] if s["name"] == "Course 4")
+    assert (lab["attended"], lab["conducted"]) == ((4 + 1) * 3, (4 + 1 + 4) * 3)
+
+def test_decoder_handles_chunk_boundaries_inside_characters():
+    text = "Sübject,Präsent\n" * 5000
+    lines = list(iter_decoded_lines(io.BytesIO(text.encode("utf-8"))))
+    assert "".join(lines) == text
+
+def test_limits_are_enforced_while_streaming():
+    with pytest.raises(ValueError, match = "too large"):
+        parse_attendance_csv(io.BytesIO(report(500)), max_bytes = 1024)
+    with pytest.raises(ValueError, match = "Too many rows"):
+        parse_attendance_csv(io.BytesIO(report(500)), max_rows = 100)
+
+def test_rows_are_yielded_lazily_with_flat_memory():
+    payload = report(60000)
+    assert len(payload) > 2_000_000
+    
+    tracemalloc.start()
+    rows = iter_attendance_rows(io.BytesIO(payload), max_bytes = 0, max_rows = 0)
+    first = next(rows)
+    for _ in rows:
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    assert first["name"] == "Course 1"
+    assert peak < 1_000_000
+
+def test_header_scan_matches_whole_words_only():
+    # "Period" and "Module Code" used to be taken for the OD / subject columns.
+    csv = "Module Code,Subject Name,Period,Session Type,Present,On Duty,Absent\nM1,Networks,Mon,Lab,4,1,1\n"
+    data = parse_attendance_csv(io.BytesIO(csv.encode()))
+    assert data["subjects"] == [{"id": "Networks", "name": "Networks", "type": "Lab", "attended": 15, "conducted": 18, "percentage": 83.33}]
+
+def test_registered_profile_and_configurable_weights(settings):
+    profile = FormatProfile(
+        name = "campus_export",
+        signature = ("course", "kind", "attended", "missed"),
+        columns = {"subject": "course", "type": "kind"},
+        statuses = {"attended": "PRESENT", "missed": "ABSENT"},
+    )
+    register_profile(profile)
+    try:
+        settings.ATTENDANCE_SESSION_WEIGHTS = (("practical", 2),)
+        csv = "Course,Kind,Attended,Missed\nChemistry,Practical,3,1\n"
+        data = parse_attendance_csv(io.BytesIO(csv.encode()))
+        assert (data["subjects"][0]["attended"], data["subjects"][0]["conducted"]) == (6, 8)
+        assert detect_format(["course", "KIND", " Attended", "missed"])[0] is profile
+    finally:
+        unregister_profile(profile)
+
+def test_unmappable_header_is_rejected():
+    with pytest.raises(ValueError, match = "Could not map columns"):
+        parse_attendance_csv(io.BytesIO(b"a,b,c\n1,2,3\n"))
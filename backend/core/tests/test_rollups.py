@@ -0,0 +1,52 @@
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from core.models import Subject, SessionType, AttendanceLog, AttendanceRollup
+
+@pytest.fixture
+def subject(db):
+    user = User.objects.create(username = "rollup_student")
+    return Subject.objects.create(user = user, name = "Compilers")
+
+@pytest.mark.django_db
+def test_rollup_tracks_create_update_delete(subject):
+    lecture = SessionType.objects.create(subject = subject, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = subject, name = "Lab", duration_hours = 3.0)
+    
+    log = AttendanceLog.objects.create(session_type = lecture, date = "2026-03-02", status = "PRESENT")
+    AttendanceLog.objects.create(session_type = lab, date = "2026-03-03", status = "ABSENT")
+    AttendanceLog.objects.create(session_type = lab, date = "2026-03-04", status = "CANCELLED")
+    
+    rollup = AttendanceRollup.objects.get(session_type = lab)
+    assert (rollup.absent_count, rollup.cancelled_count, rollup.conducted_hours) == (1, 1, Decimal("3.00"))
+    
+    # A re-fetched row flips status, then moves to the lab.
+    log = AttendanceLog.objects.get(pk = log.pk)
+    log.status = "ABSENT"
+    log.save()
+    log.session_type = lab
+    log.save()
+    assert subject.current_status_details == {'attended_hours': Decimal("0.00"), 'conducted_hours': Decimal("6.00")}
+    
+    log.delete()
+    lab.duration_hours = Decimal("2.00")
+    lab.save()
+    assert subject.current_status_details == {'attended_hours': Decimal("0.00"), 'conducted_hours': Decimal("2.00")}
+    assert AttendanceRollup.objects.verify() == []
+
+@pytest.mark.django_db
+def test_rebuild_command_repairs_bulk_writes(subject):
+    lecture = SessionType.objects.create(subject = subject, name = "Lecture", duration_hours = 1.0)
+    AttendanceLog.objects.bulk_create([
+        AttendanceLog(session_type = lecture, date = f"2026-04-{day:02d}", status = "PRESENT") for day in range(1, 11)
+    ])
+    
+    with pytest.raises(CommandError):
+        call_command("rebuild_rollups", "--verify")
+    
+    call_command("rebuild_rollups")
+    call_command("rebuild_rollups", "--verify")
+    assert subject.current_status == 100
+    assert Subject.objects.with_attendance().get(pk = subject.pk).attended_hours == Decimal("10.00")
@@ -0,0 +1,80 @@
+import time
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from rest_framework.test import APIClient
+from core.models import Subject, SessionType, AttendanceLog
+from core.routers import reading_since, routing_scope, use_replica
+
+# Transactional tests: a test-wide atomic block would keep every read on the primary.
+pytestmark = pytest.mark.django_db(databases = ["default", "replica"], transaction = True)
+
+@pytest.fixture
+def routed(settings):
+    settings.DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+
+@pytest.fixture
+def student(django_user_model):
+    # On the primary: a subject with attendance. On the "replica": the same rows, minus the logs.
+    user = django_user_model.objects.create(username = "replicated")
+    sub = Subject.objects.create(user = user, name = "Databases")
+    lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+    AttendanceLog.objects.create(session_type = lec, date = "2025-03-03", status = "PRESENT")
+    user.save(using = "replica", force_insert = True)
+    sub.save(using = "replica", force_insert = True)
+    return user, sub, lec
+
+def test_only_opted_in_reads_use_the_replica(routed, student):
+    user, sub, lec = student
+    with routing_scope():
+        # Primary by default.
+        assert AttendanceLog.objects.filter(session_type__subject = sub).count() == 1
+        with use_replica():
+            assert not AttendanceLog.objects.filter(session_type__subject = sub).exists()
+            AttendanceLog.objects.create(session_type = lec, date = "2025-03-04", status = "ABSENT")
+            # Read-after-write in the same scope stays on the primary.
+            assert AttendanceLog.objects.filter(session_type__subject = sub).count() == 2
+
+    with routing_scope():
+        with use_replica():
+            assert not AttendanceLog.objects.exists()
+            with transaction.atomic():
+                assert AttendanceLog.objects.count() == 2
+        with reading_since(time.time()):
+            assert AttendanceLog.objects.count() == 2
+        with reading_since(time.time() - 60):
+            assert not AttendanceLog.objects.exists()
+
+def test_follow_up_requests_read_their_own_writes_while_the_replica_lags(routed, settings, tmp_path):
+    # Nothing written below ever reaches the "replica".
+    client = APIClient()
+    assert client.post("/api/auth/register/", {"username": "fresh", "password": "s3cret-pass"}, format = "json").status_code == 201
+    login = client.post("/api/auth/login/", {"username": "fresh", "password": "s3cret-pass"}, format = "json")
+    assert login.status_code == 200
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.ATTENDANCE_IMPORT_EXECUTOR = 'core.jobs.DatabaseQueueExecutor'
+    client.credentials(HTTP_AUTHORIZATION = f"Bearer {login.json()['access']}")
+    csv = SimpleUploadedFile("log.csv", b"Subject,Type,Date,Status\nOS,Lecture,2025-01-02,P\n")
+    created = client.post("/api/attendance/import/?async=1", {"file": csv}, format = "multipart")
+    assert created.status_code == 202
+    status = client.get(f"/api/attendance/import/{created.json()['job_id']}/")
+    assert status.status_code == 200 and status.json()["status"] == "QUEUED"
+
+def test_dashboard_reads_the_primary_right_after_a_change(routed, student, settings):
+    user, _, _ = student
+    client = APIClient()
+    client.force_authenticate(user = user)
+
+    settings.DATABASE_REPLICA_LAG = 0
+    assert client.get("/api/dashboard/").json()["global"]["conducted"] == 0
+
+    # A fresh data version counts as a change: served from the primary.
+    cache.clear()
+    settings.DATABASE_REPLICA_LAG = 60
+    assert client.get("/api/dashboard/").json()["global"]["conducted"] == 1.0
+
+def test_without_a_router_everything_uses_the_primary(student):
+    _, sub, _ = student
+    assert AttendanceLog.objects.filter(session_type__subject = sub).count() == 1
@@ -0,0 +1,58 @@
+import time
+import pytest
+from datetime import date, timedelta
+from rest_framework.test import APIClient
+from core.models import Subject, SessionType, AttendanceLog
+from core.skips import bounded_knapsack, max_skips, must_attend
+
+def test_closed_form_bounds():
+    # 10h attended of 10h at 75%: 10 / (10 + 3k) >= 0.75 -> k <= 1.11
+    assert max_skips(1000, 1000, 7500, 300) == 1
+    # 6 of 10 at 75%: (6 + n) / (10 + n) >= 0.75 -> n >= 6
+    assert must_attend(600, 1000, 7500, 100) == 6
+    assert must_attend(600, 1000, 10000, 100) is None
+    assert bounded_knapsack([(300, 4), (100, 2)], 1000) in ([3, 1], [2, 4 - 2])
+
+@pytest.mark.django_db
+def test_safe_skips_endpoint_and_optimizer(django_user_model):
+    user = django_user_model.objects.create(username = "skipper")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    sub = Subject.objects.create(user = user, name = "Networks")
+    lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = sub, name = "Lab", duration_hours = 3.0)
+    for i in range(20):
+        AttendanceLog.objects.create(session_type = lec, date = date(2025, 1, 1) + timedelta(days = i), status = "PRESENT")
+    
+    report = client.get("/api/attendance/safe-skips/").json()["subjects"][0]
+    limits = {row["name"]: row["max_skips"] for row in report["session_types"]}
+    assert limits == {"Lecture": 6, "Lab": 2}
+    
+    start = date(2025, 3, 1)
+    sessions = [
+        {"session_type_id": (lab if i % 5 == 0 else lec).id, "date": (start + timedelta(days = i // 3)).isoformat()}
+        for i in range(600)
+    ]
+    began = time.perf_counter()
+    result = client.post("/api/attendance/safe-skips/", {"sessions": sessions}, format = "json").json()
+    assert time.perf_counter() - began < 1.0
+    
+    summary = result["subjects"][0]
+    assert summary["final_percentage"] >= 75.0
+    # 20h attended + 840h upcoming at 75% leaves a 215h budget, which the knapsack fills exactly.
+    assert summary["skipped_hours"] == 215.0
+    assert sum(1 for s in result["plan"] if s["action"] == "SKIP") > 0
+
+@pytest.mark.django_db
+def test_skip_plan_rejects_malformed_ids(django_user_model):
+    user = django_user_model.objects.create(username = "fuzzed")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    lec = SessionType.objects.create(subject = Subject.objects.create(user = user, name = "Networks"), name = "Lecture")
+
+    for session in ({"session_type_id": [lec.id]}, {"session_type_id": {"id": lec.id}}, {"session_type_id": str(lec.id)},
+                    {"session_type_id": lec.id, "subject_id": [1]}):
+        response = client.post("/api/attendance/safe-skips/", {"sessions": [{**session, "date": "2025-03-01"}]}, format = "json")
+        assert response.status_code == 400 and "integers" in response.json()["error"]
+    assert client.post("/api/attendance/safe-skips/", [{"session_type_id": lec.id}], format = "json").status_code == 400
@@ -0,0 +1,107 @@
+import random
+from datetime import date, timedelta
+import pytest
+from rest_framework.test import APIClient
+from core.models import Subject, SessionType, AttendanceLog
+from core.timetable import FULL, Timetable, build_projection, iter_sessions, last_reachable_date, weekday_counts
+
+def random_timetable(rng):
+    start = date(2025, 1, 1) + timedelta(days = rng.randrange(60))
+    end = start + timedelta(days = rng.randrange(0, 150))
+    entries = [(st, st % 3, rng.randrange(7), slot, rng.choice((100, 150, 300))) for st in range(1, 7) for slot in range(rng.randrange(1, 3))]
+    exceptions = [(start + timedelta(days = rng.randrange(-10, 160)), rng.choice((None, rng.randrange(1, 7)))) for _ in range(rng.randrange(12))]
+    return Timetable(start, end, entries, exceptions)
+
+def test_closed_form_matches_the_generated_sessions():
+    rng = random.Random(3)
+    for _ in range(200):
+        start, end = date(2025, 1, 1) + timedelta(days = rng.randrange(30)), date(2025, 1, 1) + timedelta(days = rng.randrange(-5, 90))
+        brute = [0] * 7
+        day = start
+        while day <= end:
+            brute[day.weekday()] += 1
+            day += timedelta(days = 1)
+        assert weekday_counts(start, end) == brute
+        
+        timetable = random_timetable(rng)
+        when = timetable.start_date + timedelta(days = rng.randrange(-5, 160))
+        sessions = list(iter_sessions(timetable, when))
+        for subject_id in range(3):
+            own = [s for s in sessions if s[2] == subject_id]
+            assert timetable.remaining(subject_id, when) == (len(own), sum(s[4] for s in own))
+
+def test_last_reachable_date_is_the_latest_day_attending_everything_still_works():
+    rng = random.Random(5)
+    for _ in range(100):
+        timetable = random_timetable(rng)
+        start = timetable.start_date
+        attended, conducted, target = rng.randrange(0, 2000), 2000, rng.choice((6000, 7500, 9000))
+        found, reachable = last_reachable_date(timetable, 1, start, attended, conducted, target)
+        
+        total = timetable.remaining(1, start)[1]
+        ok = lambda day: (attended + timetable.remaining(1, day)[1]) * FULL >= target * (conducted + total)
+        days = [start + timedelta(days = i) for i in range((timetable.end_date - start).days + 2)]
+        good = [day for day in days if ok(day)]
+        if ok(days[-1]):
+            assert (found, reachable) == (None, True)
+        elif not good:
+            assert (found, reachable) == (None, False)
+        else:
+            assert (found, reachable) == (max(good), True)
+
+@pytest.mark.django_db
+def test_projection_api_is_cached_and_follows_changes(django_user_model, django_assert_num_queries, django_capture_on_commit_callbacks):
+    user = django_user_model.objects.create(username = "planner")
+    sub = Subject.objects.create(user = user, name = "Physics", target_percentage = 75)
+    lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = sub, name = "Lab", duration_hours = 2.0)
+    for i in range(4):
+        AttendanceLog.objects.create(session_type = lec, date = date(2025, 2, 3) + timedelta(days = i), status = "PRESENT" if i else "ABSENT")
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    assert client.get("/api/timetable/projection/").status_code == 400
+    
+    timetable = {
+        "start_date": "2025-02-03", "end_date": "2025-03-02",
+        "entries": [{"session_type_id": lec.id, "weekday": "monday"}, {"session_type_id": lec.id, "weekday": 2}, {"session_type_id": lab.id, "weekday": 4}],
+        "exceptions": [{"date": "2025-02-17", "reason": "Holiday"}, {"date": "2025-02-21", "session_type_id": lab.id}],
+    }
+    with django_capture_on_commit_callbacks(execute = True):
+        response = client.put("/api/timetable/", timetable, format = "json")
+    assert response.status_code == 200
+    assert len(response.json()["entries"]) == 3
+    
+    url = "/api/timetable/projection/?start=2025-02-10&upcoming=3"
+    data = client.get(url).json()
+    physics = data["subjects"][0]
+    # Feb 10 - Mar 2: 3 Mondays (one a holiday) + 3 Wednesdays of 1h, 3 Fridays of 2h (one cancelled).
+    assert (physics["remaining_sessions"], physics["remaining_hours"]) == (7, 9.0)
+    assert (physics["best_case"], physics["worst_case"]) == (92.31, 23.08)
+    assert physics["target_reachable"] and not physics["target_secured"]
+    # Needs 0.75 * 13 = 9.75h attended: from Feb 14 on there are 7h left, from Feb 15 only 5h.
+    assert physics["last_reachable_date"] == "2025-02-14"
+    assert [s["date"] for s in data["upcoming"]] == ["2025-02-10", "2025-02-12", "2025-02-14"]
+    
+    with django_assert_num_queries(0):
+        assert client.get(url).json() == data
+    
+    with django_capture_on_commit_callbacks(execute = True):
+        AttendanceLog.objects.create(session_type = lec, date = "2025-02-07", status = "PRESENT")
+    assert client.get(url).json()["subjects"][0]["best_case"] == 92.86
+    
+    bad = {**timetable, "entries": [{"session_type_id": 999, "weekday": 0}]}
+    assert client.put("/api/timetable/", bad, format = "json").status_code == 400
+
+@pytest.mark.django_db
+def test_target_secured_compares_exactly(django_user_model):
+    user = django_user_model.objects.create(username = "borderline")
+    sub = Subject.objects.create(user = user, name = "Optics", target_percentage = "66.67")
+    lec = SessionType.objects.create(subject = sub, name = "Lecture", duration_hours = 1.0)
+    for day in (3, 4):
+        AttendanceLog.objects.create(session_type = lec, date = date(2025, 2, day), status = "PRESENT")
+    # One Monday lecture left: skipping it ends on 2 / 3 = 66.666...%, which rounds to the target.
+    timetable = Timetable(date(2025, 2, 10), date(2025, 2, 10), [(lec.id, sub.id, 0, 0, 100)], [])
+    optics = build_projection(user, date(2025, 2, 10), timetable)["subjects"][0]
+    assert optics["worst_case"] == 66.67
+    assert not optics["target_secured"]
@@ -0,0 +1,95 @@
+import pytest
+from rest_framework.test import APIClient
+from core.models import Subject, SessionType, AttendanceLog
+from core.trends import CumulativeSeries, bucket_ends
+from datetime import date
+
+@pytest.fixture
+def student(django_user_model):
+    user = django_user_model.objects.create(username = "trends")
+    algo = Subject.objects.create(user = user, name = "Algorithms")
+    lec = SessionType.objects.create(subject = algo, name = "Lecture", duration_hours = 1.0)
+    lab = SessionType.objects.create(subject = algo, name = "Lab", duration_hours = 3.0)
+    ethics = Subject.objects.create(user = user, name = "Ethics")
+    talk = SessionType.objects.create(subject = ethics, name = "Lecture", duration_hours = 1.0)
+    AttendanceLog.objects.create(session_type = lec, date = "2025-01-06", status = "PRESENT")
+    AttendanceLog.objects.create(session_type = lab, date = "2025-01-07", status = "ABSENT")
+    AttendanceLog.objects.create(session_type = talk, date = "2025-01-07", status = "PRESENT")
+    AttendanceLog.objects.create(session_type = lec, date = "2025-01-08", status = "CANCELLED")
+    AttendanceLog.objects.create(session_type = lec, date = "2025-01-14", status = "PRESENT")
+    return user, lec
+
+def test_cumulative_series_lookups():
+    series = CumulativeSeries()
+    assert series.add(10, 100, 100) and series.add(10, 0, 300) and series.add(12, 100, 100)
+    assert not series.add(11, 100, 100)
+    assert series.totals(9) == (0, 0)
+    assert series.totals(11) == (100, 400)
+    assert series.totals(99) == (200, 500)
+    assert series.window(12, 2) == (100, 100)
+
+def test_bucket_ends():
+    assert list(bucket_ends(date(2025, 1, 6), date(2025, 1, 15), 'week')) == [date(2025, 1, 12), date(2025, 1, 15)]
+    assert list(bucket_ends(date(2025, 1, 30), date(2025, 3, 1), 'month')) == [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 1)]
+
+@pytest.mark.django_db
+def test_trends_endpoint_and_incremental_extension(student, django_capture_on_commit_callbacks, django_assert_num_queries):
+    user, lec = student
+    client = APIClient()
+    client.force_authenticate(user = user)
+    
+    data = client.get("/api/attendance/trends/", {"bucket": "day", "windows": "7"}).json()
+    overall = {p["date"]: p for p in data["global"]}
+    assert overall["2025-01-07"]["percentage"] == 40.0
+    assert overall["2025-01-07"]["conducted"] == 5.0
+    assert overall["2025-01-14"]["percentage"] == 50.0
+    # 7-day window ending on the 14th holds only that day's lecture.
+    assert overall["2025-01-14"]["rolling"] == {"7": 100.0}
+    algo = data["subjects"][0]
+    assert algo["name"] == "Algorithms" and algo["points"][-1]["conducted"] == 5.0
+    
+    # A later log extends the cached index; an edited old log forces a rescan. Both stay exact.
+    with django_capture_on_commit_callbacks(execute = True):
+        AttendanceLog.objects.create(session_type = lec, date = "2025-01-20", status = "ABSENT")
+    with django_assert_num_queries(2) as captured:
+        weekly = client.get("/api/attendance/trends/", {"bucket": "week"}).json()["global"]
+    assert '"id" >' in captured.captured_queries[1]["sql"]
+    assert [p["date"] for p in weekly] == ["2025-01-12", "2025-01-19", "2025-01-20"]
+    assert weekly[-1]["percentage"] == 42.86
+    
+    with django_capture_on_commit_callbacks(execute = True):
+        log = AttendanceLog.objects.get(date = "2025-01-07", session_type__name = "Lab")
+        log.status = "PRESENT"
+        log.save()
+    weekly = client.get("/api/attendance/trends/", {"bucket": "week"}).json()["global"]
+    assert weekly[0]["percentage"] == 100.0
+    
+    assert client.get("/api/attendance/trends/", {"bucket": "year"}).status_code == 400
+
+@pytest.mark.django_db
+def test_rewrites_that_keep_totals_rebuild_the_index(student, django_capture_on_commit_callbacks):
+    user, lec = student
+    client = APIClient()
+    client.force_authenticate(user = user)
+    weekly = client.get("/api/attendance/trends/", {"bucket": "week", "subject": lec.subject_id}).json()["global"]
+    assert [p["attended"] for p in weekly] == [1.0, 2.0]
+
+    # Swap PRESENT / ABSENT between two lectures: every total stays the same, the weeks do not.
+    with django_capture_on_commit_callbacks(execute = True):
+        AttendanceLog.objects.create(session_type = lec, date = "2025-01-15", status = "ABSENT")
+    with django_capture_on_commit_callbacks(execute = True):
+        first = AttendanceLog.objects.get(session_type = lec, date = "2025-01-06")
+        first.status = "ABSENT"
+        first.save()
+        last = AttendanceLog.objects.get(session_type = lec, date = "2025-01-15")
+        last.status = "PRESENT"
+        last.save()
+    weekly = client.get("/api/attendance/trends/", {"bucket": "week", "subject": lec.subject_id}).json()["global"]
+    assert [p["attended"] for p in weekly] == [0.0, 2.0]
+
+    # Moving a log to another date.
+    with django_capture_on_commit_callbacks(execute = True):
+        last.date = "2025-01-09"
+        last.save()
+    weekly = client.get("/api/attendance/trends/", {"bucket": "week", "subject": lec.subject_id}).json()["global"]
+    assert [p["attended"] for p in weekly] == [1.0, 2.0]
@@ -0,0 +1,314 @@
+"""
+Semester projections from the weekly timetable.
+
+Future sessions are never stored. iter_sessions() generates them lazily, day by day; the projection
+itself is closed form. The number of Mondays (Tuesdays, ...) in a date range is arithmetic, so the
+hours left for a subject are its weekly hours per weekday times those counts, minus what the
+exception dates take away (a bisect into per-subject prefix sums). Best / worst case finals follow
+directly, and the last date by which attending everything still reaches the target is a binary
+search over that O(log exceptions) function.
+
+Projections are cached under the user's data version (bumped by log, subject and timetable
+changes) and the start date, so a semester-long horizon costs a cache lookup.
+"""
+from bisect import bisect_left
+from datetime import date as date_cls, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from .cache import bump_data_version, versioned_key
+from .forecast import CENTI, percentage, to_centi
+from .models import Semester, SessionType, Subject, TimetableEntry, TimetableException
+
+FULL = 10000
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+MAX_ENTRIES = 200
+MAX_EXCEPTIONS = 400
+MAX_UPCOMING = 500
+CACHE_PREFIX = 'timetable'
+
+
+def weekday_counts(start, end):
+    """[Mondays, Tuesdays, ..., Sundays] from start to end inclusive (all 0 when end < start)."""
+    days = (end - start).days + 1
+    if days <= 0:
+        return [0] * 7
+    weeks, rest = divmod(days, 7)
+    counts = [weeks] * 7
+    for i in range(rest):
+        counts[(start.weekday() + i) % 7] += 1
+    return counts
+
+
+class SubjectSchedule:
+    """One subject's weekly sessions / centi-hours per weekday, and what each exception date removes."""
+    __slots__ = ('sessions', 'hours', 'exception_days', 'lost_sessions', 'lost_hours')
+
+    def __init__(self):
+        self.sessions = [0] * 7
+        self.hours = [0] * 7
+        # Exception days in order, with prefix sums of the sessions / hours they remove.
+        self.exception_days = []
+        self.lost_sessions = [0]
+        self.lost_hours = [0]
+
+    def add_exception(self, ordinal, sessions, hours):
+        """Exceptions must be added in date order."""
+        self.exception_days.append(ordinal)
+        self.lost_sessions.append(self.lost_sessions[-1] + sessions)
+        self.lost_hours.append(self.lost_hours[-1] + hours)
+
+    def remaining(self, start, end):
+        """(sessions, centi-hours) still scheduled from start to end inclusive."""
+        counts = weekday_counts(start, end)
+        sessions = sum(n * c for n, c in zip(self.sessions, counts))
+        hours = sum(h * c for h, c in zip(self.hours, counts))
+        # Exceptions are only kept up to the semester end, so only the lower bound needs a bisect.
+        i = bisect_left(self.exception_days, start.toordinal())
+        return sessions - (self.lost_sessions[-1] - self.lost_sessions[i]), hours - (self.lost_hours[-1] - self.lost_hours[i])
+
+
+class Timetable:
+    """A user's semester as plain data, built from the three timetable tables."""
+
+    def __init__(self, start_date, end_date, entries, exceptions):
+        """
+        entries: (session_type_id, subject_id, weekday, slot, centi-hours) rows.
+        exceptions: (date, session_type_id or None) rows; None means no classes at all that day.
+        """
+        self.start_date = start_date
+        self.end_date = end_date
+        self.entries = sorted(entries, key = lambda e: (e[2], e[3], e[0]))
+        self.by_weekday = [[e for e in self.entries if e[2] == weekday] for weekday in range(7)]
+        self.holidays = {day for day, st_id in exceptions if st_id is None}
+        self.cancelled = {(day, st_id) for day, st_id in exceptions if st_id is not None}
+
+        self.subjects = {}
+        for st_id, subject_id, weekday, slot, hours in self.entries:
+            schedule = self.subjects.setdefault(subject_id, SubjectSchedule())
+            schedule.sessions[weekday] += 1
+            schedule.hours[weekday] += hours
+
+        lost = {}
+        for day in {day for day, _ in exceptions if day <= end_date}:
+            for st_id, subject_id, _, _, hours in self.by_weekday[day.weekday()]:
+                if day in self.holidays or (day, st_id) in self.cancelled:
+                    sessions, removed = lost.get((subject_id, day), (0, 0))
+                    lost[(subject_id, day)] = (sessions + 1, removed + hours)
+        for (subject_id, day), (sessions, removed) in sorted(lost.items(), key = lambda item: item[0][1]):
+            self.subjects[subject_id].add_exception(day.toordinal(), sessions, removed)
+
+    def remaining(self, subject_id, start):
+        schedule = self.subjects.get(subject_id)
+        if schedule is None:
+            return 0, 0
+        return schedule.remaining(max(start, self.start_date), self.end_date)
+
+
+def iter_sessions(timetable, start, end = None):
+    """Lazily yields (date, session_type_id, subject_id, slot, centi-hours) for every scheduled session."""
+    day = max(start, timetable.start_date)
+    end = min(end or timetable.end_date, timetable.end_date)
+    one_day = timedelta(days = 1)
+    while day <= end:
+        if day not in timetable.holidays:
+            for st_id, subject_id, weekday, slot, hours in timetable.by_weekday[day.weekday()]:
+                if (day, st_id) not in timetable.cancelled:
+                    yield day, st_id, subject_id, slot, hours
+        day += one_day
+
+
+def last_reachable_date(timetable, subject_id, start, attended, conducted, target):
+    """
+    Latest date d such that skipping everything before d and attending everything from d on still
+    ends the semester at or above target. (None, True) when even skipping everything is safe,
+    (None, False) when attending everything can't reach it any more, else (d, True).
+    """
+    _, total = timetable.remaining(subject_id, start)
+    needed = target * (conducted + total)
+
+    def reachable(day):
+        return (attended + timetable.remaining(subject_id, day)[1]) * FULL >= needed
+
+    if reachable(timetable.end_date + timedelta(days = 1)):
+        return None, True
+    if not reachable(start):
+        return None, False
+    low, high = max(start, timetable.start_date).toordinal(), timetable.end_date.toordinal()
+    while low < high:
+        middle = (low + high + 1) // 2
+        if reachable(date_cls.fromordinal(middle)):
+            low = middle
+        else:
+            high = middle - 1
+    return date_cls.fromordinal(low), True
+
+
+def load_timetable(user):
+    """The user's Timetable (two queries after the semester), or None without a semester."""
+    semester = Semester.objects.filter(user = user).first()
+    if semester is None:
+        return None
+    entries = [
+        (st_id, subject_id, weekday, slot, to_centi(duration))
+        for st_id, subject_id, weekday, slot, duration in TimetableEntry.objects.filter(
+            session_type__subject__user = user
+        ).values_list('session_type_id', 'session_type__subject_id', 'weekday', 'slot', 'session_type__duration_hours')
+    ]
+    exceptions = list(TimetableException.objects.filter(
+        user = user, date__gte = semester.start_date, date__lte = semester.end_date
+    ).values_list('date', 'session_type_id'))
+    return Timetable(semester.start_date, semester.end_date, entries, exceptions)
+
+
+def build_projection(user, start, timetable = None):
+    """Per-subject remaining sessions / hours, best and worst case finals and the last reachable date."""
+    timetable = timetable or load_timetable(user)
+    if timetable is None:
+        raise ValueError("No semester set up. Save a timetable first.")
+
+    subjects = []
+    for subject in Subject.objects.filter(user = user).with_attendance().order_by('name'):
+        attended, conducted = to_centi(subject.attended_hours), to_centi(subject.conducted_hours)
+        target = to_centi(subject.target_percentage)
+        sessions, hours = timetable.remaining(subject.id, start)
+        deadline, reachable = last_reachable_date(timetable, subject.id, start, attended, conducted, target)
+        subjects.append({
+            "id": subject.id,
+            "name": subject.name,
+            "target_percentage": target / CENTI,
+            "percentage": percentage(attended, conducted),
+            "remaining_sessions": sessions,
+            "remaining_hours": hours / CENTI,
+            "best_case": percentage(attended + hours, conducted + hours),
+            "worst_case": percentage(attended, conducted + hours),
+            "target_reachable": reachable,
+            # Exact, like last_reachable_date: the rounded worst case can read as the target while just below it.
+            "target_secured": attended * FULL >= target * (conducted + hours),
+            "last_reachable_date": deadline.isoformat() if deadline else None,
+        })
+
+    return {
+        "start": max(start, timetable.start_date).isoformat(),
+        "semester_end": timetable.end_date.isoformat(),
+        "subjects": subjects,
+    }
+
+
+def cached_timetable(user, version):
+    key = versioned_key(f'{CACHE_PREFIX}:data', user.pk, version)
+    timetable = cache.get(key)
+    if timetable is None:
+        timetable = load_timetable(user)
+        if timetable is not None:
+            cache.set(key, timetable)
+    return timetable
+
+
+def cached_projection(user, version, start):
+    """build_projection for `version` and `start`, built at most once per version and day."""
+    key = versioned_key(f'{CACHE_PREFIX}:projection:{start.isoformat()}', user.pk, version)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_projection(user, start, cached_timetable(user, version))
+        cache.set(key, payload)
+    return payload
+
+
+def parse_weekday(value):
+    if isinstance(value, str) and value.strip().lower() in WEEKDAYS:
+        return WEEKDAYS.index(value.strip().lower())
+    try:
+        weekday = int(value)
+    except (TypeError, ValueError):
+        weekday = -1
+    if not 0 <= weekday <= 6:
+        raise ValueError(f"Invalid weekday {value!r}; use 0-6 (Monday = 0) or a day name.")
+    return weekday
+
+
+def parse_date(value, field):
+    try:
+        return date_cls.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"Invalid {field} {value!r}; expected YYYY-MM-DD.")
+
+
+def save_timetable(user, payload):
+    """
+    Replaces the user's semester, weekly entries and exceptions from
+    {"start_date", "end_date", "entries": [{"session_type_id", "weekday", "slot"}],
+     "exceptions": [{"date", "session_type_id"?, "reason"?}]}. Raises ValueError.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected an object.")
+    start_date = parse_date(payload.get('start_date'), 'start_date')
+    end_date = parse_date(payload.get('end_date'), 'end_date')
+    if end_date < start_date:
+        raise ValueError("'end_date' must not be before 'start_date'.")
+
+    entries, exceptions = payload.get('entries', []), payload.get('exceptions', [])
+    if not isinstance(entries, list) or not isinstance(exceptions, list):
+        raise ValueError("'entries' and 'exceptions' must be lists.")
+    if len(entries) > MAX_ENTRIES or len(exceptions) > MAX_EXCEPTIONS:
+        raise ValueError(f"At most {MAX_ENTRIES} entries and {MAX_EXCEPTIONS} exceptions.")
+
+    rows = set()
+    for idx, entry in enumerate(entries, start = 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Entry {idx}: expected an object.")
+        try:
+            st_id, slot = int(entry.get('session_type_id')), int(entry.get('slot', 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"Entry {idx}: session_type_id and slot must be integers.")
+        if slot < 0:
+            raise ValueError(f"Entry {idx}: slot must not be negative.")
+        rows.add((st_id, parse_weekday(entry.get('weekday')), slot))
+
+    days_off = {}
+    for idx, exception in enumerate(exceptions, start = 1):
+        if not isinstance(exception, dict):
+            raise ValueError(f"Exception {idx}: expected an object.")
+        try:
+            st_id = int(exception['session_type_id']) if exception.get('session_type_id') is not None else None
+        except (TypeError, ValueError):
+            raise ValueError(f"Exception {idx}: session_type_id must be an integer.")
+        day = parse_date(exception.get('date'), 'date')
+        days_off[(day, st_id)] = str(exception.get('reason') or '').strip()[:100]
+
+    type_ids = {st_id for st_id, _, _ in rows} | {st_id for _, st_id in days_off if st_id is not None}
+    owned = set(SessionType.objects.filter(pk__in = type_ids, subject__user = user).values_list('id', flat = True))
+    unknown = sorted(type_ids - owned)
+    if unknown:
+        raise ValueError(f"Unknown session types: {', '.join(map(str, unknown))}.")
+
+    with transaction.atomic():
+        Semester.objects.update_or_create(user = user, defaults = {'start_date': start_date, 'end_date': end_date})
+        TimetableEntry.objects.filter(session_type__subject__user = user).delete()
+        TimetableEntry.objects.bulk_create([
+            TimetableEntry(session_type_id = st_id, weekday = weekday, slot = slot) for st_id, weekday, slot in sorted(rows)
+        ])
+        TimetableException.objects.filter(user = user).delete()
+        TimetableException.objects.bulk_create([
+            TimetableException(user = user, date = day, session_type_id = st_id, reason = reason)
+            for (day, st_id), reason in sorted(days_off.items(), key = lambda item: (item[0][0], item[0][1] or 0))
+        ])
+        bump_data_version(user.pk)
+    return timetable_payload(user)
+
+
+def timetable_payload(user):
+    semester = Semester.objects.filter(user = user).first()
+    return {
+        "start_date": semester.start_date.isoformat() if semester else None,
+        "end_date": semester.end_date.isoformat() if semester else None,
+        "entries": [
+            {"session_type_id": st_id, "subject_id": subject_id, "weekday": weekday, "slot": slot}
+            for st_id, subject_id, weekday, slot in TimetableEntry.objects.filter(
+                session_type__subject__user = user
+            ).order_by('weekday', 'slot', 'session_type_id').values_list('session_type_id', 'session_type__subject_id', 'weekday', 'slot')
+        ],
+        "exceptions": [
+            {"date": day.isoformat(), "session_type_id": st_id, "reason": reason}
+            for day, st_id, reason in TimetableException.objects.filter(user = user).order_by('date', 'id').values_list('date', 'session_type_id', 'reason')
+        ],
+    }
@@ -0,0 +1,261 @@
+"""
+Attendance-over-time series.
+
+One ordered scan of a user's counted logs builds, per subject and overall, parallel arrays of
+(day, cumulative attended centi-hours, cumulative conducted centi-hours). Any "as of day X" total
+is then a bisect, and a rolling window is the difference of two lookups.
+
+Compacted months are replayed from their archive (core.compaction) ahead of the live logs, so the
+series are the same as before compaction. If the archive no longer adds up to the totals (files
+removed by hand), the summaries are used instead: one attended and one missed amount on each
+month's last class day, exact at month ends but coarser inside. The payload's compacted_through
+says where the live logs start.
+
+The index is cached per user, tagged with the user's history version (core.cache), and extended
+with logs newer than the last one it saw. Edits, deletes, re-weighted durations and compaction bump
+the history version, so the next read rescans; appends only bump the data version and are folded
+in. A back-dated append, or an extension whose totals disagree with the rollups, rescans as well.
+"""
+import calendar
+from array import array
+from bisect import bisect_right
+from datetime import date as date_cls, timedelta
+from heapq import merge
+from itertools import chain, islice
+from operator import itemgetter
+from django.core.cache import cache
+from .cache import history_version, versioned_key
+from .compaction import archived_rows, compaction_summaries, month_end
+from .forecast import CENTI, percentage, to_centi
+from .models import AttendanceLog, Subject, COUNTED_STATUSES
+
+BUCKETS = ('day', 'week', 'month')
+DEFAULT_WINDOWS = (7, 30)
+MAX_WINDOW_DAYS = 366
+MAX_POINTS = 2000
+INDEX_KEY = 'trends:index:{user_id}'
+INDEX_TIMEOUT = 24 * 60 * 60
+CACHE_PREFIX = 'trends'
+# Archived records as (date, subject_id, status, duration_hours), the columns of counted_logs after the id.
+TREND_COLUMNS = (('date', 'date'), ('subject', 'session_type__subject_id'), ('status', 'status'), ('hours', 'session_type__duration_hours'))
+
+
+class CumulativeSeries:
+    """Prefix sums per distinct day. Days must be appended in order."""
+    __slots__ = ('days', 'attended', 'conducted')
+
+    def __init__(self):
+        self.days = array('l')
+        self.attended = array('q')
+        self.conducted = array('q')
+
+    def add(self, ordinal, attended, conducted):
+        """Adds one log's hours on `ordinal`. Returns False (and changes nothing) if it's back-dated."""
+        if self.days and ordinal <= self.days[-1]:
+            if ordinal < self.days[-1]:
+                return False
+            self.attended[-1] += attended
+            self.conducted[-1] += conducted
+            return True
+        self.days.append(ordinal)
+        self.attended.append((self.attended[-1] if self.attended else 0) + attended)
+        self.conducted.append((self.conducted[-1] if self.conducted else 0) + conducted)
+        return True
+
+    def totals(self, ordinal):
+        """(attended, conducted) centi-hours up to and including `ordinal`."""
+        i = bisect_right(self.days, ordinal)
+        return (self.attended[i - 1], self.conducted[i - 1]) if i else (0, 0)
+
+    def window(self, ordinal, days):
+        """(attended, conducted) over the `days` days ending on `ordinal`."""
+        attended, conducted = self.totals(ordinal)
+        before_attended, before_conducted = self.totals(ordinal - days)
+        return attended - before_attended, conducted - before_conducted
+
+
+class TrendIndex:
+    """Per-subject and overall series for one user, the newest log id folded in and the history version it was built at."""
+
+    def __init__(self, history = None):
+        self.subjects = {}
+        self.overall = CumulativeSeries()
+        self.last_log_id = 0
+        self.history = history
+        self.compacted_through = None
+
+    def extend(self, rows):
+        """Folds (id, date, subject_id, status, duration_hours) rows in. False on a back-dated row."""
+        weights = {}
+        for log_id, day, subject_id, status, hours in rows:
+            weight = weights.get(hours)
+            if weight is None:
+                weight = weights[hours] = to_centi(hours)
+            attended = weight if status == 'PRESENT' else 0
+            series = self.subjects.setdefault(subject_id, CumulativeSeries())
+            if not (series.add(day.toordinal(), attended, weight) and self.overall.add(day.toordinal(), attended, weight)):
+                return False
+            self.last_log_id = max(self.last_log_id, log_id)
+        return True
+
+    def matches(self, totals):
+        """True if every subject's final totals equal `totals` {subject_id: (attended, conducted)}."""
+        empty = CumulativeSeries()
+        if any(series.days and subject_id not in totals for subject_id, series in self.subjects.items()):
+            return False
+        return all(self.subjects.get(sid, empty).totals(date_cls.max.toordinal()) == expected for sid, expected in totals.items())
+
+
+def counted_logs(user):
+    return AttendanceLog.objects.filter(
+        session_type__subject__user = user, status__in = COUNTED_STATUSES
+    ).order_by('date', 'id').values_list('id', 'date', 'session_type__subject_id', 'status', 'session_type__duration_hours')
+
+
+def archive_rows(user):
+    """Counted archived logs as extend() rows, with id 0 like summary rows."""
+    for day, subject_id, status, hours in archived_rows(user.pk, TREND_COLUMNS):
+        if status in COUNTED_STATUSES:
+            yield 0, day, subject_id, status, hours
+
+
+def summary_rows(summaries):
+    """Compacted months as extend() rows: id 0, so they never move last_log_id."""
+    for day, subject_id, attended, conducted in summaries:
+        yield 0, day, subject_id, 'PRESENT', attended
+        yield 0, day, subject_id, 'ABSENT', conducted - attended
+
+
+def load_index(user, totals):
+    """The user's TrendIndex, extended from cache when possible, rebuilt with one scan otherwise."""
+    key = INDEX_KEY.format(user_id = user.pk)
+    # Read before the scan: a rewrite committing meanwhile leaves the index tagged with the old version.
+    history = history_version(user.pk)
+    index = cache.get(key)
+    if index is not None and getattr(index, 'history', None) == history:
+        if index.matches(totals):
+            return index
+        new_logs = counted_logs(user).filter(id__gt = index.last_log_id).iterator()
+        if index.extend(new_logs) and index.matches(totals):
+            cache.set(key, index, INDEX_TIMEOUT)
+            return index
+
+    summaries = list(compaction_summaries(user))
+    index = TrendIndex(history)
+    if summaries:
+        # Compacted months are closed, so the archive ends before the first live log.
+        index.extend(chain(archive_rows(user), counted_logs(user).iterator(chunk_size = 5000)))
+        if not index.matches(totals):
+            index = TrendIndex(history)
+            index.extend(merge(summary_rows(summaries), counted_logs(user).iterator(chunk_size = 5000), key = itemgetter(1)))
+        # Ordered by last_date, so the last one is in the latest compacted month.
+        index.compacted_through = month_end(summaries[-1][0])
+    else:
+        index.extend(counted_logs(user).iterator(chunk_size = 5000))
+    cache.set(key, index, INDEX_TIMEOUT)
+    return index
+
+
+def bucket_ends(first, last, bucket):
+    """Last day of every day/week (Sunday)/month bucket from `first` to `last`, the final one clipped to `last`."""
+    current = first
+    while current <= last:
+        if bucket == 'day':
+            end = current
+        elif bucket == 'week':
+            end = current + timedelta(days = 6 - current.weekday())
+        else:
+            end = current.replace(day = calendar.monthrange(current.year, current.month)[1])
+        yield min(end, last)
+        current = end + timedelta(days = 1)
+
+
+def series_points(series, ends, windows):
+    points = []
+    for end in ends:
+        ordinal = end.toordinal()
+        attended, conducted = series.totals(ordinal)
+        rolling = {}
+        for days in windows:
+            window_attended, window_conducted = series.window(ordinal, days)
+            # No classes in the window is "no data", not 100%.
+            rolling[str(days)] = percentage(window_attended, window_conducted) if window_conducted else None
+        points.append({
+            "date": end.isoformat(),
+            "attended": attended / CENTI,
+            "conducted": conducted / CENTI,
+            "percentage": percentage(attended, conducted),
+            "rolling": rolling,
+        })
+    return points
+
+
+def parse_trend_params(params):
+    """Query params -> (bucket, start, end, windows, subject_id). Raises ValueError."""
+    bucket = params.get('bucket', 'week')
+    if bucket not in BUCKETS:
+        raise ValueError(f"'bucket' must be one of {', '.join(BUCKETS)}.")
+
+    try:
+        start = date_cls.fromisoformat(params['start']) if params.get('start') else None
+        end = date_cls.fromisoformat(params['end']) if params.get('end') else None
+    except ValueError:
+        raise ValueError("'start' and 'end' must be YYYY-MM-DD.")
+    if start and end and start > end:
+        raise ValueError("'start' must not be after 'end'.")
+
+    try:
+        windows = tuple(int(w) for w in params['windows'].split(',') if w.strip()) if params.get('windows') else DEFAULT_WINDOWS
+        subject_id = int(params['subject']) if params.get('subject') else None
+    except ValueError:
+        raise ValueError("'windows' must be comma-separated day counts and 'subject' an id.")
+    if any(not 1 <= w <= MAX_WINDOW_DAYS for w in windows):
+        raise ValueError(f"Rolling windows must be between 1 and {MAX_WINDOW_DAYS} days.")
+
+    return bucket, start, end, windows, subject_id
+
+
+def build_trends(user, bucket = 'week', start = None, end = None, windows = DEFAULT_WINDOWS, subject_id = None):
+    """Cumulative and rolling percentages per bucket, overall (or for `subject_id`) and per subject."""
+    # Every subject is loaded even when one is asked for: their totals validate the cached index.
+    subjects = list(Subject.objects.filter(user = user).with_attendance().order_by('name'))
+    index = load_index(user, {s.id: (to_centi(s.attended_hours), to_centi(s.conducted_hours)) for s in subjects})
+
+    if subject_id is None:
+        overall = index.overall
+    else:
+        subjects = [s for s in subjects if s.id == subject_id]
+        if not subjects:
+            raise ValueError(f"Unknown subject {subject_id}.")
+        overall = index.subjects.get(subject_id, CumulativeSeries())
+
+    ends = []
+    if overall.days:
+        first = start or date_cls.fromordinal(overall.days[0])
+        last = end or date_cls.fromordinal(overall.days[-1])
+        ends = list(islice(bucket_ends(first, last, bucket), MAX_POINTS + 1))
+        if len(ends) > MAX_POINTS:
+            raise ValueError(f"Too many points; narrow the range or use a coarser bucket (max {MAX_POINTS}).")
+
+    return {
+        "bucket": bucket,
+        "windows": list(windows),
+        "compacted_through": index.compacted_through.isoformat() if index.compacted_through else None,
+        "global": series_points(overall, ends, windows),
+        "subjects": [{
+            "id": subject.id,
+            "name": subject.name,
+            "points": series_points(index.subjects.get(subject.id, CumulativeSeries()), ends, windows),
+        } for subject in subjects],
+    }
+
+
+def cached_trends(user, version, params):
+    """build_trends for `version` and these params, built at most once per version."""
+    bucket, start, end, windows, subject_id = params
+    key = versioned_key(f'{CACHE_PREFIX}:{bucket}:{start}:{end}:{",".join(map(str, windows))}:{subject_id}', user.pk, version)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_trends(user, bucket, start, end, windows, subject_id)
+        cache.set(key, payload)
+    return payload
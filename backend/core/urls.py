@@ -1,13 +1,40 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import UploadAttendanceView, RegisterView  # Make sure RegisterView is imported!
+from .views import UploadAttendanceView, RegisterView, ForecastView, SafeSkipsView, ImportJobStatusView, DashboardView, TrendsView, MarkAttendanceView, LogoutView, SubjectStatusView, ExportAttendanceView, TimetableView, TimetableProjectionView, CohortListView, CohortDetailView  # Make sure RegisterView is imported!
 
 urlpatterns = [
     # --- Authentication Routes ---
     path('auth/register/', RegisterView.as_view(), name='auth_register'), # 👈 This was missing
     path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/logout/', LogoutView.as_view(), name='auth_logout'),
 
     # --- Data Routes ---
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('subjects/<int:subject_id>/status/', SubjectStatusView.as_view(), name='subject_status'),
     path('attendance/import/', UploadAttendanceView.as_view(), name='upload_csv'),
-]
\ No newline at end of file
+    path('attendance/import/<int:job_id>/', ImportJobStatusView.as_view(), name='import_job_status'),
+    path('attendance/mark/', MarkAttendanceView.as_view(), name='mark_attendance'),
+    path('attendance/safe-skips/', SafeSkipsView.as_view(), name='safe_skips'),
+    path('attendance/trends/', TrendsView.as_view(), name='attendance_trends'),
+    path('attendance/export/', ExportAttendanceView.as_view(), name='attendance_export'),
+    path('forecast/', ForecastView.as_view(), name='forecast'),
+    path('timetable/', TimetableView.as_view(), name='timetable'),
+    path('timetable/projection/', TimetableProjectionView.as_view(), name='timetable_projection'),
+    path('analytics/cohorts/', CohortListView.as_view(), name='cohorts'),
+    path('analytics/cohorts/<str:code>/', CohortDetailView.as_view(), name='cohort_detail'),
+]
+if settings.ASYNC_MODE:
+    # Under ASGI the read-heavy routes are served by native async views (same URLs and payloads).
+    from . import async_views
+
+    ASYNC_ROUTES = {
+        'dashboard': async_views.dashboard,
+        'subject_status': async_views.subject_status_view,
+        'forecast': async_views.forecast,
+    }
+    urlpatterns = [
+        path(str(p.pattern), ASYNC_ROUTES[p.name], name=p.name) if p.name in ASYNC_ROUTES else p
+        for p in urlpatterns
+    ]
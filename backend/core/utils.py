@@ -1,113 +1,101 @@
+import codecs
 import csv
 import io
-import re
+import logging
+from django.conf import settings
+from .formats import build_extractor, detect_format
+from .instrumentation import phase
 
-def parse_attendance_csv(file_obj):
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+DEFAULT_MAX_UPLOAD_ROWS = 200000
+
+
+def cell(row, idx):
+    """Safe Value Accessor"""
+    return row[idx].strip() if idx != -1 and idx < len(row) else ""
+
+
+def iter_decoded_lines(file_obj, max_bytes = None):
     """
-    Signature-Based Parser.
-    If it sees the exact structure of 'Attendance Report.csv', it HARDCODES indices.
-    No guessing allowed.
+    Decodes an upload chunk by chunk and yields text lines, so only one chunk is ever held in memory.
+    Accepts Django UploadedFile (uses .chunks()), any binary file object, or an already-decoded str.
     """
-    try:
-        decoded_file = file_obj.read().decode('utf-8-sig')
-        io_string = io.StringIO(decoded_file)
-        rows = list(csv.reader(io_string))
+    if isinstance(file_obj, str):
+        yield from io.StringIO(file_obj.lstrip('\ufeff'), newline = '')
+        return
+    
+    if hasattr(file_obj, 'chunks'):
+        chunks = file_obj.chunks(CHUNK_SIZE)
+    else:
+        chunks = iter(lambda: file_obj.read(CHUNK_SIZE), b'')
+    
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    total = 0
+    
+    for chunk in chunks:
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise ValueError(f"File too large. The limit is {max_bytes // (1024 * 1024)} MB.")
         
-        if not rows: raise ValueError("Empty CSV")
+        with phase('csv_decode'):
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    
+    pending += decoder.decode(b'', final = True)
+    if pending:
+        yield pending
+
+
+def iter_csv_rows(file_obj, max_bytes = None, max_rows = None):
+    """Lazily parsed CSV rows with the configured size/row limits applied."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'ATTENDANCE_UPLOAD_MAX_BYTES', DEFAULT_MAX_UPLOAD_BYTES)
+    if max_rows is None:
+        max_rows = getattr(settings, 'ATTENDANCE_UPLOAD_MAX_ROWS', DEFAULT_MAX_UPLOAD_ROWS)
+    
+    for count, row in enumerate(csv.reader(iter_decoded_lines(file_obj, max_bytes)), start = 1):
+        if max_rows and count > max_rows:
+            raise ValueError(f"Too many rows. The limit is {max_rows}.")
+        yield row
+
+
+def iter_attendance_rows(file_obj, max_bytes = None, max_rows = None):
+    """
+    Generator: yields one parsed subject row at a time while the upload is still being read.
+    The header picks a format profile (see core.formats); rows go through its extractor.
+    """
+    rows = iter_csv_rows(file_obj, max_bytes, max_rows)
+    with phase('csv_header'):
+        header_row = next(rows, None)
+        if not header_row: raise ValueError("Empty CSV")
+        extract = build_extractor(*detect_format(header_row))
+
+    for row in rows:
+        subject = extract(row)
+        if subject is not None:
+            yield subject
 
-        # 1. Clean Headers
-        headers = [h.lower().strip() for h in rows[0] if h]
-        
-        # 2. DEFINE INDICES (Default: -1)
-        # We will set these manually if we detect your file signature
-        subj_idx = -1
-        type_idx = -1
-        present_idx = -1
-        od_idx = -1
-        makeup_idx = -1
-        absent_idx = -1
-
-        # 🕵️‍♂️ SIGNATURE DETECTION
-        # Your file has: "#, Subject Code, Subject, Subject Type, Present, ..."
-        is_known_format = (
-            len(headers) > 4 and 
-            "code" in headers[1] and 
-            "subject" in headers[2] and 
-            "present" in headers[4]
-        )
-
-        if is_known_format:
-            print("✅ SIGNATURE DETECTED: Standard Attendance Report")
-            # HARDCODE THE INDICES (0-based)
-            # 0: #
-            # 1: Subject Code (The Trap!)
-            subj_idx = 2     # Subject Name
-            type_idx = 3     # Subject Type
-            present_idx = 4  # Present
-            od_idx = 5       # OD
-            makeup_idx = 6   # Makeup
-            absent_idx = 7   # Absent
-        else:
-            # Fallback for weird files (Scan by name)
-            print("⚠️ UNKNOWN FORMAT: Scanning headers by name...")
-            for i, h in enumerate(headers):
-                if "subject" in h and "code" not in h and "type" not in h: subj_idx = i
-                elif "type" in h or "session" in h: type_idx = i
-                elif "present" in h: present_idx = i
-                elif "od" in h: od_idx = i
-                elif "makeup" in h: makeup_idx = i
-                elif "absent" in h: absent_idx = i
-
-        if subj_idx == -1 or present_idx == -1:
-            raise ValueError("Could not map columns. Please use the standard Attendance Report format.")
 
+def parse_attendance_csv(file_obj, max_bytes = None, max_rows = None):
+    """
+    Parses a summary 'Attendance Report.csv' into the dashboard payload.
+    Rows are consumed from iter_attendance_rows as they are decoded; only the per-subject results are kept.
+    """
+    try:
         results = []
         global_stats = {'attended': 0, 'conducted': 0}
 
-        for row in rows[1:]:
-            if not row or len(row) < 5: continue
-            
-            # Safe Value Accessor
-            def val(idx): 
-                return row[idx].strip() if idx != -1 and idx < len(row) else ""
-
-            name = val(subj_idx)
-            if not name or "total" in name.lower() or "subject" in name.lower(): continue
-
-            # Number Cleaner
-            def clean(v):
-                s = re.sub(r'[^\d.]', '', str(v))
-                try: return int(float(s))
-                except: return 0
-
-            # 3. EXTRACT DATA
-            p = clean(val(present_idx))
-            od = clean(val(od_idx))
-            mu = clean(val(makeup_idx))
-            a = clean(val(absent_idx))
-
-            # 4. APPLY WEIGHTS (Lab = 3 hrs)
-            subject_type = val(type_idx) or 'Lecture'
-            weight = 3 if 'lab' in subject_type.lower() else 1
-
-            attended_hours = (p + od + mu) * weight
-            absent_hours = a * weight
-            conducted_hours = attended_hours + absent_hours
-            
-            # Avoid Division by Zero
-            pct = (attended_hours / conducted_hours * 100) if conducted_hours > 0 else 0
-
-            global_stats['attended'] += attended_hours
-            global_stats['conducted'] += conducted_hours
-
-            results.append({
-                "id": name,
-                "name": name,
-                "type": subject_type,
-                "attended": attended_hours,
-                "conducted": conducted_hours,
-                "percentage": round(pct, 2)
-            })
+        with phase('csv_rows'):
+            for subject in iter_attendance_rows(file_obj, max_bytes, max_rows):
+                global_stats['attended'] += subject['attended']
+                global_stats['conducted'] += subject['conducted']
+                results.append(subject)
 
         global_pct = (global_stats['attended'] / global_stats['conducted'] * 100) if global_stats['conducted'] > 0 else 0
 
@@ -121,5 +109,5 @@ def parse_attendance_csv(file_obj):
         }
 
     except Exception as e:
-        print(f"ERROR: {e}")
+        logger.info("Rejected attendance report: %s", e)
         raise ValueError(f"Parser Error: {str(e)}")
\ No newline at end of file
@@ -1,19 +1,79 @@
 from .serializers import UserSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, BasePermission, IsAuthenticated
 from rest_framework.parsers import MultiPartParser
-from .utils import parse_attendance_csv
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from django.shortcuts import get_object_or_404
+from .models import CohortSnapshot, ImportJob, Subject
+from .services import process_upload, mark_attendance
+from .batch import is_zip, parse_batch
+from .jobs import enqueue_import, job_payload
+from .cache import data_version
+from .routers import reading_since
+from .authentication import invalidate_user, revoke_token
+from .dashboard import build_dashboard, cached_dashboard, dashboard_etag, subject_status
+from .forecast import CENTI, run_forecast, evaluate_plans
+from .skips import safe_skip_report, optimize_skips
+from .trends import cached_trends, parse_trend_params
+from .timetable import MAX_UPCOMING, cached_projection, cached_timetable, iter_sessions, save_timetable, timetable_payload
+from .exports import CONTENT_TYPES, aiter_chunks, export_filename, export_stream
+from .cohorts import cohort_payload
+from .compaction import compacted_through
 import rest_framework.status as status
+from datetime import date as date_cls
+from itertools import islice
+
+def is_not_modified(request, etag, modified_at):
+    """If-None-Match wins over If-Modified-Since, as in RFC 9110."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(',')]
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(modified_at) <= if_modified_since
+
+def is_staff(user):
+    # Checked against the database: with AUTH_STATELESS_READS request.user only carries an id.
+    return get_user_model().objects.filter(pk = user.pk, is_staff = True).exists()
+
+class IsStaff(BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and is_staff(request.user))
 
 class DashboardView(APIView):
-    permission_classes = [AllowAny]
+    """
+    Real global / per-subject summary, cached per user under their data version.
+    The version is also the ETag, so a client that already has it gets a 304 without touching the DB.
+    """
+    permission_classes = [IsAuthenticated]
+    
     def get(self, request):
-        # Placeholder to prevent 404s
-        return Response({
-            "global": { "attended": 0, "conducted": 0, "percentage": 0 },
-            "subjects": []
-        })
+        version, modified_at = data_version(request.user.pk)
+        etag = dashboard_etag(request.user.pk, version)
+        
+        if is_not_modified(request, etag, modified_at):
+            response = Response(status = status.HTTP_304_NOT_MODIFIED)
+        else:
+            with reading_since(modified_at):
+                response = Response(cached_dashboard(request.user, version), status = status.HTTP_200_OK)
+        
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified_at)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+class SubjectStatusView(APIView):
+    """Current hours and percentage of one subject, straight from its rollups."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, subject_id):
+        subject = get_object_or_404(Subject, pk = subject_id, user = request.user)
+        return Response(subject_status(subject, subject.current_status_details), status = status.HTTP_200_OK)
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -25,6 +85,22 @@ class RegisterView(APIView):
             return Response({"message": "User registered successfully."}, status = status.HTTP_201_CREATED)
         return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
     
+class LogoutView(APIView):
+    """Revokes the current access token and, if given, {"refresh": ...} until they expire."""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        try:
+            if request.data.get('refresh'):
+                revoke_token(RefreshToken(request.data['refresh']))
+        except TokenError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+        
+        if request.auth is not None:
+            revoke_token(request.auth)
+        invalidate_user(request.user.pk)
+        return Response({"message": "Logged out."}, status = status.HTTP_200_OK)
+    
 class UploadAttendanceView(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser]
@@ -33,13 +109,197 @@ class UploadAttendanceView(APIView):
         if 'file' not in request.FILES:
             return Response({"error": "No file uploaded"}, status = 400)
         
+        uploads = request.FILES.getlist('file')
+        if len(uploads) > 1 or is_zip(uploads[0]):
+            # Several reports / a ZIP of them: parsed in parallel and merged, nothing is persisted.
+            try:
+                return Response(parse_batch(uploads), status = 200)
+            except ValueError as e:
+                return Response({"error": str(e)}, status = 400)
+        
+        upload = uploads[0]
+        prune = str(request.data.get('prune', '')).lower() in ('1', 'true', 'yes')
+        
+        # Big files (or ?async=1) go to the job queue so the worker isn't held for the whole import.
+        threshold = getattr(settings, 'ATTENDANCE_IMPORT_ASYNC_BYTES', 1024 * 1024)
+        if upload.size > threshold or str(request.query_params.get('async', '')).lower() in ('1', 'true'):
+            job = enqueue_import(request.user, upload, prune = prune)
+            return Response(job_payload(job), status = status.HTTP_202_ACCEPTED)
+        
         try:
-            data = parse_attendance_csv(request.FILES['file'])
+            # Dated per-session logs are persisted; summary reports are parsed for display as before.
+            data = process_upload(request.user, upload, prune = prune)
+            if 'subjects' not in data:
+                # Persisted logs: hand back the refreshed dashboard for the frontend to show.
+                data['summary'] = build_dashboard(request.user)
             return Response(data, status = 200)
         except ValueError as e:
             return Response({"error": str(e)}, status = 400)
 
+class MarkAttendanceView(APIView):
+    """
+    Records a whole day in one request: {"date", "entries": [{"session_type_id", "status", "remark"}]},
+    or several days at once with {"days": [...]}. Existing logs for the same session/slot are overwritten.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        try:
+            return Response(mark_attendance(request.user, request.data), status = status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+
+class ImportJobStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, job_id):
+        job = get_object_or_404(ImportJob, pk = job_id, user = request.user)
+        payload = job_payload(job)
+        if job.status == 'DONE' and 'subjects' not in job.result:
+            payload['result'] = {**job.result, 'summary': build_dashboard(request.user)}
+        return Response(payload, status = status.HTTP_200_OK)
+
 class ForecastView(APIView):
-    permission_classes = [AllowAny]
+    """
+    Cascade simulator. Either {"simulations": [...]} for one plan (returns the step list),
+    or {"plans": [[...], {"id": ..., "simulations": [...]}]} to evaluate many variants in one go.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({"error": "Request body must be a JSON object."}, status = status.HTTP_400_BAD_REQUEST)
+        _, modified_at = data_version(request.user.pk)
+        try:
+            with reading_since(modified_at):
+                if 'plans' in request.data:
+                    include_steps = request.data.get('include_steps', True)
+                    return Response({"plans": evaluate_plans(request.user, request.data['plans'], include_steps)}, status = status.HTTP_200_OK)
+                
+                return Response(run_forecast(request.user, request.data.get('simulations', [])), status = status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+
+class SafeSkipsView(APIView):
+    """
+    GET: closed-form skips left / classes needed per SessionType for every subject.
+    POST {"sessions": [{"session_type_id", "date"}]}: skip plan maximizing skipped hours over those sessions.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response({"subjects": safe_skip_report(request.user)}, status = status.HTTP_200_OK)
+    
     def post(self, request):
-        return Response({"status": "Pending"}, status=status.HTTP_200_OK)
\ No newline at end of file
+        if not isinstance(request.data, dict):
+            return Response({"error": "Request body must be a JSON object."}, status = status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(optimize_skips(request.user, request.data.get('sessions', [])), status = status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+
+class TrendsView(APIView):
+    """
+    Cumulative percentage per day / week / month plus rolling-window rates, overall and per subject.
+    Query params: bucket, start, end (YYYY-MM-DD), windows (e.g. "7,30"), subject.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        try:
+            params = parse_trend_params(request.query_params)
+            version, modified_at = data_version(request.user.pk)
+            with reading_since(modified_at):
+                return Response(cached_trends(request.user, version, params), status = status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+
+class ExportAttendanceView(APIView):
+    """
+    Streams the user's full attendance history. Query params: type (csv | ndjson), gzip (1 to
+    compress), scope=all (staff only: every user's history).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        fmt = request.query_params.get('type', 'csv')
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        everyone = request.query_params.get('scope') == 'all'
+        if everyone and not is_staff(request.user):
+            return Response({"error": "Only staff can export every user's attendance."}, status = status.HTTP_403_FORBIDDEN)
+        
+        try:
+            chunks = export_stream(None if everyone else request.user, fmt, compress)
+        except ValueError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+        
+        if settings.ASYNC_MODE:
+            chunks = aiter_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type = 'application/gzip' if compress else CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{export_filename(fmt, compress, everyone)}"'
+        response['Cache-Control'] = 'no-store'
+        # Rows up to this day were compacted: only present if they were archived (see core.compaction).
+        through = compacted_through(None if everyone else request.user)
+        if through is not None:
+            response['X-Compacted-Through'] = through.isoformat()
+        return response
+
+class TimetableView(APIView):
+    """
+    GET: the semester, weekly entries and exception dates.
+    PUT {"start_date", "end_date", "entries": [{"session_type_id", "weekday", "slot"}], "exceptions": [{"date", "session_type_id"?, "reason"?}]}:
+    replaces all of them.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        return Response(timetable_payload(request.user), status = status.HTTP_200_OK)
+    
+    def put(self, request):
+        try:
+            return Response(save_timetable(request.user, request.data), status = status.HTTP_200_OK)
+        except ValueError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+
+class TimetableProjectionView(APIView):
+    """
+    Remaining sessions, best / worst case final percentage and the last date the target is still
+    reachable, per subject. Query params: start (YYYY-MM-DD, default today), upcoming (list the next N sessions).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        try:
+            start = date_cls.fromisoformat(request.query_params['start']) if request.query_params.get('start') else date_cls.today()
+            upcoming = min(int(request.query_params.get('upcoming', 0)), MAX_UPCOMING)
+        except ValueError:
+            return Response({"error": "'start' must be YYYY-MM-DD and 'upcoming' a number."}, status = status.HTTP_400_BAD_REQUEST)
+        
+        # Primary reads: only dashboard, trends and forecast opt in to the replica.
+        version, _ = data_version(request.user.pk)
+        try:
+            payload = cached_projection(request.user, version, start)
+            if upcoming > 0:
+                sessions = islice(iter_sessions(cached_timetable(request.user, version), start), upcoming)
+                payload = {**payload, "upcoming": [
+                    {"date": day.isoformat(), "session_type_id": st_id, "subject_id": subject_id, "slot": slot, "duration_hours": hours / CENTI}
+                    for day, st_id, subject_id, slot, hours in sessions
+                ]}
+        except ValueError as e:
+            return Response({"error": str(e)}, status = status.HTTP_400_BAD_REQUEST)
+        return Response(payload, status = status.HTTP_200_OK)
+
+class CohortListView(APIView):
+    """Staff only: every course (subject code) with student count, below-target count and mean percentage."""
+    permission_classes = [IsAuthenticated, IsStaff]
+    
+    def get(self, request):
+        snapshots = CohortSnapshot.objects.order_by('code').defer('histogram', 'weekly')
+        return Response({"cohorts": [cohort_payload(snapshot, details = False) for snapshot in snapshots]}, status = status.HTTP_200_OK)
+
+class CohortDetailView(APIView):
+    """Staff only: one course's percentage histogram and weekly trend, as of the last refresh_cohorts run."""
+    permission_classes = [IsAuthenticated, IsStaff]
+    
+    def get(self, request, code):
+        return Response(cohort_payload(get_object_or_404(CohortSnapshot, code = code)), status = status.HTTP_200_OK)
@@ -2,6 +2,10 @@ import React, { useState, useRef } from 'react';
 import { X, UploadCloud, FileSpreadsheet, CheckCircle, AlertCircle, Loader2 } from 'lucide-react';
 import api from '../services/api';
 
+// Background imports are polled once a second for at most this long
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_ATTEMPTS = 120;
+
 export default function ImportModal({ isOpen, onClose, onSuccess }) {
   const [file, setFile] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
@@ -47,25 +51,40 @@ export default function ImportModal({ isOpen, onClose, onSuccess }) {
       const response = await api.post('attendance/import/', formData, {
         headers: { 'Content-Type': 'multipart/form-data' }
       });
+
+      // Large files are imported in the background: poll the job until it finishes
+      const data = response.status === 202 ? await waitForJob(response.data.job_id) : response.data;
       
       setStatus('success');
       
       // ✨ Pass the FRESH data back to Dashboard
       setTimeout(() => {
-        if (response.data) {
-           onSuccess(response.data); 
+        if (data) {
+           onSuccess(data); 
            handleClose();
         }
       }, 1000);
 
     } catch (error) {
       console.error("Upload failed", error);
-      setStatus('error');
+      setStatus(error.name === 'TimeoutError' ? 'timeout' : 'error');
     } finally {
       setIsLoading(false);
     }
   };
 
+  const waitForJob = async (jobId) => {
+    for (let attempt = 0; attempt < JOB_POLL_ATTEMPTS; attempt++) {
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      const { data: job } = await api.get(`attendance/import/${jobId}/`);
+      if (job.status === 'DONE') return job.result;
+      if (job.status === 'FAILED') throw new Error(job.error);
+    }
+    const timeout = new Error(`Import job ${jobId} did not finish in time`);
+    timeout.name = 'TimeoutError';
+    throw timeout;
+  };
+
   const handleClose = () => {
     setFile(null);
     setStatus(null);
@@ -101,6 +120,7 @@ export default function ImportModal({ isOpen, onClose, onSuccess }) {
 
         {status === 'success' && <div className="flex items-center justify-center gap-2 text-sm font-bold text-green-600 bg-green-50 p-3 rounded-lg"><CheckCircle size={18} /> Success! Updating Dashboard...</div>}
         {status === 'error' && <div className="flex items-center justify-center gap-2 text-sm font-bold text-red-600 bg-red-50 p-3 rounded-lg"><AlertCircle size={18} /> Upload Failed. Check file format.</div>}
+        {status === 'timeout' && <div className="flex items-center justify-center gap-2 text-sm font-bold text-red-600 bg-red-50 p-3 rounded-lg"><AlertCircle size={18} /> Import is still running. Refresh in a few minutes to see it.</div>}
 
         <button onClick={handleSubmit} disabled={!file || isLoading || status === 'success'} className="w-full bg-indigo-600 hover:bg-indigo-700 disabled:opacity-50 text-white font-bold py-3 rounded-xl flex items-center justify-center gap-2">
           {isLoading ? <Loader2 className="animate-spin" /> : "Process Data"}